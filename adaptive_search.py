@@ -0,0 +1,204 @@
+import os
+import sys
+import traceback
+import runner_utils
+import run_manifest
+import cluster
+import stats
+import repetition
+import pandas as pd
+
+'''
+Adaptive configuration search: instead of running every combination of the
+config arguments of a clusterer, as cluster.py does, only the combinations
+near the time vs. quality Pareto frontier are run.
+
+The combinations of config arguments form a grid, with one axis per argument
+(e.g., resolution, threshold or epsilon). The search starts from a coarse
+sample of the grid (the first, middle and last value of each argument), and
+then repeatedly runs the neighbors of the configs on the Pareto frontier
+(the nearest values of one argument, at the current stride), halving the
+strides whenever the frontier has no unexplored neighbors, until the
+neighbors of the frontier at stride 1 have all been run. The remaining
+rounds ("Number of rounds", and the extra rounds of the repetition policy of
+repetition.py) are only run for the configs on the final frontier.
+
+The quality of a clustering is "Search objective" (default: fScore_mean) of
+its statistics, computed as in stats.py, and its time is its Cluster Time.
+"Search budget" limits the number of configs run per search.
+
+Supports native PCBS and NetworKit clusterers. Outputs use the same file
+names as cluster.py and stats.py, so runs are shared with them (and with
+"Resume: true"), and runtimes.csv and stats.csv only have the runs made.
+
+Usage: python3 adaptive_search.py cluster.config stats.config
+'''
+
+'''
+Returns the Pareto frontier of points, computed as GetParetoDfs in
+plotting/plotting_utils.py does: in order of increasing time, a point is on
+the frontier if its score is higher than the score of every faster point.
+Input:
+points: type: dict, (time, score) of each point
+'''
+def paretoFrontier(points):
+  frontier = []
+  max_score = float("-inf")
+  for index, (time, score) in sorted(points.items(), key=lambda item: item[1][0]):
+    if score > max_score:
+      max_score = score
+      frontier.append(index)
+  return frontier
+
+def gridIndices(dims, strides):
+  indices = [[]]
+  for dim, stride in zip(dims, strides):
+    values = sorted(set(list(range(0, dim, stride)) + [dim - 1]))
+    indices = [index + [value] for index in indices for value in values]
+  return [tuple(index) for index in indices]
+
+def gridNeighbors(index, dims, strides):
+  neighbors = []
+  for axis, stride in enumerate(strides):
+    for value in [index[axis] - stride, index[axis] + stride]:
+      if 0 <= value < dims[axis]:
+        neighbors.append(index[:axis] + (value,) + index[axis + 1:])
+  return neighbors
+
+'''
+Runs the Pareto-guided search over a grid of configs.
+Input:
+dims: type: list, number of values of each config argument
+evaluate: function taking the index of a config in the grid, and returning
+  its (time, score), or None if the run failed
+budget: type: int, maximum number of configs to evaluate, or None
+
+Output:
+the indices of the configs on the Pareto frontier, in order of time
+'''
+def paretoSearch(dims, evaluate, budget=None):
+  strides = [max(1, (dim - 1) // 2) for dim in dims]
+  points = {}
+  evaluated = set()
+  pending = gridIndices(dims, strides)
+  while True:
+    for index in pending:
+      if budget is not None and len(evaluated) >= budget:
+        return paretoFrontier(points)
+      evaluated.add(index)
+      result = evaluate(index)
+      if result is not None:
+        points[index] = result
+    frontier = paretoFrontier(points)
+    pending = sorted(set(neighbor for index in frontier
+                         for neighbor in gridNeighbors(index, dims, strides)) - evaluated)
+    if not pending:
+      if all(stride == 1 for stride in strides):
+        return frontier
+      strides = [max(1, stride // 2) for stride in strides]
+
+def configIndex(index, dims):
+  config_idx = 0
+  for value, dim in zip(index, dims):
+    config_idx = config_idx * dim + value
+  return config_idx
+
+def searchClusterer(manifest, clusterer_idx, clusterer, graph_idx, graph, thread, runtimes, stats_rows):
+  configs = runner_utils.clusterer_configs[clusterer_idx]
+  dims = [len(axis) for axis in runner_utils.clusterer_config_axes[clusterer_idx]]
+  config_prefix = runner_utils.clusterer_config_names[clusterer_idx] + "{"
+  config_postfix = "}"
+  resume = runner_utils.resume == "true"
+  worker = None
+  if cluster.isPCBSClusterer(clusterer) and runner_utils.persistent_worker == "true":
+    import cluster_worker
+    worker = cluster_worker.ClusterWorker(cluster.pcbsCommand(graph, thread) + " --worker_mode=true")
+
+  # The rounds of each config run, by config index.
+  series = {}
+
+  # Runs one round of a config and computes its statistics.
+  def runRound(config_idx, round):
+    config = configs[config_idx]
+    runtime_dict = cluster.makeRuntimeDict(clusterer, graph, thread, config, round)
+    out_prefix = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_" + str(round)
+    if not (resume and manifest.restore(runtime_dict, out_prefix)):
+      if cluster.isPCBSClusterer(clusterer):
+        cluster.runJob(manifest, runtime_dict, out_prefix, cluster.runPCBS, clusterer, graph, thread, config_prefix + config + config_postfix, out_prefix, runtime_dict, worker)
+      else:
+        import cluster_nk
+        cluster.runJob(manifest, runtime_dict, out_prefix, cluster_nk.runNetworKit, clusterer, graph, thread, config, out_prefix, runtime_dict, in_process=True)
+    runtimes.append(runtime_dict)
+    series.setdefault(config_idx, []).append(runtime_dict)
+    stats_dict = {column: runtime_dict[column] for column in run_manifest.KEY_COLUMNS}
+    stats.addRunInfo(manifest, stats_dict, out_prefix)
+    if stats_dict.get("Status", "OK") == "OK":
+      stats.runStats(out_prefix, graph, graph_idx, stats_dict)
+    stats_dict["Ground Truth"] = runner_utils.communities[graph_idx]
+    stats_rows.append(stats_dict)
+    return stats_dict
+
+  def evaluate(index):
+    stats_dict = runRound(configIndex(index, dims), 0)
+    if stats_dict.get("Status") != "OK" or runner_utils.search_objective not in stats_dict:
+      return None
+    return float(stats_dict["Cluster Time"]), float(stats_dict[runner_utils.search_objective])
+
+  try:
+    frontier = paretoSearch(dims, evaluate, runner_utils.search_budget)
+    print(clusterer + " on " + graph + " with " + thread + " threads: Pareto frontier has " + str(len(frontier)) + " configs")
+    for index in frontier:
+      config_idx = configIndex(index, dims)
+      while repetition.needMoreRounds(series[config_idx]):
+        runRound(config_idx, len(series[config_idx]))
+    for config_series in series.values():
+      repetition.addSummary(config_series)
+  finally:
+    if worker is not None:
+      worker.close()
+
+def runAll(config_filename, stats_config_filename):
+  runner_utils.readConfig(config_filename)
+  runner_utils.readStatsConfig(stats_config_filename)
+  if not os.path.exists(runner_utils.output_directory):
+    os.makedirs(runner_utils.output_directory)
+  manifest = run_manifest.RunManifest(runner_utils.output_directory)
+  if stats.usesStatsBinary():
+    runner_utils.getBinaryCommand("//clusterers:stats-in-memory_main")
+  runtimes = []
+  stats_rows = []
+  for graph_idx, graph in enumerate(runner_utils.graphs):
+    if graph == "SKIP":
+      continue
+    for clusterer_idx, clusterer in enumerate(runner_utils.clusterers):
+      if clusterer == "SKIP":
+        continue
+      if not (cluster.isPCBSClusterer(clusterer) or clusterer.startswith("NetworKit")):
+        print("Adaptive search does not support " + clusterer + ", use cluster.py instead")
+        continue
+      if runner_utils.clusterer_configs[clusterer_idx] is None:
+        print("No configs to search for " + clusterer)
+        continue
+      if cluster.isPCBSClusterer(clusterer):
+        runner_utils.getBinaryCommand("//clusterers:cluster-in-memory_main")
+      for thread in runner_utils.num_threads:
+        try:
+          searchClusterer(manifest, clusterer_idx, clusterer, graph_idx, graph, thread, runtimes, stats_rows)
+        except Exception:
+          traceback.print_exc()
+
+  if not os.path.exists(runner_utils.csv_output_directory):
+    os.makedirs(runner_utils.csv_output_directory)
+  runtime_dataframe = pd.DataFrame(runtimes)
+  columns = ["Clusterer Name","Input Graph","Threads","Config","Round","Cluster Time"]
+  columns += [column for column in cluster.optional_runtime_columns if column in runtime_dataframe.columns]
+  columns += run_manifest.addLegacyColumns(runtime_dataframe)
+  runtime_dataframe.to_csv(runner_utils.csv_output_directory + '/runtimes.csv', mode='a', columns=columns)
+  pd.DataFrame(stats_rows).to_csv(runner_utils.csv_output_directory + '/stats.csv', mode='a')
+
+def main():
+  args = sys.argv[1:]
+  runAll(args[0], args[1])
+
+if __name__ == "__main__":
+  main()
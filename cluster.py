@@ -2,6 +2,11 @@ import os
 import sys
 import time
 import runner_utils
+import run_manifest
+import graph_cache
+import repetition
+import external_tools
+import clustering_io
 import traceback
 import pandas as pd
 
@@ -23,6 +28,16 @@ def write_snap_connectivity(file_path, output_path=None, num_lines=3):
     with open(output_path, 'w') as file:
         file.writelines(remaining_lines)
 
+# Sets the exit code, status and resource usage of a run from the result of
+# runner_utils.runCommand (or of a persistent worker). The status is only set
+# if the run did not succeed; otherwise it is decided when the run is recorded.
+def setRunResult(runtime_dict, result):
+  runtime_dict['Exit Code'] = result["returncode"]
+  if result["status"] != "OK":
+    runtime_dict['Status'] = result["status"]
+  if result.get("usage") is not None:
+    runner_utils.addResourceUsage(runtime_dict, result["usage"])
+
 # Graph must be in edge format
 def runSnap(clusterer, graph, graph_idx, round, runtime_dict):
   if (runner_utils.gbbs_format == "true"):
@@ -34,81 +49,81 @@ def runSnap(clusterer, graph, graph_idx, round, runtime_dict):
   snap_binary = "community"
   args = ""
   output_postfix = ""
-  print("Compiling snap binaries. This might take a while if it's the first time.")
   if (clusterer == "SnapGirvanNewman"):
-    runner_utils.shellGetOutput("(cd external/snap/examples/%s && make all)" % snap_binary)
     alg_number = 1
     args = " -a:" + str(alg_number)
   elif (clusterer == "SnapInfomap"):
-    runner_utils.shellGetOutput("(cd external/snap/examples/%s && make all)" % snap_binary)
     alg_number = 3
     args = " -a:" + str(alg_number)
   elif (clusterer == "SnapCNM"):
-    runner_utils.shellGetOutput("(cd external/snap/examples/%s && make all)" % snap_binary)
     alg_number = 2
     args = " -a:" + str(alg_number)
   elif (clusterer == "SnapConnectivity"):
     snap_binary = "concomp"
     args = " -wcconly:T"
     output_postfix = ".wcc.txt"
-    runner_utils.shellGetOutput("(cd external/snap/examples/%s && make all)" % snap_binary)
   elif (clusterer == "SnapKCore"):
     snap_binary = "kcores"
     args = " -s:F"  # Save the k-core network (for every k) (default:'T')
-    runner_utils.shellGetOutput("(cd external/snap/examples/%s && make all)" % snap_binary)
   else:
     raise("Clusterer is not implemented.")
-  print("Compilation done.")
-  cmds = runner_utils.timeout + " external/snap/examples/%s/%s -i:"  % (snap_binary, snap_binary) + use_input_graph + " -o:" + out_clustering + args
+  # The binaries are built once, by external_tools.prepare in runAll.
+  cmds = external_tools.binary(snap_binary) + " -i:" + use_input_graph + " -o:" + out_clustering + args
   # print(cmds)
   if runner_utils.postprocess_only != "true":
     runner_utils.appendToFile('Snap: \n', out_filename)
     runner_utils.appendToFile("Input graph: " + graph + "\n", out_filename)
-    out_time = runner_utils.shellGetOutput(cmds)
-    runner_utils.appendToFile(out_time, out_filename)
+    result = runner_utils.runCommand(cmds, runner_utils.timeout, out_filename)
+    setRunResult(runtime_dict, result)
+    for time_prefix in ['Wealy Connected Component Time:', 'KCore Time:', 'Cluster Time:']:
+      cluster_time = runner_utils.getOutputValue(result["output"], time_prefix)
+      if cluster_time is not None:
+        runtime_dict['Cluster Time'] = cluster_time
     # postprocess to match our clustering format
-    if (clusterer == "SnapConnectivity"):
+    if (clusterer == "SnapConnectivity" and result["status"] == "OK"):
       os.rename(out_clustering + output_postfix, out_clustering)
       write_snap_connectivity(out_clustering)
-  print("postprocessing..." + out_filename)
-  with open(out_filename,'r') as f:
-    run_info = f.readlines()
-    for elem in run_info[1:]:
-      if elem.startswith('Wealy Connected Component Time:') or elem.startswith('KCore Time:') or elem.startswith('Cluster Time:'):
-        runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
-
 
 
-def runNeo4j(clusterer, graph, thread, config, weighted, out_prefix, runtime_dict):
+def runNeo4j(clusterer, graph, thread, config, weighted, out_prefix, runtime_dict, session=None):
   if (runner_utils.gbbs_format == "true"):
     raise ValueError("Neo4j can only be run using edge list format")
   use_input_graph = runner_utils.input_directory + graph
-  out_clustering = out_prefix + ".cluster"
+  out_clustering = clustering_io.outputClusteringPath(out_prefix)
   out_filename = out_prefix + ".out"
   alg_name = clusterer[5:]
   thread = int(thread)
   if runner_utils.postprocess_only != "true":
     import cluster_neo4j
-    out_time = cluster_neo4j.runNeo4j(use_input_graph, graph, alg_name, thread, config, weighted, out_clustering)
+    out_time = cluster_neo4j.runNeo4j(use_input_graph, graph, alg_name, thread, config, weighted, out_clustering, runtime_dict, session)
     runner_utils.appendToFile(out_time, out_filename)
-  print("postprocessing..." + out_filename)
-  with open(out_filename,'r') as f:
-    run_info = f.readlines()
-    for elem in run_info[1:]:
-      if elem.startswith("Time:"):
-        runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
 
 # Graph must be in edge format
-def runTectonic(clusterer, graph, thread, config, out_prefix, runtime_dict):
+# Runs the scripts and binaries of external/Tectonic, unless "Tectonic
+# pipeline: native" is set, in which case it runs in memory with
+# cluster_tectonic.py.
+# With "Tectonic threshold sweep: true", the clusterings of the thresholds of
+# all configs are computed in one pass per round.
+def runTectonic(clusterer, graph, thread, config, out_prefix, runtime_dict, configs=None):
   if (runner_utils.gbbs_format == "true"):
     raise ValueError("Tectonic can only be run using edge list format")
-  runner_utils.readSystemConfig(sys.argv[2])
   use_input_graph = runner_utils.input_directory + graph
+  if runner_utils.tectonic_pipeline == "native":
+    if runner_utils.postprocess_only != "true":
+      import cluster_tectonic
+      if runner_utils.tectonic_threshold_sweep == "true" and configs is not None:
+        thresholds = [cluster_tectonic.parseThreshold(c) for c in configs]
+        cluster_tectonic.runTectonic(use_input_graph, config, out_prefix, runtime_dict, thresholds,
+                                     (use_input_graph, thread, str(runtime_dict["Round"])))
+      else:
+        cluster_tectonic.runTectonic(use_input_graph, config, out_prefix, runtime_dict)
+    return
   out_clustering_tmp = out_prefix + ".tmpcluster"
   out_clustering = out_prefix + ".cluster"
   out_filename = out_prefix + ".out"
-  runner_utils.shellGetOutput("(cd external/Tectonic/mace && make)")
-  runner_utils.shellGetOutput("(cd external/Tectonic && make all)")
+  # The binaries are built once, by external_tools.prepare in runAll.
+  mace_binary = external_tools.binary("mace")
+  tree_clusters_binary = external_tools.binary("tectonic")
   threshold = "0.06"
   # no_pruning = True
   split = [x.strip() for x in config.split(',')]
@@ -121,44 +136,67 @@ def runTectonic(clusterer, graph, thread, config, out_prefix, runtime_dict):
       # elif config_split[0].startswith("no_pruning"):
       #   no_pruning = True if config_split[1].startswith("True") else False
 
-  if runner_utils.postprocess_only == "true":
-    print("postprocessing..." + out_filename)
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith('Cluster Time:'):
-          runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
-  else:
+  if runner_utils.postprocess_only != "true":
     # Timing from here
     start_time = time.time()
+    # The resource usage of the run is that of all of its steps, and the
+    # timeout applies to all of them together.
+    deadline = None if not runner_utils.timeout else start_time + runner_utils.timeout
     # relabel the graph so the node vertices are consecutive. The result format: each line i is the neighbors of i, and each edge only appear once in the smaller id's line.
-    num_vert = runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/relabel-graph-no-comm.py " + use_input_graph + " " + out_prefix + ".mace" + " " + out_prefix + ".pickle")
-    num_vert = num_vert.strip()
-    runner_utils.shellGetOutput("external/Tectonic/mace/mace C -l 3 -u 3 "+ out_prefix + ".mace " + out_prefix + ".triangles")
-    runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/mace-to-list.py " + out_prefix + ".mace " + out_prefix + ".edges")
-    # if (no_pruning):
-    runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/weighted-edges-no-mixed.py " + out_prefix + ".triangles " + out_prefix + ".edges " + out_prefix + ".weighted " + out_prefix + ".mixed " + num_vert)
-    cluster = runner_utils.shellGetOutput("external/Tectonic/tree-clusters-parameter-no-mixed " + out_prefix + ".weighted " + num_vert + " " + threshold)
+    # With "Graph cache: true", the relabelled graph and its triangle-weighted
+    # edges are only computed once per graph, and only tree-clusters runs per
+    # threshold.
+    mace_path, pickle_path = out_prefix + ".mace", out_prefix + ".pickle"
+    weighted_path = out_prefix + ".weighted"
+    steps = [runner_utils.python_ver + " external/Tectonic/relabel-graph-no-comm.py " + use_input_graph + " " + mace_path + " " + pickle_path,
+             mace_binary + " C -l 3 -u 3 "+ mace_path + " " + out_prefix + ".triangles",
+             runner_utils.python_ver + " external/Tectonic/mace-to-list.py " + mace_path + " " + out_prefix + ".edges",
+             # if (no_pruning):
+             runner_utils.python_ver + " external/Tectonic/weighted-edges-no-mixed.py " + out_prefix + ".triangles " + out_prefix + ".edges " + weighted_path + " " + out_prefix + ".mixed {num_vert}"]
+    num_vert = ""
+    graph_preprocess_time = 0.0
+    if graph_cache.enabled():
+      # The Cluster Time of every run is charged for the time it took to
+      # preprocess the graph (Graph Preprocess Time), as it is when the
+      # steps run for every threshold.
+      mace_path, pickle_path, num_vert = graph_cache.getMace(use_input_graph)
+      weighted_path = graph_cache.getTectonicWeighted(use_input_graph)
+      runtime_dict['Preprocess Time'] = time.time() - start_time
+      graph_preprocess_time = graph_cache.getTectonicPreprocessTime(use_input_graph)
+      if graph_preprocess_time is None:
+        graph_preprocess_time = runtime_dict['Preprocess Time']
+      runtime_dict['Graph Preprocess Time'] = graph_preprocess_time
+      start_time = time.time()
+      steps = []
+    steps += [tree_clusters_binary + " " + weighted_path + " {num_vert} " + threshold]
     # else:
     #   runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/weighted-edges.py " + out_prefix + ".triangles " + out_prefix + ".edges " + out_prefix + ".weighted " + out_prefix + ".mixed " + num_vert)
     #   cluster = runner_utils.shellGetOutput("external/Tectonic/tree-clusters-parameter " + out_prefix + ".weighted " + num_vert + " " + threshold)
-    end_time = time.time()
-    # Output running time to out_filename
-    runner_utils.appendToFile(cluster, out_clustering_tmp)
-    runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/relabel-clusters.py " + use_input_graph + " " + out_clustering_tmp + " " + out_clustering + " " + out_prefix + ".pickle")
-    runner_utils.appendToFile("Tectonic: \n", out_filename)
-    runner_utils.appendToFile("Input graph: " + graph + "\n", out_filename)
-    runner_utils.appendToFile(config + "\n", out_filename)
-    runner_utils.appendToFile("Cluster Time: " + str(end_time - start_time) + "\n", out_filename)
-    runtime_dict['Cluster Time'] = str(end_time - start_time)
+    for step in steps:
+      remaining = None if deadline is None else max(deadline - time.time(), 0.001)
+      result = runner_utils.runCommand(step.format(num_vert=num_vert), remaining)
+      setRunResult(runtime_dict, result)
+      if result["status"] != "OK":
+        break
+      if not num_vert:
+        num_vert = result["output"].strip()
+    if result["status"] == "OK":
+      cluster = result["output"]
+      end_time = time.time()
+      # Output running time to out_filename
+      runner_utils.appendToFile(cluster, out_clustering_tmp)
+      runner_utils.shellGetOutput(runner_utils.python_ver + " external/Tectonic/relabel-clusters.py " + use_input_graph + " " + out_clustering_tmp + " " + out_clustering + " " + pickle_path)
+      runner_utils.appendToFile("Tectonic: \n", out_filename)
+      runner_utils.appendToFile("Input graph: " + graph + "\n", out_filename)
+      runner_utils.appendToFile(config + "\n", out_filename)
+      if 'Graph Preprocess Time' in runtime_dict:
+        runner_utils.appendToFile("Graph Preprocess Time: " + str(graph_preprocess_time) + "\n", out_filename)
+      runner_utils.appendToFile("Cluster Time: " + str(graph_preprocess_time + end_time - start_time) + "\n", out_filename)
+      runtime_dict['Cluster Time'] = graph_preprocess_time + end_time - start_time
 
     ## remove intermediate files
-    runner_utils.shellGetOutput("rm " + out_prefix + ".triangles ")
-    runner_utils.shellGetOutput("rm " + out_prefix + ".mace ")
-    runner_utils.shellGetOutput("rm " + out_prefix + ".edges ")
-    runner_utils.shellGetOutput("rm " + out_prefix + ".weighted ")
-    runner_utils.shellGetOutput("rm " + out_prefix + ".tmpcluster ")
-    runner_utils.shellGetOutput("rm " + out_prefix + ".pickle")
+    for extension in [".triangles", ".mace", ".edges", ".weighted", ".mixed", ".tmpcluster", ".pickle"]:
+      runner_utils.shellGetOutput("rm -f " + out_prefix + extension)
 
 #cd external/Tectonic/
 #cd mace; make
@@ -174,139 +212,418 @@ def run_tigergraph(conn, clusterer, graph, thread, config, weighted, out_prefix,
   if (runner_utils.gbbs_format == "true"):
     raise ValueError("Tigergraph can only be run using edge list format")
   use_input_graph = runner_utils.input_directory + graph
-  out_clustering = out_prefix + ".cluster"
+  out_clustering = clustering_io.outputClusteringPath(out_prefix)
   out_filename = out_prefix + ".out"
   if runner_utils.postprocess_only != "true":
     import cluster_tg
-    out_time = cluster_tg.run_tigergraph(conn, clusterer, out_clustering, thread, config, weighted)
+    out_time = cluster_tg.run_tigergraph(conn, clusterer, out_clustering, thread, config, weighted, runtime_dict)
     runner_utils.appendToFile("Tigergraph: \n", out_filename)
     runner_utils.appendToFile("Clusterer: " + clusterer + "\n", out_filename)
     runner_utils.appendToFile("Input graph: " + graph + "\n", out_filename)
     runner_utils.appendToFile("Threads: " + str(thread) + "\n", out_filename)
     runner_utils.appendToFile("Config: " + config + "\n", out_filename)
     runner_utils.appendToFile(out_time, out_filename)
-  print("postprocessing..." + out_filename)
-  with open(out_filename,'r') as f:
-    run_info = f.readlines()
-    for elem in run_info[1:]:
-      if elem.startswith('Total Time:'):
-        runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
-
-def runAll(config_filename):
+
+def pcbsCommand(graph, thread):
+  use_thread = "" if (thread == "" or thread == "ALL") else "PARLAY_NUM_THREADS=" + thread
+  use_input_graph, is_gbbs_format = graph_cache.getNativeInputGraph(runner_utils.input_directory + graph)
+  return (use_thread + " " + runner_utils.getBinaryCommand("//clusterers:cluster-in-memory_main") + " --"
+  "input_graph=" + use_input_graph + " --is_gbbs_format=" + is_gbbs_format + " --float_weighted=" + runner_utils.weighted)
+
+# If worker is given, the clustering is computed by the persistent worker,
+# which keeps the graph in memory between jobs.
+def runPCBS(clusterer, graph, thread, config, out_prefix, runtime_dict, worker=None):
+  out_filename = out_prefix + ".out"
+  out_clustering = clustering_io.outputClusteringPath(out_prefix)
+  if (runner_utils.gbbs_format == "true" and "ungraph" in graph):
+    print("warning: use gbbs format is true, but seems like snap format is used from graph file name")
+  ss = (pcbsCommand(graph, thread) + " --clusterer_name=" + clusterer + " "
+  "--clusterer_config='" + config + "' "
+  "--output_clustering=" + out_clustering)
+  if runner_utils.postprocess_only.lower() != "true":
+    if worker is None:
+      print(ss)
+      runner_utils.appendToFile(ss + "\n", out_filename)
+      result = runner_utils.runCommand(ss, runner_utils.timeout, out_filename)
+    else:
+      # The command line is not run; the job is sent to the worker instead.
+      worker_request = worker.request(clusterer, config, out_clustering)
+      print(worker_request)
+      runner_utils.appendToFile(worker_request + "\n", out_filename)
+      result = worker.run(clusterer, config, out_clustering, runner_utils.timeout, out_filename)
+      # The worker measures the resources used by each job itself.
+      result["usage"] = runner_utils.getOutputResourceUsage(result["output"])
+    setRunResult(runtime_dict, result)
+    out = result["output"]
+    for name in ["Read", "Preprocess", "Core Decomposition", "Cluster", "Write"]:
+      phase_time = runner_utils.getOutputTime(out, name)
+      if phase_time is not None:
+        runtime_dict[name + ' Time'] = phase_time
+    # A Preprocess Time reported by the clusterer (the core decomposition of
+    # KCoreClusterer, when it is reused across thresholds) is part of the
+    # Cluster Time printed by cluster-in-memory_main, and is recorded on its
+    # own instead. A Core Decomposition Time stays part of the Cluster Time.
+    if runtime_dict.get('Preprocess Time') is not None and runtime_dict.get('Cluster Time') is not None:
+      runtime_dict['Cluster Time'] = max(runtime_dict['Cluster Time'] - runtime_dict['Preprocess Time'], 0.0)
+    for prefix, column in [("Num vertices:", "Num Vertices"), ("Num clusters:", "Num Clusters")]:
+      value = runner_utils.getOutputValue(out, prefix)
+      if value is not None:
+        runtime_dict[column] = int(value)
+
+# Runs run_func(*args) as the job described by runtime_dict, and records the
+# outcome in the manifest. run_func fills runtime_dict with the run
+# information reported by the backend; the Total Time of the job is measured
+# here. Output files of an earlier run of the job are removed first, so that
+# they are not appended to.
+# When postprocessing, the run information is taken from the manifest
+# instead (or from the .out file, for runs from before the manifest).
+# Runs within the runner process (in_process) are stopped by a timeout here;
+# other runs are stopped by runner_utils.runCommand.
+def runJob(manifest, runtime_dict, out_prefix, run_func, *args, in_process=False):
+  if runner_utils.postprocess_only == "true":
+    print("postprocessing..." + out_prefix)
+    if not manifest.load(runtime_dict):
+      import output_reader
+      runtime_dict.update(output_reader.read_run_info(out_prefix))
+    return
+  runner_utils.removeOutputs(out_prefix)
+  start_time = time.time()
+  try:
+    if in_process:
+      with runner_utils.inProcessTimeout(runner_utils.timeout):
+        run_func(*args)
+    else:
+      run_func(*args)
+  except (runner_utils.JobTimeout, MemoryError) as e:
+    print(out_prefix + ": " + repr(e))
+    runtime_dict['Status'] = "TIMEOUT" if isinstance(e, runner_utils.JobTimeout) else "OOM"
+    runtime_dict['Exit Code'] = 1
+    runtime_dict['Total Time'] = time.time() - start_time
+    manifest.record(runtime_dict, out_prefix)
+    return
+  except Exception:
+    if not runtime_dict.get('Exit Code'):
+      runtime_dict['Exit Code'] = 1
+    manifest.record(runtime_dict, out_prefix)
+    raise
+  runtime_dict['Total Time'] = time.time() - start_time
+  harness_overhead = runner_utils.harnessOverhead(runtime_dict)
+  if harness_overhead is not None:
+    runtime_dict['Harness Overhead'] = harness_overhead
+  manifest.record(runtime_dict, out_prefix)
+
+# Runs the rounds of one config of a clusterer, following the repetition
+# policy of repetition.py: warmup rounds are run first and discarded, and then
+# rounds are run until the policy is satisfied. The rounds are appended to
+# runtimes, with the summary of their Cluster Time. run_round(runtime_dict,
+# out_prefix) runs one round, whose output files are named out_prefix_base
+# followed by the round.
+def runRounds(manifest, clusterer, graph, thread, config, out_prefix_base, run_round, runtimes):
+  # With "Resume: true", rounds that completed in an earlier run are skipped.
+  resume = runner_utils.resume == "true" and runner_utils.postprocess_only != "true"
+  series = []
+  if runner_utils.postprocess_only == "true":
+    for i in repetition.recordedRounds(manifest, makeRuntimeDict(clusterer, graph, thread, config, None)):
+      runtime_dict = makeRuntimeDict(clusterer, graph, thread, config, i)
+      run_round(runtime_dict, out_prefix_base + str(i))
+      series.append(runtime_dict)
+      runtimes.append(runtime_dict)
+  else:
+    warmed_up = False
+    while repetition.needMoreRounds(series):
+      i = len(series)
+      runtime_dict = makeRuntimeDict(clusterer, graph, thread, config, i)
+      out_prefix = out_prefix_base + str(i)
+      if not (resume and manifest.restore(runtime_dict, out_prefix)):
+        # The warmup rounds are only run before a round that is run.
+        if not warmed_up:
+          for w in range(runner_utils.warmup_rounds):
+            round = "warmup" + str(w)
+            run_round(makeRuntimeDict(clusterer, graph, thread, config, round), out_prefix_base + round)
+          warmed_up = True
+        run_round(runtime_dict, out_prefix)
+      series.append(runtime_dict)
+      runtimes.append(runtime_dict)
+  repetition.addSummary(series)
+
+# Runs a list of (config, config name, out_prefix_base) configs of a native
+# PCBS clusterer on one graph with the same number of threads, in order. With
+# "Persistent worker: true", all rounds share one worker, started by the first
+# round that is run.
+def runPCBSJobs(manifest, clusterer, graph, thread, jobs, runtimes):
+  workers = []
+  try:
+    for config, config_name, out_prefix_base in jobs:
+      def runRound(runtime_dict, out_prefix, config=config):
+        if usesWorker(clusterer) and runner_utils.postprocess_only != "true" and not workers:
+          import cluster_worker
+          workers.append(cluster_worker.ClusterWorker(pcbsCommand(graph, thread) + " --worker_mode=true"))
+        worker = workers[0] if workers else None
+        runJob(manifest, runtime_dict, out_prefix, runPCBS, clusterer, graph, thread, config, out_prefix, runtime_dict, worker)
+      runRounds(manifest, clusterer, graph, thread, config_name, out_prefix_base, runRound, runtimes)
+  finally:
+    for worker in workers:
+      worker.close()
+
+# Whether the jobs of a native PCBS clusterer share a persistent worker: with
+# "Persistent worker: true", and for KCoreClusterer with "KCore threshold
+# sweep: true", so that its thresholds reuse the core decomposition kept by
+# the worker.
+def usesWorker(clusterer):
+  return (runner_utils.persistent_worker == "true" or
+          (clusterer == "KCoreClusterer" and runner_utils.kcore_threshold_sweep == "true"))
+
+def isPCBSClusterer(clusterer):
+  return not (clusterer.startswith("Snap") or clusterer.startswith("NetworKit") or
+              clusterer.startswith("Neo4j") or clusterer.startswith("TigerGraph") or
+              clusterer == "Tectonic")
+
+# Whether all rounds of all configs of a clusterer on a graph completed in an
+# earlier run and are restored with "Resume: true", so that none of them is
+# run.
+def allRoundsRecorded(manifest, clusterer, graph, graph_idx, configs):
+  if runner_utils.resume != "true":
+    return False
+  for thread in runner_utils.num_threads:
+    for config_idx, config in enumerate(configs):
+      out_prefix_base = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_"
+      series = []
+      while repetition.needMoreRounds(series):
+        runtime_dict = makeRuntimeDict(clusterer, graph, thread, config, len(series))
+        if not manifest.restore(runtime_dict, out_prefix_base + str(len(series))):
+          return False
+        series.append(runtime_dict)
+  return True
+
+def makeRuntimeDict(clusterer, graph, thread, config, round):
+  runtime_dict = {}
+  runtime_dict['Clusterer Name'] = clusterer
+  runtime_dict["Input Graph"] = graph
+  runtime_dict["Threads"] = thread
+  runtime_dict["Config"] = config
+  runtime_dict["Round"] = round
+  return runtime_dict
+
+# Submits the configs of a native PCBS clusterer to the scheduler, as one job
+# per config running all of its rounds. Each job reserves its number of
+# threads in cores ("ALL" reserves the whole machine). Configs sharing a
+# persistent worker are submitted as one job.
+def schedulePCBSJobs(scheduler, manifest, clusterer, graph, thread, jobs, runtimes):
+  cores = scheduler.num_cores if (thread == "" or thread == "ALL") else int(thread)
+  exclusive = clusterer in runner_utils.exclusive_clusterers
+  if usesWorker(clusterer):
+    scheduler.submit(runPCBSJobs, (manifest, clusterer, graph, thread, jobs, runtimes), cores, exclusive)
+  else:
+    for job in jobs:
+      scheduler.submit(runPCBSJobs, (manifest, clusterer, graph, thread, [job], runtimes), cores, exclusive)
+
+# Returns the (index, clusterer) pairs in the order they are run on a graph:
+# the order of the config, except that the NetworKit clusterers are run back
+# to back, where the first of them is, so that they all use the graph read
+# by the first run.
+def clustererOrder(clusterers):
+  networkit = [(idx, clusterer) for idx, clusterer in enumerate(clusterers) if clusterer.startswith("NetworKit")]
+  order = []
+  for idx, clusterer in enumerate(clusterers):
+    if not clusterer.startswith("NetworKit"):
+      order.append((idx, clusterer))
+    elif (idx, clusterer) == networkit[0]:
+      order += networkit
+  return order
+
+# Columns written to runtimes.csv in addition to the run information and
+# Cluster Time, if any run reported them.
+optional_runtime_columns = ([column for column in run_manifest.RECORD_COLUMNS if column != "Cluster Time"] +
+                            repetition.SUMMARY_COLUMNS + repetition.SCALING_COLUMNS)
+
+def runAll(config_filename, system_config_filename=None):
   runner_utils.readConfig(config_filename)
-  
+  if system_config_filename is not None:
+    runner_utils.readSystemConfig(system_config_filename)
+  if not os.path.exists(runner_utils.output_directory):
+    os.makedirs(runner_utils.output_directory)
+  manifest = run_manifest.RunManifest(runner_utils.output_directory)
+
+  # With "Parallel jobs: true", native PCBS jobs are collected and packed onto
+  # the machine after all other jobs have run one after another.
+  if runner_utils.postprocess_only != "true" and any(isPCBSClusterer(clusterer) for clusterer in runner_utils.clusterers if clusterer != "SKIP"):
+    # Build once up front, instead of going through bazel for every run.
+    runner_utils.getBinaryCommand("//clusterers:cluster-in-memory_main")
+  if runner_utils.postprocess_only != "true":
+    # Build the SNAP and Tectonic binaries once (they are skipped if built
+    # with the same compiler before), failing before any run if they do not build.
+    external_tools.prepare(external_tools.clustererTools(runner_utils.clusterers))
+  if runner_utils.postprocess_only != "true" and graph_cache.enabled():
+    # Convert the graphs up front, so that no run is timed with it.
+    for graph in runner_utils.graphs:
+      if graph == "SKIP":
+        continue
+      use_input_graph = runner_utils.input_directory + graph
+      if any(isPCBSClusterer(clusterer) for clusterer in runner_utils.clusterers if clusterer != "SKIP"):
+        graph_cache.getNativeInputGraph(use_input_graph)
+      if any(clusterer.startswith("NetworKit") for clusterer in runner_utils.clusterers) and not use_input_graph.endswith(".bin"):
+        graph_cache.getNetworKitBinary(use_input_graph)
+      if "Tectonic" in runner_utils.clusterers and runner_utils.tectonic_pipeline != "native":
+        graph_cache.getTectonicWeighted(use_input_graph)
+
+  scheduler = None
+  if runner_utils.parallel_jobs == "true" and runner_utils.postprocess_only != "true":
+    import scheduler as core_scheduler
+    scheduler = core_scheduler.CoreScheduler(runner_utils.num_cores)
+
   runtimes = []
   for graph_idx, graph in enumerate(runner_utils.graphs):
     if graph == "SKIP":
       continue
     neo4j_graph_loaded = False
+    # The Neo4j driver and GDS client of all runs on the graph.
+    neo4j_session = None
     tigergraph_loaded = False
     conn = None
-    for clusterer_idx, clusterer in enumerate(runner_utils.clusterers):
-      if clusterer == "SKIP":
-        continue
-      try:
-        if clusterer.startswith("Snap"):
-          if not os.path.exists(runner_utils.output_directory):
-            os.makedirs(runner_utils.output_directory)
-          for i in range(runner_utils.num_rounds):
-            runtime_dict = {}
-            runtime_dict['Clusterer Name'] = clusterer
-            runtime_dict["Input Graph"] = graph
-            runtime_dict["Threads"] = 1
-            runtime_dict["Config"] = ""
-            runtime_dict["Round"] = i
-            runSnap(clusterer, graph, graph_idx, i, runtime_dict)
-            runtimes.append(runtime_dict)
+    try:
+      for clusterer_idx, clusterer in clustererOrder(runner_utils.clusterers):
+        if clusterer == "SKIP":
           continue
-        for thread_idx, thread in enumerate(runner_utils.num_threads):
-          configs = runner_utils.clusterer_configs[clusterer_idx] if runner_utils.clusterer_configs[clusterer_idx] is not None else [""]
-          config_prefix = runner_utils.clusterer_config_names[clusterer_idx] + "{" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
-          config_postfix = "}" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
-          for config_idx, config in enumerate(configs):
-            for i in range(runner_utils.num_rounds):
-              runtime_dict = {}
-              runtime_dict['Clusterer Name'] = clusterer
-              runtime_dict["Input Graph"] = graph
-              runtime_dict["Threads"] = thread
-              runtime_dict["Config"] = config
-              runtime_dict["Round"] = i
-              out_prefix = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_" + str(i)
-              if not os.path.exists(runner_utils.output_directory):
-                os.makedirs(runner_utils.output_directory)
-              if clusterer.startswith("NetworKit"):
-                import cluster_nk
-                cluster_nk.runNetworKit(clusterer, graph, thread, config, out_prefix, runtime_dict)
-              elif clusterer == "Tectonic":
-                runTectonic(clusterer, graph, thread, config, out_prefix, runtime_dict)
-              elif clusterer.startswith("Neo4j"):
-                if int(thread) > 4:
-                  print("neo4j only run up to 4 threads")
-                  continue
-                if (not neo4j_graph_loaded) and (runner_utils.postprocess_only != "true"):
-                  use_input_graph = runner_utils.input_directory + graph
-                  import cluster_neo4j
-                  cluster_neo4j.projectGraph(graph, use_input_graph)
-                  neo4j_graph_loaded = True
-                weighted = runner_utils.weighted == "true"
-                runNeo4j(clusterer, graph, thread, config + ', num_rounds: ' + str(i), weighted, out_prefix, runtime_dict)
-              elif clusterer.startswith("TigerGraph"):
-                weighted = runner_utils.weighted == "true"
-                if (not tigergraph_loaded) and (runner_utils.postprocess_only != "true"):
-                  from pyTigerGraph import TigerGraphConnection
-                  import cluster_tg
-                  conn = TigerGraphConnection(
-                      host='http://127.0.0.1',
-                      username='tigergraph',
-                      password='tigergraph',
-                  )
-                  print("connected")
-                  cluster_tg.remove_tigergraph(conn)
-                  cluster_tg.load_tigergraph(conn, graph, runner_utils.input_directory, runner_utils.output_directory, runner_utils.tigergraph_nodes, runner_utils.tigergraph_edges, weighted)
-                  tigergraph_loaded = True
-                run_tigergraph(conn, clusterer, graph, thread, config, weighted, out_prefix, runtime_dict)
+        try:
+          if clusterer.startswith("Snap"):
+            runRounds(manifest, clusterer, graph, 1, "", runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_",
+                      lambda runtime_dict, out_prefix: runJob(manifest, runtime_dict, out_prefix, runSnap, clusterer, graph, graph_idx, runtime_dict["Round"], runtime_dict),
+                      runtimes)
+            continue
+          first_run = len(runtimes)
+          if clusterer.startswith("NetworKit") and runner_utils.networkit_scaling_warmup == "true" and runner_utils.postprocess_only != "true":
+            import cluster_nk
+            configs = runner_utils.clusterer_configs[clusterer_idx] if runner_utils.clusterer_configs[clusterer_idx] is not None else [""]
+            # The warmup is a job like the warmup rounds: it is subject to the
+            # timeout, and is recorded in the manifest (but not in runtimes.csv).
+            if not allRoundsRecorded(manifest, clusterer, graph, graph_idx, configs):
+              warmup_thread = max(runner_utils.num_threads, key=cluster_nk.threadCount)
+              warmup_dict = makeRuntimeDict(clusterer, graph, warmup_thread, configs[0], "scaling warmup")
+              runJob(manifest, warmup_dict, runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_scaling_warmup",
+                     cluster_nk.warmup, clusterer, graph, warmup_thread, configs[0], warmup_dict, in_process=True)
+          for thread_idx, thread in enumerate(runner_utils.num_threads):
+            configs = runner_utils.clusterer_configs[clusterer_idx] if runner_utils.clusterer_configs[clusterer_idx] is not None else [""]
+            config_prefix = runner_utils.clusterer_config_names[clusterer_idx] + "{" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
+            config_postfix = "}" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
+            if isPCBSClusterer(clusterer):
+              jobs = []
+              for config_idx, config in enumerate(configs):
+                out_prefix_base = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_"
+                full_config = config
+                if clusterer == "KCoreClusterer" and runner_utils.kcore_threshold_sweep == "true":
+                  full_config += (", " if config else "") + "reuse_core_decomposition: true"
+                jobs.append((config_prefix + full_config + config_postfix, config, out_prefix_base))
+              if scheduler is None:
+                runPCBSJobs(manifest, clusterer, graph, thread, jobs, runtimes)
               else:
-                out_filename = out_prefix + ".out"
-                out_clustering = out_prefix + ".cluster"
-                use_thread = "" if (thread == "" or thread == "ALL") else "PARLAY_NUM_THREADS=" + thread
-                use_input_graph = runner_utils.input_directory + graph
-                if (runner_utils.gbbs_format == "true" and "ungraph" in graph):
-                  print("warning: use gbbs format is true, but seems like snap format is used from graph file name")
-                ss = (use_thread + " " + runner_utils.timeout + " bazel run //clusterers:cluster-in-memory_main -- --"
-                "input_graph=" + use_input_graph + " --is_gbbs_format=" + runner_utils.gbbs_format + " --float_weighted=" + runner_utils.weighted + " --clusterer_name=" + clusterer + " "
-                "--clusterer_config='" + config_prefix + config + config_postfix + "' "
-                "--output_clustering=" + out_clustering)
-                if runner_utils.postprocess_only.lower() != "true":
-                  print(ss)
-                  out = runner_utils.shellGetOutput(ss)
-                  runner_utils.appendToFile(ss + "\n", out_filename)
-                  runner_utils.appendToFile(out, out_filename)
-                print("postprocessing... " + out_filename)
-                with open(out_filename,'r') as f:
-                  run_info = f.readlines()
-                  for elem in run_info[1:]:
-                    if elem.startswith('Cluster Time:'):
-                      runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
-              runtimes.append(runtime_dict)
-      except Exception as e:
-          # Print the stack trace
-          traceback.print_exc()
-    if neo4j_graph_loaded:
-      cluster_neo4j.clearDB(graph)
-    if tigergraph_loaded:
-      cluster_tg.remove_tigergraph(conn)
-    
-    runtime_dataframe = pd.DataFrame(runtimes)
-    if not os.path.exists(runner_utils.csv_output_directory):
-      os.makedirs(runner_utils.csv_output_directory)
-  runtime_dataframe.to_csv(runner_utils.csv_output_directory + '/runtimes.csv', mode='a',
-                             columns=["Clusterer Name","Input Graph","Threads","Config","Round","Cluster Time"])
+                schedulePCBSJobs(scheduler, manifest, clusterer, graph, thread, jobs, runtimes)
+              continue
+            if clusterer.startswith("Neo4j") and int(thread) > 4:
+              print("neo4j only run up to 4 threads")
+              continue
+            for config_idx, config in enumerate(configs):
+              # Runs one round of the config.
+              def runRound(runtime_dict, out_prefix):
+                nonlocal neo4j_graph_loaded, neo4j_session, tigergraph_loaded, conn
+                if clusterer.startswith("NetworKit"):
+                  import cluster_nk
+                  sweep_args = ()
+                  if clusterer == "NetworKitKCore" and runner_utils.kcore_threshold_sweep == "true":
+                    sweep_args = ([cluster_nk.parseKCoreThreshold(c) for c in configs], (graph, thread, str(runtime_dict["Round"])))
+                  runJob(manifest, runtime_dict, out_prefix, cluster_nk.runNetworKit, clusterer, graph, thread, config, out_prefix, runtime_dict, *sweep_args, in_process=True)
+                elif clusterer == "Tectonic":
+                  runJob(manifest, runtime_dict, out_prefix, runTectonic, clusterer, graph, thread, config, out_prefix, runtime_dict, configs,
+                         in_process=runner_utils.tectonic_pipeline == "native")
+                elif clusterer.startswith("Neo4j"):
+                  if (not neo4j_graph_loaded) and (runner_utils.postprocess_only != "true"):
+                    use_input_graph = runner_utils.input_directory + graph
+                    import cluster_neo4j
+                    # The graph is projected with a connection of its own, so
+                    # that the pooled session is opened within the timed job
+                    # of the run that reports its Connect Time.
+                    cluster_neo4j.projectGraph(graph, use_input_graph)
+                    neo4j_graph_loaded = True
+                  weighted = runner_utils.weighted == "true"
+                  # Opens the pooled session if needed (for the first run, and
+                  # after a timeout), and runs the round with it.
+                  def runNeo4jRound():
+                    nonlocal neo4j_session
+                    if neo4j_session is None and runner_utils.postprocess_only != "true":
+                      import cluster_neo4j
+                      neo4j_session = cluster_neo4j.Neo4jSession()
+                    runNeo4j(clusterer, graph, thread, config + ', num_rounds: ' + str(runtime_dict["Round"]), weighted, out_prefix, runtime_dict, neo4j_session)
+                  runJob(manifest, runtime_dict, out_prefix, runNeo4jRound, in_process=True)
+                  if runtime_dict.get("Status") == "TIMEOUT" and neo4j_session is not None:
+                    # The timeout interrupted a query, which leaves the
+                    # connection in an unknown state: the next run opens a new
+                    # session (the projected graph is kept).
+                    try:
+                      neo4j_session.close()
+                    except Exception:
+                      traceback.print_exc()
+                    neo4j_session = None
+                elif clusterer.startswith("TigerGraph"):
+                  weighted = runner_utils.weighted == "true"
+                  if (not tigergraph_loaded) and (runner_utils.postprocess_only != "true"):
+                    from pyTigerGraph import TigerGraphConnection
+                    import cluster_tg
+                    conn = TigerGraphConnection(
+                        host='http://127.0.0.1',
+                        username='tigergraph',
+                        password='tigergraph',
+                    )
+                    print("connected")
+                    cluster_tg.remove_tigergraph(conn)
+                    cluster_tg.load_tigergraph(conn, graph, runner_utils.input_directory, runner_utils.output_directory, runner_utils.tigergraph_nodes, runner_utils.tigergraph_edges, weighted)
+                    tigergraph_loaded = True
+                  runJob(manifest, runtime_dict, out_prefix, run_tigergraph, conn, clusterer, graph, thread, config, weighted, out_prefix, runtime_dict, in_process=True)
+              out_prefix_base = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_"
+              runRounds(manifest, clusterer, graph, thread, config, out_prefix_base, runRound, runtimes)
+          if clusterer.startswith("NetworKit") and runner_utils.networkit_thread_scaling == "true":
+            import cluster_nk
+            repetition.addScaling(runtimes[first_run:], cluster_nk.threadCount)
+        except Exception as e:
+            # Print the stack trace
+            traceback.print_exc()
+    finally:
+      # The graph data and connections are released even if the runner is
+      # interrupted (e.g., by KeyboardInterrupt).
+      try:
+        if neo4j_graph_loaded:
+          import cluster_neo4j
+          if neo4j_session is None:
+            neo4j_session = cluster_neo4j.Neo4jSession()
+          cluster_neo4j.clearDB(graph, neo4j_session)
+      finally:
+        if neo4j_session is not None:
+          neo4j_session.close()
+      if tigergraph_loaded:
+        import cluster_tg
+        cluster_tg.remove_tigergraph(conn)
+    if any(clusterer.startswith("NetworKit") for clusterer in runner_utils.clusterers) and runner_utils.postprocess_only != "true":
+      import cluster_nk
+      cluster_nk.releaseGraphs()
+      cluster_nk.clearSweeps()
+    if "Tectonic" in runner_utils.clusterers and runner_utils.tectonic_pipeline == "native" and runner_utils.postprocess_only != "true":
+      import cluster_tectonic
+      cluster_tectonic.clearSweeps()
 
+  if scheduler is not None:
+    scheduler.run()
+
+  runtime_dataframe = pd.DataFrame(runtimes)
+  if not os.path.exists(runner_utils.csv_output_directory):
+    os.makedirs(runner_utils.csv_output_directory)
+  columns = ["Clusterer Name","Input Graph","Threads","Config","Round","Cluster Time"]
+  columns += [column for column in optional_runtime_columns if column in runtime_dataframe.columns]
+  columns += run_manifest.addLegacyColumns(runtime_dataframe)
+  runtime_dataframe.to_csv(runner_utils.csv_output_directory + '/runtimes.csv', mode='a',
+                             columns=columns)
 
 
 def main():
   args = sys.argv[1:]
-  runAll(args[0])
+  runAll(args[0], args[1] if len(args) > 1 else None)
 
 if __name__ == "__main__":
   main()
\ No newline at end of file
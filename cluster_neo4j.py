@@ -3,47 +3,75 @@ import io
 import pandas
 import numpy as np
 import sys
+import traceback
 from graphdatascience import GraphDataScience
 from neo4j import GraphDatabase
 from contextlib import redirect_stdout
 import runner_utils
+import graph_cache
+import clustering_io
 
+'''
+Reads an edge list into NumPy arrays, with the C parser of pandas (see
+graph_cache.readEdgeList), instead of Python objects per edge.
+
+Output:
+the node ids (sorted int64 array), the source and target node ids of the
+edges in both directions (int64 arrays), and their weights (float64 array, or
+None if the edge list is unweighted)
+'''
 def readGraph(filename):
-  print_index = 1000000
-  index_track = 0
-  nodes = set()
-  edges_from = []
-  edges_to = []
-  weights = []
-  with open(filename, "r") as in_file:
-    for line in in_file:
-      if index_track % print_index == 0:
-        print("We're at: " + str(index_track))
-        sys.stdout.flush()
-      index_track = index_track + 1
-      line = line.strip()
-      if not line:
-        continue
-      if line[0] == '#':
-        continue
-      split = [x.strip() for x in line.split('\t')]
-      if split:
-        a = split[0]
-        b = split[1]
-        w = 1
-        if len(split) == 3:
-          w = split[2]
-          weights.append(float(w))
-          weights.append(float(w))
-        nodes.add(int(a))
-        nodes.add(int(b))
-        edges_from.append(int(a))
-        edges_to.append(int(b))
-        edges_from.append(int(b))
-        edges_to.append(int(a))
-        
+  src, dst, weights = graph_cache.readEdgeList(filename)
+  nodes = np.union1d(np.unique(src), np.unique(dst))
+  edges_from = np.concatenate([src, dst])
+  edges_to = np.concatenate([dst, src])
+  del src, dst
+  if weights is not None:
+    weights = np.concatenate([weights, weights])
   return nodes, edges_from, edges_to, weights
 
+NEO4J_URL = "bolt://localhost:7687"
+
+'''
+A driver and GDS client connected to the Neo4j server, reused by all runs on a
+graph (cluster.runAll keeps one per graph), together with the handles of the
+graphs it has looked up. The time taken to connect and look up graphs is
+reported once, by the next run (see takeConnectTime).
+'''
+class Neo4jSession:
+  def __init__(self):
+    start_time = time.time()
+    self.driver = GraphDatabase.driver(NEO4J_URL, auth=None, max_connection_lifetime=7200)
+    self.gds = GraphDataScience(self.driver, auth=None)
+    # The handshake: the first query of the client.
+    self.version = self.gds.version()
+    self.graphs = {}
+    self.connect_time = time.time() - start_time
+
+  '''
+  Returns the handle of a projected graph, or None if it does not exist.
+  '''
+  def graph(self, graph_name):
+    if graph_name not in self.graphs:
+      start_time = time.time()
+      graph_exists = self.gds.graph.exists(graph_name=graph_name)
+      if graph_exists.iloc[1]:
+        self.graphs[graph_name] = self.gds.graph.get(graph_name)
+      self.connect_time += time.time() - start_time
+    return self.graphs.get(graph_name)
+
+  '''
+  Returns the connect time that has not been reported by a run yet.
+  '''
+  def takeConnectTime(self):
+    connect_time = self.connect_time
+    self.connect_time = 0.0
+    return connect_time
+
+  def close(self):
+    self.gds.close()
+    self.driver.close()
+
 def appendToFile(out, filename):
   with open(filename, "a+") as out_file:
     out_file.writelines(out)
@@ -75,12 +103,30 @@ def getLoadGraphCommand(graph_path):
     cypher_node_commands_list.append("(A" + str(node) + ": A {id: "+ str(node)+" })") #
   return cypher_commands_list, cypher_node_commands_list
 
+# Removes the node property written by a mutate run from the projected graph,
+# if it exists.
+def dropMutateProperty(gds, G, mutate_property):
+  gds.graph.nodeProperties.drop(G, [mutate_property], failIfMissing=False)
+
 # first argument is input graph
 # second argument is louvain, modularity, or leiden; triangle
 # third argument is output clustering
 # default weight is unweighted
 
-def runNeo4j(graph_path, graph_name, algorithm_name, thread, config, weighted, out_clustering):
+# The run information (connect, cluster and write time, number of vertices
+# and clusters) is added to runtime_dict if it is given. The run uses session
+# if it is given, and connects to the server itself otherwise.
+# The algorithm is run in the execution mode given by "mode" in the config
+# ("Neo4j execution mode" by default). stream returns the community of each
+# node with the query, and its Cluster Time includes the transfer. mutate and
+# stats record the GDS Preprocessing, Compute and Postprocessing Millis
+# reported by the server, and the Cluster Time is the compute millis; mutate
+# then fetches the communities in a separately timed step (Fetch Time), and
+# stats writes no clustering. The communities are grouped into clusters
+# (Result Gather Time) and written (Write Time) by clustering_io.
+def runNeo4j(graph_path, graph_name, algorithm_name, thread, config, weighted, out_clustering, runtime_dict=None, session=None):
+  if runtime_dict is None:
+    runtime_dict = {}
   ## load configs
   threshold = None
   maxLevels = 10
@@ -89,6 +135,7 @@ def runNeo4j(graph_path, graph_name, algorithm_name, thread, config, weighted, o
   theta = 0.01
   minAssociationStrength = 0.2
   minCommunitySize = 0
+  mode = runner_utils.neo4j_execution_mode
   split = [x.strip() for x in config.split(',')]
   for config_item in split:
     config_split = [x.strip() for x in config_item.split(':')]
@@ -108,191 +155,297 @@ def runNeo4j(graph_path, graph_name, algorithm_name, thread, config, weighted, o
         theta = float(config_split[1])
       if config_split[0].startswith("minCommunitySize"):
         minCommunitySize = int(config_split[1])
+      if config_split[0] == "mode" and len(config_split) > 1 and config_split[1] != "":
+        mode = config_split[1]
+  if mode not in ["stream", "mutate", "stats"]:
+    raise ValueError("Unknown Neo4j execution mode: " + mode)
 
   f = io.StringIO()
   with redirect_stdout(f):
-    # Use Neo4j URI and credentials according to your setup
-    gds = GraphDataScience("bolt://localhost:7687", auth=None)
-    print("GDS version: ", gds.version())
-
-    # graph_name = graph_pre #+ "undir"
-    # graph_exists = gds.graph.exists(graph_name=graph_name)
-    # if graph_exists[1]: 
-    #   gds.graph.drop(gds.graph.get(graph_name))
-    graph_exists = gds.graph.exists(graph_name=graph_name)
-    if not graph_exists.iloc[1]:
+    own_session = session is None
+    if own_session:
+      session = Neo4jSession()
+    gds = session.gds
+    print("GDS version: ", session.version)
+
+    G = session.graph(graph_name)
+    runtime_dict["Connect Time"] = session.takeConnectTime()
+    print("Connect Time: " + str(runtime_dict["Connect Time"]))
+    if G is None:
+      if own_session:
+        session.close()
       print("error, graph does not exist")
       return "error, graph does not exist"
 
-    G = gds.graph.get(graph_name)
     print("database: ", G.database())
     # print(G.node_count())
 
     print("Finished loading graph")
     print("Relationship count: " + str(G.relationship_count()))
 
-    stream_flag = True
     community_flag = False
     component_flag = False
     overlapping_community_flag = False
-    mutateProperty = ""
-    print("Graph: ", graph_name,  ", Alg.: ", algorithm_name)
+    print("Graph: ", graph_name,  ", Alg.: ", algorithm_name, ", Mode: ", mode)
     sys.stdout.flush()
     relationshipWeightProperty = "weight" if weighted else None
-    stream_kwargs = {
+    alg_kwargs = {
       "concurrency": thread, 
       "relationshipWeightProperty": relationshipWeightProperty
     }
-    start_time = time.time()
-    res = None
     if (algorithm_name.startswith("Louvain")):
       community_flag = True
-      stream_kwargs["maxLevels"]=maxLevels
-      stream_kwargs["maxIterations"]=maxIterations
-      mutate_kwargs = stream_kwargs.copy()
-
-      if stream_flag:
-        res = gds.louvain.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "louvaincommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.louvain.mutate(G, **mutate_kwargs)
+      alg_kwargs["maxLevels"]=maxLevels
+      alg_kwargs["maxIterations"]=maxIterations
+      endpoint = gds.louvain
     elif (algorithm_name.startswith("Leiden")):
       community_flag = True
-      stream_kwargs["maxLevels"]=maxLevels
-      stream_kwargs["gamma"]=gamma
-      stream_kwargs["theta"]=theta
-      mutate_kwargs = stream_kwargs.copy()
-
-      if stream_flag:
-        res = gds.leiden.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "leidencommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.leiden.mutate(G, **mutate_kwargs)
+      alg_kwargs["maxLevels"]=maxLevels
+      alg_kwargs["gamma"]=gamma
+      alg_kwargs["theta"]=theta
+      endpoint = gds.leiden
     elif algorithm_name.startswith("Connectivity"):
       component_flag = True
-      stream_kwargs["threshold"] = threshold
-      mutate_kwargs = stream_kwargs.copy()
-      if stream_flag:
-        res = gds.wcc.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "connectivitycommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.wcc.mutate(G, **mutate_kwargs)
+      alg_kwargs["threshold"] = threshold
+      endpoint = gds.wcc
     elif algorithm_name.startswith("KCore"):
-      mutate_kwargs = stream_kwargs.copy()
-      if stream_flag:
-        res = gds.kcore.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "kcorecommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.kcore.mutate(G, **mutate_kwargs)
+      endpoint = gds.kcore
     elif algorithm_name.startswith("ModularityOptimization"):
       community_flag = True
-      stream_kwargs["maxIterations"]=maxIterations
-      mutate_kwargs = stream_kwargs.copy()
-      if stream_flag:
-        res = gds.modularityOptimization.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "modularityOptimizationcommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.modularityOptimization.mutate(G, **mutate_kwargs)
+      alg_kwargs["maxIterations"]=maxIterations
+      endpoint = gds.modularityOptimization
     elif algorithm_name.startswith("LabelPropagation"):
       community_flag = True
-      stream_kwargs["maxIterations"]=maxIterations
-      stream_kwargs["minCommunitySize"]=minCommunitySize
-      mutate_kwargs = stream_kwargs.copy()
-      if stream_flag:
-        res = gds.labelPropagation.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "labelpropagationcommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.labelPropagation.mutate(G, **mutate_kwargs)
+      alg_kwargs["maxIterations"]=maxIterations
+      alg_kwargs["minCommunitySize"]=minCommunitySize
+      endpoint = gds.labelPropagation
     elif algorithm_name.startswith("SLPA"):
       overlapping_community_flag = True
-      stream_kwargs["maxIterations"]=maxIterations
-      stream_kwargs["minAssociationStrength"]=minAssociationStrength
-      mutate_kwargs = stream_kwargs.copy()
-      if stream_flag:
-        res = gds.alpha.sllpa.stream(G, **stream_kwargs)
-      else:
-        mutateProperty = "SLPAcommunity" + config + str(thread)
-        mutate_kwargs["mutateProperty"] = mutateProperty
-        res = gds.labelPropagation.mutate(G, **mutate_kwargs)
+      alg_kwargs["maxIterations"]=maxIterations
+      alg_kwargs["minAssociationStrength"]=minAssociationStrength
+      endpoint = gds.alpha.sllpa
     else:
       print("The algorithm ", algorithm_name, " is not available")
       raise Exception("The algorithm " + algorithm_name + " is not available")
-    end_time = time.time()
-    print(stream_kwargs)
-    # print(res)
-    # node1 = gds.find_node_id(["A"], {"id": 0})
-    # node2 = gds.find_node_id(["A"], {"id": 1})
-    # print(node1, node2)
-    print("Time: " + str(end_time - start_time))
-    if not stream_flag:
-      print("Preprocessing millis: " + str(res["preProcessingMillis"]))
-      print("Compute millis: " + str(res["computeMillis"]))
-      print("Postprocessing millis: " + str(res["postProcessingMillis"]))
-    sys.stdout.flush()
-    result = None
-    if not stream_flag:
-      if algorithm_name.startswith("triangle"):
-        print("Triangle count: " + str(res["globalTriangleCount"]))
-        print("Node count: " + str(res["nodeCount"]))
-        sys.stdout.flush()
-      if (community_flag):
-        print("Community count: " + str(res["communityCount"]))
-        print("Modularity: " + str(res["modularity"]))
-        sys.stdout.flush()
-      if (component_flag):
-        # pass
-        print("Community count: " + str(res["componentCount"]))
-        # print(G.node_properties())
+    # The property is removed once it is fetched (or the run fails), so that
+    # the runs of all configs and rounds can use the same name. A property
+    # left by an interrupted run, or by an earlier runner process, is removed
+    # first.
+    mutateProperty = "pcbs" + algorithm_name + "Community"
+    if mode == "mutate":
+      alg_kwargs["mutateProperty"] = mutateProperty
+      dropMutateProperty(gds, G, mutateProperty)
+    try:
       start_time = time.time()
-      result_df = gds.graph.nodeProperty.stream(G, node_properties=mutateProperty)
+      res = getattr(endpoint, mode)(G, **alg_kwargs)
       end_time = time.time()
-      print("Gather result Time: " + str(end_time - start_time))
-      result = result_df.groupby("propertyValue")['nodeId'].apply(list).tolist()
-      # result.to_csv(out_clustering, index=False)
-    else:
-      # res.to_csv(out_clustering, index=False)
-      # Group the nodeId values by componentId and convert to a list
-      if (component_flag):
-        result = res.groupby('componentId')['nodeId'].apply(list).tolist()
-      if (community_flag):
-        result = res.groupby('communityId')['nodeId'].apply(list).tolist()
-      if overlapping_community_flag:
-        res['communityIds'] = res['values'].apply(lambda x: x['communityIds'])
-        res_exploded = res.explode('communityIds', ignore_index=True)
-        result = res_exploded.groupby('communityIds')['nodeId'].apply(list).tolist()
-    
-    if not (result is None):
-      for cluster_list in result:
-        runner_utils.appendToFile("\t".join(str(x) for x in cluster_list) + "\n", out_clustering)
+      print(alg_kwargs)
+      print("Time: " + str(end_time - start_time))
+      runtime_dict["Num Vertices"] = G.node_count()
+      if mode == "stream":
+        runtime_dict["Cluster Time"] = end_time - start_time
+      else:
+        # The time measured by GDS, without sending the query and its summary
+        # over Bolt, as the Cluster Time of PCBS.
+        runtime_dict["GDS Preprocessing Millis"] = int(res["preProcessingMillis"])
+        runtime_dict["GDS Compute Millis"] = int(res["computeMillis"])
+        runtime_dict["GDS Postprocessing Millis"] = int(res["postProcessingMillis"])
+        runtime_dict["Cluster Time"] = runtime_dict["GDS Compute Millis"] / 1000.0
+        print("Preprocessing millis: " + str(res["preProcessingMillis"]))
+        print("Compute millis: " + str(res["computeMillis"]))
+        print("Postprocessing millis: " + str(res["postProcessingMillis"]))
+        if (community_flag):
+          print("Community count: " + str(res["communityCount"]))
+          if "modularity" in res:
+            print("Modularity: " + str(res["modularity"]))
+        if (component_flag):
+          print("Community count: " + str(res["componentCount"]))
+      sys.stdout.flush()
+      result_df = None
+      if mode == "mutate":
+        start_time = time.time()
+        result_df = gds.graph.nodeProperty.stream(G, node_properties=mutateProperty)
+        runtime_dict["Fetch Time"] = time.time() - start_time
+        print("Fetch Time: " + str(runtime_dict["Fetch Time"]))
+        cluster_column = "propertyValue"
+      elif mode == "stream":
+        result_df = res
+        if (component_flag):
+          cluster_column = "componentId"
+        if (community_flag):
+          cluster_column = "communityId"
+        if overlapping_community_flag:
+          result_df["communityIds"] = result_df["values"].map(lambda x: x["communityIds"])
+          cluster_column = "communityIds"
+      else:
+        # Stats only returns the summary of the clustering.
+        for count in ["communityCount", "componentCount"]:
+          if count in res:
+            runtime_dict["Num Clusters"] = int(res[count])
+    finally:
+      if mode == "mutate":
+        try:
+          dropMutateProperty(gds, G, mutateProperty)
+        except Exception:
+          # E.g., the run was interrupted by the timeout; the property is
+          # removed before the next run instead.
+          traceback.print_exc()
+
+    if result_df is not None and (community_flag or component_flag or overlapping_community_flag):
+      start_time = time.time()
+      result_df["nodeId"] = originalIds(graph_name, result_df["nodeId"].to_numpy())
+      offsets, ids = clustering_io.groupFrame(result_df, "nodeId", cluster_column, overlapping_community_flag)
+      runtime_dict["Result Gather Time"] = time.time() - start_time
+      print("Result Gather Time: " + str(runtime_dict["Result Gather Time"]))
+      start_time = time.time()
+      clustering_io.writeClustering(out_clustering, offsets, ids)
+      runtime_dict["Num Clusters"] = len(offsets) - 1
+      runtime_dict["Write Time"] = time.time() - start_time
+      print("Write Time: " + str(runtime_dict["Write Time"]))
 
     sys.stdout.flush()
-    gds.close()
+    if own_session:
+      session.close()
   out = f.getvalue()
   return out
 
-def clearDB(graph_name):
-  gds = GraphDataScience("bolt://localhost:7687", auth=None)
-  _ = gds.run_cypher("MATCH (n) DETACH DELETE n")
-  graph_exists = gds.graph.exists(graph_name=graph_name)
-  if graph_exists.iloc[1]: 
-    gds.graph.drop(gds.graph.get(graph_name))
-  gds.close()
+def clearDB(graph_name, session=None):
+  own_session = session is None
+  if own_session:
+    session = Neo4jSession()
+  gds = session.gds
+  clearGraphData(gds)
+  G = session.graph(graph_name)
+  if G is not None:
+    gds.graph.drop(G)
+  session.graphs.pop(graph_name, None)
+  projected_ids.pop(graph_name, None)
+  if own_session:
+    session.close()
   print("Neo4j graph removed", graph_name)
 
+'''
+Deletes the :EDGE relationships and :A nodes created by loadChunks from the
+database, in transactions of "Neo4j chunk size" rows, so that deleting a large
+graph does not build one transaction holding all of it. CALL { ... } IN
+TRANSACTIONS is only allowed in an auto-commit transaction, which is how
+run_cypher runs its queries.
+'''
+def clearGraphData(gds):
+  batch_size = str(int(runner_utils.neo4j_chunk_size))
+  gds.run_cypher("MATCH (:A)-[r:EDGE]->(:A) CALL { WITH r DELETE r } IN TRANSACTIONS OF " + batch_size + " ROWS")
+  gds.run_cypher("MATCH (n:A) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF " + batch_size + " ROWS")
+
+# The original ids of the nodes of the graphs projected from the database
+# ("Neo4j projection: chunked"), by graph name: the GDS node ids, sorted, and
+# the original id of each of them.
+projected_ids = {}
+
+'''
+Records the original ids of the nodes of a graph projected from the database,
+from its id node property. Raises an error if the projection has no id
+property (e.g., it was constructed by another runner with "Neo4j projection:
+construct").
+'''
+def recordProjectedIds(gds, graph_name, G):
+  try:
+    ids = gds.graph.nodeProperty.stream(G, "id")
+  except Exception as e:
+    raise ValueError("The projected graph " + graph_name + " has no id node property; "
+                     "drop it (cluster_neo4j.py delete) and project it again") from e
+  gds_ids = ids["nodeId"].to_numpy(dtype=np.int64)
+  order = np.argsort(gds_ids)
+  projected_ids[graph_name] = (gds_ids[order], ids["propertyValue"].to_numpy(dtype=np.int64)[order])
+
+'''
+Returns the original ids of GDS node ids of a graph. With "Neo4j projection:
+chunked", raises an error if the original ids of the graph were not recorded,
+instead of returning the GDS ids.
+'''
+def originalIds(graph_name, node_ids):
+  if graph_name not in projected_ids:
+    if runner_utils.neo4j_projection == "chunked":
+      raise ValueError("The original ids of the nodes of " + graph_name + " were not recorded")
+    return node_ids
+  gds_ids, ids = projected_ids[graph_name]
+  return ids[np.searchsorted(gds_ids, node_ids)]
+
+'''
+Creates the nodes and edges of an edge list in the database, reading and
+sending it in chunks of "Neo4j chunk size" edges with batched UNWIND queries,
+so that the memory used by the client is bounded by the chunk size. Prints the
+throughput of each chunk. Returns whether the edges are weighted.
+
+The nodes and edges of an earlier load (e.g., of an interrupted run, or of
+another graph) are deleted first, so that a reload never duplicates edges.
+'''
+def loadChunks(gds, graph_path):
+  clearGraphData(gds)
+  gds.run_cypher("CREATE INDEX node_id IF NOT EXISTS FOR (n:A) ON (n.id)")
+  gds.run_cypher("CALL db.awaitIndexes()")
+  weighted = False
+  total_edges = 0
+  total_time = 0
+  for chunk_idx, (src, dst, weights) in enumerate(graph_cache.readEdgeListChunks(graph_path, runner_utils.neo4j_chunk_size)):
+    start_time = time.time()
+    gds.run_cypher("UNWIND $ids AS id MERGE (:A {id: id})", {"ids": np.union1d(src, dst).tolist()})
+    # Both directions of each edge, as passed to gds.graph.construct.
+    params = {"src": np.concatenate([src, dst]).tolist(), "dst": np.concatenate([dst, src]).tolist()}
+    edge = "[:EDGE]"
+    if weights is not None:
+      weighted = True
+      params["weight"] = np.concatenate([weights, weights]).tolist()
+      edge = "[:EDGE {weight: $weight[i]}]"
+    gds.run_cypher("UNWIND range(0, size($src) - 1) AS i "
+                   "MATCH (a:A {id: $src[i]}), (b:A {id: $dst[i]}) "
+                   "CREATE (a)-" + edge + "->(b)", params)
+    chunk_time = time.time() - start_time
+    total_edges += len(src)
+    total_time += chunk_time
+    print("Chunk %d: %d edges in %f s (%f edges/sec)" % (chunk_idx, len(src), chunk_time, len(src) / max(chunk_time, 1e-9)))
+    sys.stdout.flush()
+  print("Loaded %d edges in %f s (%f edges/sec)" % (total_edges, total_time, total_edges / max(total_time, 1e-9)))
+  return weighted
+
+'''
+Projects a graph loaded into the database by loadChunks, and records the
+original ids of its nodes.
+'''
+def projectChunks(gds, graph_name, graph_path):
+  relationship_projection = {"orientation": "UNDIRECTED"}
+  if loadChunks(gds, graph_path):
+    relationship_projection["properties"] = "weight"
+  G, _ = gds.graph.project(graph_name, {"A": {"properties": "id"}}, {"EDGE": relationship_projection})
+  recordProjectedIds(gds, graph_name, G)
+  return G
+
 # the graph projected is undirected.
-def projectGraph(graph_name, graph_path):
-    # Use Neo4j URI and credentials according to your setup
-  neo4j_url = "bolt://localhost:7687"
-  neo4j_client = GraphDatabase.driver(neo4j_url, auth=None, max_connection_lifetime=7200)
-  gds = GraphDataScience(neo4j_client, auth=None) #"bolt://localhost:7687"
-  graph_exists = gds.graph.exists(graph_name=graph_name)
-  if not graph_exists.iloc[1]:
+# With "Neo4j projection: chunked", the graph is loaded into the database in
+# chunks and projected from it (see loadChunks), instead of being read into
+# memory at once and constructed by gds.graph.construct.
+# The projection uses session if it is given, and connects to the server
+# itself otherwise.
+def projectGraph(graph_name, graph_path, session=None):
+  own_session = session is None
+  if own_session:
+    session = Neo4jSession()
+  gds = session.gds
+  graph_exists = session.graph(graph_name) is not None
+  if graph_exists and runner_utils.neo4j_projection == "chunked" and graph_name not in projected_ids:
+    # Projected by an earlier runner process, whose original ids are not in
+    # memory.
+    recordProjectedIds(gds, graph_name, session.graph(graph_name))
+  if not graph_exists and runner_utils.neo4j_projection == "chunked":
+    start_time = time.time()
+    G = projectChunks(gds, graph_name, graph_path)
+    session.graphs[graph_name] = G
+    print("Reading Time: " + str(time.time() - start_time))
+    print("Node Count: ", G.node_count())
+    sys.stdout.flush()
+    if own_session:
+      session.close()
+    return True
+  if not graph_exists:
     # cypher_commands_list, cypher_node_commands_list = getLoadGraphCommand(graph_path)
     # print("Finished loading in memory")
     # sys.stdout.flush()
@@ -309,18 +462,22 @@ def projectGraph(graph_name, graph_path):
     # sys.stdout.flush()
 
     # gds.run_cypher("CALL gds.graph.project(\'" + graph_name + "\', \'*\', {EDGE: {orientation: \'UNDIRECTED\', properties: ['weight']}})")
-    nodes_set, edges_from, edges_to, weights = readGraph(graph_path)
+    start_time = time.time()
+    node_ids, edges_from, edges_to, weights = readGraph(graph_path)
     nodes_dict = {}
-    nodes_dict["nodeId"] = list(nodes_set)
+    nodes_dict["nodeId"] = node_ids
     relationships_dict = {}
     relationships_dict["sourceNodeId"] = edges_from
     relationships_dict["targetNodeId"] = edges_to
-    rel_type_list = ["EDGE"] * len(edges_from)
-    relationships_dict["relationshipType"] = rel_type_list
-    if len(weights) > 0:
+    # One byte per edge, instead of a string per edge.
+    relationships_dict["relationshipType"] = pandas.Categorical.from_codes(
+        np.zeros(len(edges_from), dtype=np.int8), categories=["EDGE"])
+    if weights is not None:
       relationships_dict["weight"] = weights
-    nodes = pandas.DataFrame(nodes_dict)
-    relationships = pandas.DataFrame(relationships_dict)
+    nodes = pandas.DataFrame(nodes_dict, copy=False)
+    relationships = pandas.DataFrame(relationships_dict, copy=False)
+    del node_ids, edges_from, edges_to, weights
+    print("File Reading Time: " + str(time.time() - start_time))
 
     print("Finish loading in memory")
     sys.stdout.flush()
@@ -345,11 +502,14 @@ def projectGraph(graph_name, graph_path):
     print("Reading Time: " + str(end_time - start_time))
     print("Node Count: ", G.node_count())
 
+    session.graphs[graph_name] = G
     print("Finished cypher")
     sys.stdout.flush()
-    gds.close()
+    if own_session:
+      session.close()
     return True
-  gds.close()
+  if own_session:
+    session.close()
   return False
 
 
@@ -1,7 +1,11 @@
 import networkit as nk
+import numpy as np
 import runner_utils
+import graph_cache
+import clustering_io
 import time
 import io
+import collections
 from contextlib import redirect_stdout
 import os
 import sys
@@ -131,19 +135,17 @@ def runNetworKitConnectivity(G, config):
   with redirect_stdout(f):
     print(config)
     start_time = time.time()
-    # returns type List[List[int]], each nested list is a cluster, i.e. conencted component
+    # Each component is a subset of the returned partition.
     cc = nk.components.ParallelConnectedComponents(G, False)
     cc.run()
-    clusters = cc.getComponents()
+    communities = cc.getPartition()
     end_time = time.time()
     print("Communities detected in %f \n" % (end_time - start_time))
   out = f.getvalue()
-  return out, clusters
+  return out, communities
 
 
-def runNetworKitKCore(G, config):
-  # The graph may not contain self-loops.
-  f = io.StringIO()
+def parseKCoreThreshold(config):
   k = 0
   split = [x.strip() for x in config.split(',')]
   for config_item in split:
@@ -153,37 +155,88 @@ def runNetworKitKCore(G, config):
         k = int(config_split[1])
   if k == 0:
     raise RuntimeError("k must be set.")
-  run_connectivity = True
-  clusters = []
+  return k
+
+'''
+Returns the cluster of each node of G, given the core number of each node:
+the connected components of the k-core, and a separate cluster for each node
+that is not in the k-core.
+'''
+def kCoreClusters(G, cores, k):
+  in_core = cores >= k
+  C = nk.graphtools.subgraphFromNodes(G, np.flatnonzero(in_core).tolist())
+  cc = nk.components.ParallelConnectedComponents(C, False)
+  cc.run()
+  # C keeps the node ids of G.
+  subsets = np.asarray(cc.getPartition().getVector())[:len(cores)]
+  offset = int(subsets[in_core].max()) + 1 if in_core.any() else 0
+  clusters = np.arange(len(cores)) + offset
+  clusters[in_core] = subsets[in_core]
+  return clusters
+
+def runNetworKitKCore(G, config):
+  # The graph may not contain self-loops.
+  f = io.StringIO()
+  k = parseKCoreThreshold(config)
   with redirect_stdout(f):
     start_time = time.time()
     coreDec = nk.centrality.CoreDecomposition(G)
     coreDec.run()
-    if run_connectivity:
-      cores = coreDec.scores()
-      kCore = []
-      other_nodes = []
-      try:
-        for index, score in enumerate(cores):
-          if score >= k:
-            kCore.append(index)
-          else:
-            other_nodes.append(index)
-      except IndexError:
-          raise RuntimeError("There is no core for the specified k")
-
-      C = nk.graphtools.subgraphFromNodes(G, kCore)
-      cc = nk.components.ParallelConnectedComponents(C, False)
-      cc.run()
-      clusters = cc.getComponents()
-      # nodes that are not in the core are in their separate connected component.
-      for i in other_nodes:
-        clusters.append([i])
+    clusters = kCoreClusters(G, np.asarray(coreDec.scores()), k)
     end_time = time.time()
     print("Communities detected in %f \n" % (end_time - start_time))
   out = f.getvalue()
   return out, clusters
 
+# The clusterings computed by k-core sweeps that have not been used by their
+# run yet, by (graph, threads, round) and k: the path of the clustering and its
+# run information.
+kcore_sweep_results = {}
+
+'''
+Runs the k-core sweep of a round: computes the core decomposition once, and
+the connected k-cores of all thresholds from it, and writes them next to
+out_prefix, to be moved into place by the runs of the thresholds. The sweep is
+computed by the run of threshold k, which records the decomposition and the
+clustering of the other thresholds as its Preprocess Time, so that its phases
+add up to the work it did; the runs of the other thresholds record a
+Preprocess Time of 0.
+'''
+def runKCoreSweep(G, thresholds, k, out_prefix, sweep_key):
+  start_time = time.time()
+  coreDec = nk.centrality.CoreDecomposition(G)
+  coreDec.run()
+  cores = np.asarray(coreDec.scores())
+  preprocess_time = time.time() - start_time
+  results = {}
+  for threshold in sorted(set(thresholds) | {k}, reverse=True):
+    start_time = time.time()
+    clusters = kCoreClusters(G, cores, threshold)
+    run_info = {'Preprocess Time': 0.0, 'Cluster Time': time.time() - start_time}
+    sweep_clustering = None
+    if runner_utils.write_clustering != "false":
+      sweep_clustering = clustering_io.outputClusteringPath(out_prefix + ".sweep" + str(len(results)))
+      with runner_utils.timePhase(run_info, "Compact"):
+        offsets, ids = clustering_io.groupByCluster(np.arange(len(clusters)), clusters)
+      with runner_utils.timePhase(run_info, "Write"):
+        clustering_io.writeClustering(sweep_clustering, offsets, ids)
+      run_info['Num Clusters'] = len(offsets) - 1
+    if threshold != k:
+      preprocess_time += sum(run_info.get(name + ' Time', 0.0) for name in ["Cluster", "Compact", "Write"])
+    results[threshold] = (sweep_clustering, run_info)
+  results[k][1]['Preprocess Time'] = preprocess_time
+  kcore_sweep_results[sweep_key] = results
+
+'''
+Removes the clusterings of k-core sweeps that were not used by a run.
+'''
+def clearSweeps():
+  for results in kcore_sweep_results.values():
+    for sweep_clustering, _ in results.values():
+      if sweep_clustering is not None and os.path.exists(sweep_clustering):
+        os.remove(sweep_clustering)
+  kcore_sweep_results.clear()
+
 
 def extractNetworKitTime(out):
   split = [x.strip() for x in out.split('\n')]
@@ -196,98 +249,227 @@ def extractNetworKitTime(out):
 def is_bin_extension(filename):
     return os.path.splitext(filename)[1].lower() == '.bin'
 
-def runNetworKit(clusterer, graph, thread, config, out_prefix, runtime_dict):
+# Graphs read by runNetworKit, kept in memory for later runs on the same graph,
+# least recently used first: (path, size, modification time) of the input
+# graph -> (Graph, estimated size in bytes, read times not reported by a run
+# yet or None).
+loaded_graphs = collections.OrderedDict()
+
+def graphIdentity(graph_path):
+  stat = os.stat(graph_path)
+  return (os.path.abspath(graph_path), stat.st_size, stat.st_mtime_ns)
+
+# Estimates the memory used by a graph: NetworKit stores every edge in the
+# adjacency arrays of both of its endpoints (out and in edges if directed),
+# as a 64-bit node id and, if present, a weight and an edge id.
+def graphBytes(G):
+  per_edge = 8 + (8 if G.isWeighted() else 0) + (8 if G.hasEdgeIds() else 0)
+  return 2 * G.numberOfEdges() * per_edge + 64 * G.upperNodeIdBound()
+
+def graphCacheLimit():
+  if runner_utils.networkit_graph_cache_size is not None:
+    return runner_utils.networkit_graph_cache_size
+  return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 4
+
+'''
+Returns the path of the NetworkitBinary conversion of an edge list next to
+it, or None if "NetworKit binary" is not "input" or the directory of the edge
+list is not writable.
+'''
+def binaryPath(graph_path):
+  if runner_utils.networkit_binary != "input" or not os.access(os.path.dirname(os.path.abspath(graph_path)), os.W_OK):
+    return None
+  return graph_path + ".networkit.bin"
+
+def isCurrent(binary_path, graph_path):
+  return os.path.exists(binary_path) and os.path.getmtime(binary_path) >= os.path.getmtime(graph_path)
+
+def readBinary(binary_path, times):
+  start_time = time.time()
+  G = nk.readGraph(binary_path, nk.Format.NetworkitBinary)
+  times['Binary Read Time'] = time.time() - start_time
+  return G
+
+'''
+Reads a graph, and returns it with the times taken: Text Read Time or Binary
+Read Time, and Preprocess Time for converting an edge list to NetworkitBinary.
+
+With "NetworKit binary: true", an edge list is converted to NetworkitBinary
+by the first run on it, and later runs read the conversion instead. The
+conversion is stored in the graph cache directory (see graph_cache.py). With
+"NetworKit binary: input", it is stored next to the edge list instead, as
+long as its directory is writable, and converted again when the edge list is
+newer.
+'''
+def readGraph(graph_path):
+  times = {}
+  if(is_bin_extension(graph_path)):
+    return readBinary(graph_path, times), times
+  binary_path = binaryPath(graph_path)
+  if graph_cache.enabled() or (runner_utils.networkit_binary in ["true", "input"] and binary_path is None):
+    start_time = time.time()
+    binary_path = graph_cache.getNetworKitBinary(graph_path)
+    times['Preprocess Time'] = time.time() - start_time
+    return readBinary(binary_path, times), times
+  if binary_path is not None and isCurrent(binary_path, graph_path):
+    return readBinary(binary_path, times), times
+  start_time = time.time()
+  reader = nk.graphio.EdgeListReader('\t', 0, commentPrefix='#', directed=False) #continuous=False,
+  G = reader.read(graph_path)
+  times['Text Read Time'] = time.time() - start_time
+  if binary_path is not None:
+    start_time = time.time()
+    # Written under a temporary name, so that an interrupted conversion is
+    # never read.
+    tmp_path = binary_path + ".tmp" + str(os.getpid())
+    nk.graphio.writeGraph(G, tmp_path, nk.Format.NetworkitBinary)
+    os.replace(tmp_path, binary_path)
+    times['Preprocess Time'] = time.time() - start_time
+  return G, times
+
+'''
+Returns a graph and the times taken to read it (see readGraph), or a Read Time
+of 0 if it was already in memory. The read times of a graph read for a run
+that is not measured (e.g., a warmup) are returned to the next measured run
+instead. Graphs are kept in memory until their estimated size exceeds
+"NetworKit graph cache size", and then the least recently used graphs are
+evicted.
+'''
+def getGraph(graph_path, measured=True):
+  identity = graphIdentity(graph_path)
+  if identity in loaded_graphs:
+    loaded_graphs.move_to_end(identity)
+    G, size, pending_times = loaded_graphs[identity]
+    if measured and pending_times is not None:
+      loaded_graphs[identity] = (G, size, None)
+      return G, pending_times
+    return G, {'Read Time': 0.0}
+  G, times = readGraph(graph_path)
+  times['Read Time'] = times.get('Text Read Time', 0.0) + times.get('Binary Read Time', 0.0)
+  loaded_graphs[identity] = (G, graphBytes(G), None if measured else times)
+  limit = graphCacheLimit()
+  while loaded_graphs and sum(entry[1] for entry in loaded_graphs.values()) > limit:
+    loaded_graphs.popitem(last=False)
+  return G, times
+
+def releaseGraphs():
+  loaded_graphs.clear()
+
+# The number of threads NetworKit uses by default, which runs with "ALL"
+# threads use.
+default_threads = nk.getMaxNumberOfThreads()
+
+def threadCount(thread):
+  return default_threads if (thread == "" or thread == "ALL") else int(thread)
+
+'''
+Runs a clusterer on a graph.
+
+Output:
+the output of the clusterer, with its time, and the clusters it found: either
+a Partition (communities) or the cluster of each node (clusters)
+'''
+def runAlgorithm(clusterer, G, config):
+  communities = clusters = None
+  # This is k-core with a thresholding argument (double-check)
+  #nk.community.kCoreCommunityDetection(G, k, algo=None, inspect=False)
+  if (clusterer == "NetworKitPLM"):
+    print_time, communities = runNetworKitPLM(G, config)
+  elif (clusterer == "NetworKitPLP"):
+    print_time, communities = runNetworKitPLP(G, config)
+  elif (clusterer == "NetworKitLPDegreeOrdered"):
+    print_time, communities = runNetworKitLPDegreeOrdered(G, config)
+  elif (clusterer == "NetworKitParallelLeiden"):
+    print_time, communities = runNetworKitParallelLeiden(G, config)
+  elif (clusterer == "NetworKitConnectivity"):
+    print_time, communities = runNetworKitConnectivity(G, config)
+  elif (clusterer == "NetworKitKCore"):
+    print_time, clusters = runNetworKitKCore(G, config)
+  else:
+    raise ValueError("NetworKit clusterer not supported")
+  return print_time, communities, clusters
+
+'''
+Runs a clusterer once on a graph with a number of threads, without writing a
+clustering, so that the runs after it are measured with the graph in memory
+and the threads of NetworKit started. The graph read by the warmup is
+reported by the first run; runtime_dict gets the Cluster Time of the warmup.
+'''
+def warmup(clusterer, graph, thread, config, runtime_dict):
+  if (runner_utils.gbbs_format == "true"):
+    raise ValueError("NetworKit can only be run using edge list format")
+  G, _ = getGraph(runner_utils.input_directory + graph, measured=False)
+  nk.setNumberOfThreads(threadCount(thread))
+  with runner_utils.timePhase(runtime_dict, "Cluster"):
+    runAlgorithm(clusterer, G, config)
+
+# If sweep_thresholds is given, NetworKitKCore computes the clusterings of
+# all of these thresholds with one core decomposition for the round
+# (identified by sweep_key); the run that computes the sweep records the
+# decomposition and the clustering of the other thresholds as its Preprocess
+# Time.
+def runNetworKit(clusterer, graph, thread, config, out_prefix, runtime_dict, sweep_thresholds=None, sweep_key=None):
   if (runner_utils.gbbs_format == "true"):
     raise ValueError("NetworKit can only be run using edge list format")
   out_filename = out_prefix + ".out"
-  out_clustering = out_prefix + ".cluster"
+  out_clustering = clustering_io.outputClusteringPath(out_prefix)
   use_input_graph = runner_utils.input_directory + graph
   # if(not (use_input_graph.endswith("ungraph.txt") or use_input_graph.endswith("ngraph.txt"))):
   #   raise ValueError("input graph file name must ends with ungraph.txt or ngraph.txt")
   # G = nk.readGraph(use_input_graph, nk.Format.EdgeListTabZero)
   if runner_utils.postprocess_only != "true":
-    start_time = time.time()
-    G = None
-    if(is_bin_extension(use_input_graph)):
-      G = nk.readGraph(use_input_graph, nk.Format.NetworkitBinary)
-    else:
-      reader = nk.graphio.EdgeListReader('\t', 0, commentPrefix='#', directed=False) #continuous=False, 
-      G = reader.read(use_input_graph)
-    end_time = time.time()
-    print("Read Graph in %f \n" % (end_time - start_time))
+    usage_before = runner_utils.startInProcessUsage()
+    # The graph is only read by the first run on it; later runs report a Read
+    # Time of 0.
+    G, read_times = getGraph(use_input_graph)
+    print("Read Graph in %f \n" % read_times['Read Time'])
+    runtime_dict.update(read_times)
+    runtime_dict['Num Vertices'] = G.numberOfNodes()
     # print([edge for edge in G.iterEdgesWeights()])
-    if (thread != "" and thread != "ALL"):
-      nk.setNumberOfThreads(int(thread))
-    # This is k-core with a thresholding argument (double-check)
-    #nk.community.kCoreCommunityDetection(G, k, algo=None, inspect=False)
-    cluster_flag = False
-    if (clusterer == "NetworKitPLM"):
-      print_time, communities = runNetworKitPLM(G, config)
-    elif (clusterer == "NetworKitPLP"):
-      print_time, communities = runNetworKitPLP(G, config)
-    elif (clusterer == "NetworKitLPDegreeOrdered"):
-      print_time, communities = runNetworKitLPDegreeOrdered(G, config)
-    elif (clusterer == "NetworKitParallelLeiden"):
-      print_time, communities = runNetworKitParallelLeiden(G, config)
-    elif (clusterer == "NetworKitConnectivity"):
-      cluster_flag = True
-      print_time, clusters = runNetworKitConnectivity(G, config)
-    elif (clusterer == "NetworKitKCore"):
-      cluster_flag = True
-      print_time, clusters = runNetworKitKCore(G, config)
+    with runner_utils.timePhase(runtime_dict, "Thread Setup"):
+      nk.setNumberOfThreads(threadCount(thread))
+    communities = clusters = sweep_clustering = None
+    if (clusterer == "NetworKitKCore" and sweep_thresholds is not None):
+      k = parseKCoreThreshold(config)
+      if k not in kcore_sweep_results.get(sweep_key, {}):
+        runKCoreSweep(G, sweep_thresholds, k, out_prefix, sweep_key)
+      sweep_clustering, run_info = kcore_sweep_results[sweep_key].pop(k)
+      runtime_dict.update(run_info)
+      print_time = "Communities detected in %f \n" % run_info['Cluster Time']
     else:
-      raise ValueError("NetworKit clusterer not supported")
+      print_time, communities, clusters = runAlgorithm(clusterer, G, config)
     runner_utils.appendToFile('NetworKit: \n', out_filename)
     runner_utils.appendToFile('Graph: ' + graph + '\n', out_filename)
     runner_utils.appendToFile('Clusterer: ' + clusterer + '\n', out_filename)
     runner_utils.appendToFile('Threads: ' + thread + '\n', out_filename)
     runner_utils.appendToFile('Config: ' + config + '\n', out_filename)
+    for name in ["Read", "Thread Setup"]:
+      runner_utils.appendToFile(name + " Time: " + str(runtime_dict[name + ' Time']) + "\n", out_filename)
     runner_utils.appendToFile(print_time, out_filename)
     runner_utils.appendToFile("Cluster Time: " + extractNetworKitTime(print_time) + "\n", out_filename)
+    runtime_dict['Cluster Time'] = float(extractNetworKitTime(print_time))
 
-    # Create an empty list to hold all the lines you want to write to the file
-    if runner_utils.write_clustering != "false":
+    if sweep_clustering is not None:
+      os.rename(sweep_clustering, out_clustering)
+      runner_utils.appendToFile("Write Time: " + str(runtime_dict['Write Time']) + "\n", out_filename)
+    elif runner_utils.write_clustering != "false":
       print("writing results...")
-      start_time = time.time()
-      lines_to_write = []
-
-      if not cluster_flag:
-          use_original_networkit = True
-          if use_original_networkit:
-            communities.compact() # Change subset IDs to be consecutive, starting at 0.
-            num_clusters = communities.numberOfSubsets()
-            # cluster_index = 0
-            for cluster_index in range(num_clusters):
-                cluster_list = communities.getMembers(cluster_index)
-                lines_to_write.append("\t".join(str(x) for x in cluster_list))
-                # if cluster_index % 500 == 0:
-                  # progress_percentage = (cluster_index + 1) * 100.0 / num_clusters
-                  # print(f"Processing: {progress_percentage:.2f}% done")
-                cluster_index += 1
-            # Write all lines to the file at once
-            # with open(out_clustering, 'a+') as file:
-            #     file.write('\n'.join(lines_to_write) + '\n')
-          else:
-            # cluster_lists = communities.getSubsets()
-            # for cluster_list in cluster_lists:
-            #   lines_to_write.append("\t".join(str(x) for x in cluster_list))
-            nk.community.writeCommunitiesNestedFormat(communities, out_clustering)
-      else:
-          for cluster_list in clusters:
-              lines_to_write.append("\t".join(str(x) for x in cluster_list))
-
-      # Write all lines to the file at once
-      with open(out_clustering, 'a+') as file:
-          file.write('\n'.join(lines_to_write) + '\n')
-      end_time = time.time()
-      print("Wrote result in %f \n" % (end_time - start_time))
-  
-  print("postprocessing..." + out_filename)
-  try:
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith('Cluster Time:'):
-          runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
-  except Exception as e:
-    print(f"An error occurred: {e}")
\ No newline at end of file
+      # Extract reads the subset of every node out of NetworKit at once (node
+      # ids that are not in the graph have no subset), and Compact groups the
+      # nodes by subset into consecutive clusters.
+      with runner_utils.timePhase(runtime_dict, "Extract"):
+        if communities is not None:
+          subsets = np.asarray(communities.getVector())
+          nodes = np.flatnonzero(subsets < communities.upperBound())
+          clusters = subsets[nodes]
+        else:
+          nodes = np.arange(len(clusters))
+      with runner_utils.timePhase(runtime_dict, "Compact"):
+        offsets, ids = clustering_io.groupByCluster(nodes, clusters)
+      with runner_utils.timePhase(runtime_dict, "Write"):
+        clustering_io.writeClustering(out_clustering, offsets, ids)
+      runtime_dict['Num Clusters'] = len(offsets) - 1
+      print("Wrote result in %f \n" % runtime_dict['Write Time'])
+      for name in ["Extract", "Compact", "Write"]:
+        runner_utils.appendToFile(name + " Time: " + str(runtime_dict[name + ' Time']) + "\n", out_filename)
+    runner_utils.addResourceUsage(runtime_dict, runner_utils.getInProcessUsage(usage_before))
\ No newline at end of file
@@ -0,0 +1,290 @@
+import os
+import time
+import numpy as np
+import runner_utils
+import graph_cache
+import clustering_io
+
+'''
+The original Tectonic, computed in memory with NumPy arrays instead of the
+chain of scripts of external/Tectonic (relabel-graph-no-comm.py, mace,
+mace-to-list.py, weighted-edges-no-mixed.py, tree-clusters-parameter-no-mixed
+and relabel-clusters.py), which pass text files through the disk.
+
+Each edge is weighted by the number of triangles it is in, divided by the sum
+of the degrees of its endpoints, and the clusters are the connected
+components of the edges whose weight is at least the threshold. Vertices in
+no triangle are in no cluster, as with the scripts.
+
+The triangle weights only depend on the graph, so they are computed once per
+graph and reused by all thresholds and rounds (and, with "Graph cache: true",
+by later sweeps). With "Tectonic threshold sweep: true", the clusterings of
+all thresholds of a round are computed in one pass over the edges sorted by
+weight.
+'''
+
+# The number of 2-paths enumerated at once when counting triangles.
+TRIANGLE_CHUNK = 1 << 24
+
+'''
+Relabels the vertices of an edge list to consecutive ids, and removes self
+loops and duplicate edges.
+
+Output:
+the original ids of the vertices (an array indexed by new id), and the
+endpoints of the edges (u < v, int64 arrays)
+'''
+def relabel(src, dst):
+  labels, inverse = np.unique(np.concatenate([src, dst]), return_inverse=True)
+  src, dst = inverse[:len(src)], inverse[len(src):]
+  u, v = np.minimum(src, dst), np.maximum(src, dst)
+  keep = u != v
+  keys = np.unique(u[keep] * len(labels) + v[keep])
+  return labels, keys // len(labels), keys % len(labels)
+
+'''
+Returns the number of triangles each edge (u[i], v[i]) is in. Each edge is
+oriented from its endpoint of lower degree, so that every triangle is found
+once, from the 2-paths a -> b -> c closed by an edge a -> c.
+'''
+def triangleCounts(n, u, v):
+  m = len(u)
+  degree = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+  rank = np.empty(n, dtype=np.int64)
+  rank[np.lexsort((np.arange(n), degree))] = np.arange(n)
+  forward = rank[u] < rank[v]
+  a, b = np.where(forward, u, v), np.where(forward, v, u)
+  order = np.lexsort((b, a))
+  a, b = a[order], b[order]
+  offsets = np.searchsorted(a, np.arange(n + 1))
+  keys = a * n + b
+  counts = np.zeros(m, dtype=np.int64)
+  # The 2-paths a -> b -> c of an oriented edge a -> b are its edge and each
+  # edge leaving b.
+  num_paths = offsets[b + 1] - offsets[b]
+  path_ends = np.cumsum(num_paths)
+  start = 0
+  while start < m:
+    end = int(np.searchsorted(path_ends, (path_ends[start - 1] if start else 0) + TRIANGLE_CHUNK, side="right"))
+    end = max(end, start + 1)
+    first_paths = num_paths[start:end]
+    first = np.repeat(np.arange(start, end), first_paths)
+    within = np.arange(len(first)) - np.repeat(np.cumsum(first_paths) - first_paths, first_paths)
+    second = offsets[b[first]] + within
+    closing = np.searchsorted(keys, a[first] * n + b[second])
+    closing[closing == m] = 0
+    found = keys[closing] == a[first] * n + b[second]
+    for edges in [first[found], second[found], closing[found]]:
+      counts += np.bincount(edges, minlength=m)
+    start = end
+  result = np.empty(m, dtype=np.int64)
+  result[order] = counts
+  return result
+
+'''
+Returns the edges in at least one triangle, and their Tectonic weights: the
+number of triangles of the edge divided by the sum of the degrees of its
+endpoints.
+'''
+def triangleWeights(n, u, v):
+  triangles = triangleCounts(n, u, v)
+  degree = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+  keep = triangles > 0
+  u, v = u[keep], v[keep]
+  return u, v, triangles[keep] / (degree[u] + degree[v])
+
+def findRoots(parent):
+  while True:
+    grandparent = parent[parent]
+    if np.array_equal(grandparent, parent):
+      return parent
+    parent[:] = grandparent
+
+'''
+Merges the components of the endpoints of the edges (u[i], v[i]) in a
+union-find forest, in which the parent of a vertex is never larger than the
+vertex.
+'''
+def linkEdges(parent, u, v):
+  while len(u) > 0:
+    roots = findRoots(parent)
+    root_u, root_v = roots[u], roots[v]
+    keep = root_u != root_v
+    u, v, root_u, root_v = u[keep], v[keep], root_u[keep], root_v[keep]
+    np.minimum.at(parent, np.maximum(root_u, root_v), np.minimum(root_u, root_v))
+
+'''
+Returns the cluster of each vertex: the connected components of the edges
+with weight at least threshold. The edges are sorted by decreasing weight.
+'''
+def thresholdClusters(n, u, v, weights, threshold):
+  parent = np.arange(n)
+  num_edges = np.searchsorted(-weights, -threshold, side="right")
+  linkEdges(parent, u[:num_edges], v[:num_edges])
+  return findRoots(parent)
+
+'''
+Computes the clusterings of several thresholds in one pass over the edges
+sorted by decreasing weight: the edges of each threshold are added to the
+components of the larger thresholds. Yields the threshold, the cluster of
+each vertex and the time the pass took to cluster at the threshold, in order
+of decreasing threshold: the time of adding the edges of this and all larger
+thresholds, and of finding the components, which is the work of clustering
+at the threshold on its own (thresholdClusters).
+'''
+def sweepThresholds(n, u, v, weights, thresholds):
+  parent = np.arange(n)
+  num_edges = 0
+  link_time = 0.0
+  for threshold in sorted(set(thresholds), reverse=True):
+    start_time = time.time()
+    end = np.searchsorted(-weights, -threshold, side="right")
+    linkEdges(parent, u[num_edges:end], v[num_edges:end])
+    num_edges = end
+    link_time += time.time() - start_time
+    start_time = time.time()
+    clusters = findRoots(parent).copy()
+    yield threshold, clusters, link_time + time.time() - start_time
+
+'''
+Writes the clusters of the vertices in at least one triangle (the endpoints of
+the weighted edges), and returns the number of clusters. As with the scripts,
+which only pass the triangle-weighted edges to tree-clusters, the vertices in
+no triangle are in no cluster.
+'''
+def writeClusters(filename, labels, u, v, clusters):
+  in_triangle = np.zeros(len(labels), dtype=bool)
+  in_triangle[u] = True
+  in_triangle[v] = True
+  return clustering_io.writeClusteringFromLabels(filename, labels[in_triangle], clusters[in_triangle])
+
+def parseThreshold(config):
+  threshold = 0.06
+  for config_item in [x.strip() for x in config.split(',')]:
+    config_split = [x.strip() for x in config_item.split(':')]
+    if config_split[0].startswith("threshold") and len(config_split) > 1 and config_split[1] != "":
+      threshold = float(config_split[1])
+  return threshold
+
+# The triangle weights of the last graph run: its identity, the original ids
+# of the vertices, and the edges and their weights, sorted by decreasing
+# weight, and the time it took to compute them. Only one graph is kept in
+# memory.
+triangle_weights = {}
+# The clusterings computed by threshold sweeps that have not been used by
+# their run yet, by (graph, round) and threshold: the path of the clustering
+# and its run information.
+sweep_results = {}
+
+def computeTriangleWeights(graph_path):
+  src, dst, _ = graph_cache.readEdgeList(graph_path)
+  labels, u, v = relabel(src, dst)
+  u, v, weights = triangleWeights(len(labels), u, v)
+  order = np.argsort(-weights, kind="stable")
+  return labels, u[order], v[order], weights[order]
+
+'''
+Returns the original ids of the vertices of a graph, and its edges in at least
+one triangle with their weights, sorted by decreasing weight. Also returns the
+time it took to compute them for the graph (its Graph Preprocess Time, which
+is the same for every run of the graph), and the time taken by this call (0
+if they were already in memory).
+'''
+def getTriangleWeights(graph_path):
+  stat = os.stat(graph_path)
+  identity = (os.path.abspath(graph_path), stat.st_size, stat.st_mtime_ns)
+  if triangle_weights.get("identity") == identity:
+    return triangle_weights["weights"] + (triangle_weights["preprocess_time"], 0.0)
+  triangle_weights.clear()
+  start_time = time.time()
+  preprocess_time = None
+  if graph_cache.enabled():
+    def build(directory):
+      labels, u, v, weights = computeTriangleWeights(graph_path)
+      np.savez(os.path.join(directory, "weights.npz"), labels=labels, u=u, v=v, weights=weights)
+    directory = graph_cache.getArtifact(graph_path, "tectonic_weights", build)
+    arrays = np.load(os.path.join(directory, "weights.npz"))
+    weights = (arrays["labels"], arrays["u"], arrays["v"], arrays["weights"])
+    preprocess_time = graph_cache.buildTime(directory)
+  else:
+    weights = computeTriangleWeights(graph_path)
+  spent_time = time.time() - start_time
+  triangle_weights["identity"] = identity
+  triangle_weights["weights"] = weights
+  triangle_weights["preprocess_time"] = spent_time if preprocess_time is None else preprocess_time
+  return weights + (triangle_weights["preprocess_time"], spent_time)
+
+'''
+Runs the threshold sweep of a round: computes the clusterings of all
+thresholds in one pass, and writes them next to out_prefix, to be moved into
+place by the runs of the thresholds.
+'''
+def runSweep(graph_path, thresholds, out_prefix, sweep_key):
+  labels, u, v, weights, graph_preprocess_time, spent_time = getTriangleWeights(graph_path)
+  results = {}
+  for threshold, clusters, threshold_time in sweepThresholds(len(labels), u, v, weights, thresholds):
+    sweep_clustering = clustering_io.outputClusteringPath(out_prefix + ".sweep" + str(len(results)))
+    start_time = time.time()
+    num_clusters = writeClusters(sweep_clustering, labels, u, v, clusters)
+    results[threshold] = (sweep_clustering, {
+        'Preprocess Time': spent_time if not results else 0.0,
+        'Graph Preprocess Time': graph_preprocess_time,
+        'Cluster Time': graph_preprocess_time + threshold_time,
+        'Write Time': time.time() - start_time,
+        'Num Vertices': len(labels),
+        'Num Clusters': num_clusters})
+  sweep_results[sweep_key] = results
+
+'''
+Removes the clusterings of threshold sweeps that were not used by a run
+(e.g., of rounds that were restored with "Resume: true").
+'''
+def clearSweeps():
+  for results in sweep_results.values():
+    for sweep_clustering, _ in results.values():
+      if os.path.exists(sweep_clustering):
+        os.remove(sweep_clustering)
+  sweep_results.clear()
+
+'''
+Runs Tectonic with the threshold in config on an edge list, and fills
+runtime_dict with its Preprocess Time (the time this run spent computing or
+loading the triangle weights, 0 if they were in memory), Graph Preprocess
+Time (the time it took to compute the triangle weights of the graph), Cluster
+Time (the Graph Preprocess Time plus clustering at the threshold, so that
+every run is charged for the preprocessing it depends on), Write Time, number
+of vertices and clusters, and resource usage.
+
+If sweep_thresholds is given, the clusterings of all of these thresholds are
+computed by one pass for the round (identified by sweep_key), and the Cluster
+Time of a threshold includes the steps of the pass up to it, so that it is
+comparable to the Cluster Time of a run without the sweep.
+'''
+def runTectonic(graph_path, config, out_prefix, runtime_dict, sweep_thresholds=None, sweep_key=None):
+  out_filename = out_prefix + ".out"
+  out_clustering = clustering_io.outputClusteringPath(out_prefix)
+  threshold = parseThreshold(config)
+  usage_before = runner_utils.startInProcessUsage()
+  if sweep_thresholds is not None:
+    if threshold not in sweep_results.get(sweep_key, {}):
+      runSweep(graph_path, sweep_thresholds + [threshold], out_prefix, sweep_key)
+    sweep_clustering, run_info = sweep_results[sweep_key].pop(threshold)
+    os.rename(sweep_clustering, out_clustering)
+    runtime_dict.update(run_info)
+  else:
+    labels, u, v, weights, graph_preprocess_time, spent_time = getTriangleWeights(graph_path)
+    runtime_dict['Preprocess Time'] = spent_time
+    runtime_dict['Graph Preprocess Time'] = graph_preprocess_time
+    start_time = time.time()
+    clusters = thresholdClusters(len(labels), u, v, weights, threshold)
+    runtime_dict['Cluster Time'] = graph_preprocess_time + time.time() - start_time
+    runtime_dict['Num Vertices'] = len(labels)
+    start_time = time.time()
+    runtime_dict['Num Clusters'] = writeClusters(out_clustering, labels, u, v, clusters)
+    runtime_dict['Write Time'] = time.time() - start_time
+  runner_utils.addResourceUsage(runtime_dict, runner_utils.getInProcessUsage(usage_before))
+  runner_utils.appendToFile("Tectonic: \n", out_filename)
+  runner_utils.appendToFile("Input graph: " + graph_path + "\n", out_filename)
+  runner_utils.appendToFile(config + "\n", out_filename)
+  for name in ["Preprocess", "Graph Preprocess", "Cluster", "Write"]:
+    runner_utils.appendToFile(name + " Time: " + str(runtime_dict[name + ' Time']) + "\n", out_filename)
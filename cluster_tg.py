@@ -5,8 +5,9 @@ import csv
 import time
 import io
 from contextlib import redirect_stdout
-import runner_utils
+import clustering_io
 import load_tg
+import graph_cache
 
 SLPA_QUERY_FILE_PATH='../tigergraph-3.9.2-offline/query/tg_slpa.gsql'
 
@@ -16,7 +17,9 @@ def load_tigergraph(conn, filename, input_dir, output_dir, tigergraph_nodes, tig
   nodes = output_dir + filename + '_nodes.csv'
   edges = output_dir + filename + '_edges.csv'
 
-  if tigergraph_edges == None or tigergraph_nodes == None:
+  if (tigergraph_edges == None or tigergraph_nodes == None) and graph_cache.enabled():
+    nodes, edges = graph_cache.getTigerGraphCsvs(input_dir + filename)
+  elif tigergraph_edges == None or tigergraph_nodes == None:
     load_tg.convert_to_tigergraph_format(filename, input_dir, output_dir)
   else:
     nodes = input_dir + tigergraph_nodes
@@ -45,7 +48,11 @@ def load_tigergraph(conn, filename, input_dir, output_dir, tigergraph_nodes, tig
     RUN LOADING JOB job1'''.format(nodes = nodes, edges = edges)))
   
 
-def run_tigergraph(conn, clusterer, out_clustering, thread, config, weighted):
+# The run information (cluster, result gather and write time, number of
+# vertices and clusters) is added to runtime_dict if it is given.
+def run_tigergraph(conn, clusterer, out_clustering, thread, config, weighted, runtime_dict=None):
+  if runtime_dict is None:
+    runtime_dict = {}
 
   feat = conn.gds.featurizer()
   
@@ -115,14 +122,19 @@ def run_tigergraph(conn, clusterer, out_clustering, thread, config, weighted):
     end_time = time.time()
     
     print("Cluster Time: " + str(end_time - start_time))
-
+    runtime_dict["Cluster Time"] = end_time - start_time
+    gather_start_time = time.time()
     df = conn.getVertexDataFrame("Node")
-    result = df.groupby('cluster')['id'].apply(list).tolist()
-    if not (result is None):
-      for cluster_list in result:
-        runner_utils.appendToFile("\t".join(str(x) for x in cluster_list) + "\n", out_clustering)
+    offsets, ids = clustering_io.groupFrame(df, 'id', 'cluster')
+    runtime_dict["Num Vertices"] = len(df)
+    runtime_dict["Result Gather Time"] = time.time() - gather_start_time
+    print("Result Gather Time: " + str(runtime_dict["Result Gather Time"]))
 
+    write_start_time = time.time()
+    clustering_io.writeClustering(out_clustering, offsets, ids)
+    runtime_dict["Num Clusters"] = len(offsets) - 1
     end_time = time.time()
+    runtime_dict["Write Time"] = end_time - write_start_time
     
     print("Total Time: " + str(end_time - start_time))
   out = f.getvalue()
@@ -0,0 +1,97 @@
+import subprocess
+import runner_utils
+
+# The prefix of the line describing a worker job in the .out file of its run.
+WORKER_JOB_PREFIX = "Worker job: "
+
+'''
+A long-lived cluster-in-memory_main process started with --worker_mode=true.
+The worker reads its input graph once, and then serves clustering jobs sent
+over its stdin, so that a sweep over configs and rounds does not re-read the
+graph for every job.
+'''
+class ClusterWorker:
+  def __init__(self, worker_command):
+    self.worker_command = worker_command
+    self.start()
+
+  def start(self):
+    self.process = runner_utils.startProcess(self.worker_command,
+                                             stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE,
+                                             stderr=subprocess.STDOUT,
+                                             universal_newlines=True, bufsize=1)
+
+  def job(self, clusterer, config, out_clustering):
+    job = "\t".join([clusterer, config, out_clustering])
+    if "\n" in job:
+      raise ValueError("Worker jobs cannot contain newlines: " + job)
+    return job
+
+  '''
+  Returns a description of a job for the .out file of its run: the command of
+  the worker, followed by the clusterer, config and output clustering of the
+  job, in the format of a cluster-in-memory_main command line.
+  '''
+  def request(self, clusterer, config, out_clustering):
+    return (WORKER_JOB_PREFIX + self.worker_command + " --clusterer_name=" + clusterer + " "
+            "--clusterer_config='" + config + "' --output_clustering=" + out_clustering)
+
+  '''
+  Runs one clustering job on the worker.
+  Input:
+  clusterer: type: string, name of the clusterer
+  config: type: string, text-format ClustererConfig proto
+  out_clustering: type: string, output filename of the clustering
+  timeout: type: float, seconds after which the worker is killed (it is
+    restarted for the next job)
+  out_filename: type: string, file that the output of the job is appended to
+    while it runs
+
+  Output:
+  a dict with the output printed by the worker for this job ("output"), its
+  exit code ("returncode": 0 if the job succeeded, 1 if it failed, or the
+  exit code of the worker if the worker exited during the job) and its status
+  ("status", see runner_utils.runStatus)
+  '''
+  def run(self, clusterer, config, out_clustering, timeout=None, out_filename=None):
+    job = self.job(clusterer, config, out_clustering)
+    if self.process.poll() is not None:
+      # The worker died during an earlier job; the graph is read again.
+      runner_utils.finishProcess(self.process)
+      self.start()
+    self.process.stdin.write(job + "\n")
+    self.process.stdin.flush()
+    timed_out = []
+    timer = runner_utils.startKillTimer(self.process, timeout, timed_out)
+    output = []
+    out_file = open(out_filename, "a+") if out_filename else None
+    try:
+      for line in self.process.stdout:
+        if line.startswith("Job finished:"):
+          status = line.split(":", 1)[1].strip()
+          if status != "OK":
+            print(self.worker_command + "\n" + "".join(output) + line)
+            return {"output": "".join(output), "returncode": 1, "status": "FAILED"}
+          return {"output": "".join(output), "returncode": 0, "status": "OK"}
+        output.append(line)
+        if out_file:
+          out_file.write(line)
+          out_file.flush()
+    finally:
+      if timer:
+        timer.cancel()
+      if out_file:
+        out_file.close()
+    # The worker exited (or was killed) before finishing the job.
+    print(self.worker_command + "\n" + "".join(output))
+    returncode = self.process.wait()
+    runner_utils.finishProcess(self.process)
+    return {"output": "".join(output), "returncode": returncode,
+            "status": runner_utils.runStatus(returncode, "".join(output), bool(timed_out))}
+
+  def close(self):
+    if self.process.poll() is None:
+      self.process.stdin.close()
+    self.process.wait()
+    runner_utils.finishProcess(self.process)
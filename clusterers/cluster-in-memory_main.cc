@@ -12,7 +12,10 @@
 // See the License for the specific language governing permissions and
 // limitations under the License.
 
+#include <sys/resource.h>
+
 #include <chrono>
+#include <fstream>
 #include <iomanip>
 #include <memory>
 #include <string>
@@ -22,7 +25,10 @@
 #include "absl/flags/parse.h"
 #include "absl/status/status.h"
 #include "absl/status/statusor.h"
+#include "absl/strings/match.h"
+#include "absl/strings/numbers.h"
 #include "absl/strings/str_format.h"
+#include "absl/strings/str_split.h"
 #include "absl/strings/string_view.h"
 
 #include "clusterers/affinity/parallel-affinity.h"
@@ -35,6 +41,7 @@
 #include "clusterers/labelprop_clusterer/labelprop-clusterer.h"
 #include "clusterers/slpa_clusterer/slpa-clusterer.h"
 
+#include "clusterers/clustering_io.h"
 #include "clusterers/gbbs_graph_io.h"
 #include "google/protobuf/text_format.h"
 #include "parcluster/api/config.pb.h"
@@ -63,7 +70,9 @@ ABSL_FLAG(bool, is_gbbs_format, false,
           "an edge list format (or SNAP format).");
 
 ABSL_FLAG(std::string, output_clustering, "",
-          "Output filename of a clustering.");
+          "Output filename of a clustering. Written in the binary clustering "
+          "format (see clustering_io.h) if it ends with .bin, and as text "
+          "(one cluster per line, tab separated) otherwise.");
 
 ABSL_FLAG(bool, is_symmetric_graph, true,
           "Without this flag, the program expects the edge list to represent "
@@ -79,6 +88,13 @@ ABSL_FLAG(bool, is_hierarchical, false,
           "Use this flag if a hierarchical clustering is desired. Not all "
           "clusterers suppoort a hierarchical clustering.");
 
+ABSL_FLAG(bool, worker_mode, false,
+          "Use this flag to keep the graph in memory and serve clustering "
+          "jobs read from stdin, one per line, in the format "
+          "<clusterer_name>\\t<clusterer_config>\\t<output_clustering>. "
+          "--clusterer_name, --clusterer_config and --output_clustering are "
+          "ignored in this mode.");
+
 namespace research_graph {
 namespace in_memory {
 namespace {
@@ -96,7 +112,10 @@ void PrintTime(std::chrono::steady_clock::time_point begin,
 
 template<class Clustering>
 absl::Status WriteClustering(const char* filename,
-                             const Clustering clustering) {
+                             const Clustering& clustering) {
+  if (IsBinaryClusteringFilename(filename)) {
+    return WriteBinaryClustering(filename, clustering);
+  }
   std::ofstream file{filename};
   if (!file.is_open()) {
     return absl::NotFoundError("Unable to open file.");
@@ -176,71 +195,56 @@ std::string FormatClustererConfig(const std::string& clusterer_name, const std::
   return clusterer_config_formatted;
 }
 
-absl::Status Main() {
-  std::string clusterer_name = absl::GetFlag(FLAGS_clusterer_name);
-
-  ClustererConfig config;
-  graph_mining::in_memory::ClustererConfig config_google;
-  // "any_config {[type.googleapis.com/research_graph.in_memory.ExampleClustererConfig] { ... }}"
-  std::string clusterer_config = absl::GetFlag(FLAGS_clusterer_config);
-
+// A clusterer together with the graph that has been read into it. Either
+// clusterer or clusterer_google is set, depending on using_google_clusterer.
+struct LoadedClusterer {
+  std::string clusterer_name;
   std::unique_ptr<InMemoryClusterer> clusterer;
   std::unique_ptr<graph_mining::in_memory::InMemoryClusterer> clusterer_google;
   bool using_google_clusterer = false;
-  bool is_hierarchical = absl::GetFlag(FLAGS_is_hierarchical);
+  std::size_t n = 0;
+};
+
+absl::Status CreateClusterer(const std::string& clusterer_name,
+                             LoadedClusterer* loaded) {
+  loaded->clusterer_name = clusterer_name;
   if (clusterer_name == "ParallelAffinityClusterer") {
-    using_google_clusterer = true;
-    clusterer_google.reset(new graph_mining::in_memory::ParallelAffinityClusterer);
+    loaded->using_google_clusterer = true;
+    loaded->clusterer_google.reset(new graph_mining::in_memory::ParallelAffinityClusterer);
   } else if (clusterer_name == "ExampleClusterer") {
-    clusterer.reset(new ExampleClusterer);
+    loaded->clusterer.reset(new ExampleClusterer);
   } else if (clusterer_name == "LDDClusterer") {
-    clusterer.reset(new LDDClusterer);
+    loaded->clusterer.reset(new LDDClusterer);
   }  else if (clusterer_name == "ConnectivityClusterer") {
-    clusterer.reset(new ConnectivityClusterer);
+    loaded->clusterer.reset(new ConnectivityClusterer);
   }  else if (clusterer_name == "KCoreClusterer") {
-    clusterer.reset(new KCoreClusterer);
+    loaded->clusterer.reset(new KCoreClusterer);
   } else if (clusterer_name == "TectonicClusterer") {
-    clusterer.reset(new TectonicClusterer);
+    loaded->clusterer.reset(new TectonicClusterer);
   } else if (clusterer_name == "ScanClusterer") {
-    clusterer.reset(new ScanClusterer);
+    loaded->clusterer.reset(new ScanClusterer);
   } else if (clusterer_name == "LabelPropagationClusterer") {
-    clusterer.reset(new LabelPropagationClusterer);
+    loaded->clusterer.reset(new LabelPropagationClusterer);
   } else if (clusterer_name == "SLPAClusterer") {
-    clusterer.reset(new SLPAClusterer);
+    loaded->clusterer.reset(new SLPAClusterer);
   } else if (clusterer_name == "ParHacClusterer") {
-    using_google_clusterer = true;
-    clusterer_google.reset(new graph_mining::in_memory::ParHacClusterer);
+    loaded->using_google_clusterer = true;
+    loaded->clusterer_google.reset(new graph_mining::in_memory::ParHacClusterer);
   } else if (clusterer_name == "ParallelCorrelationClusterer") {
-    using_google_clusterer = true;
-    clusterer_google.reset(new graph_mining::in_memory::ParallelCorrelationClusterer);
+    loaded->using_google_clusterer = true;
+    loaded->clusterer_google.reset(new graph_mining::in_memory::ParallelCorrelationClusterer);
   } else if (clusterer_name == "ParallelModularityClusterer") {
-    using_google_clusterer = true;
-    clusterer_google.reset(new graph_mining::in_memory::ParallelModularityClusterer);
+    loaded->using_google_clusterer = true;
+    loaded->clusterer_google.reset(new graph_mining::in_memory::ParallelModularityClusterer);
   }
   else {
     std::cerr << "Clusterer name = " << clusterer_name << std::endl;
     return absl::UnimplementedError("Unknown clusterer.");
   }
+  return absl::OkStatus();
+}
 
-  std::string formatted_clusterer_config = FormatClustererConfig(clusterer_name, clusterer_config);
-  if (using_google_clusterer){
-    if (!google::protobuf::TextFormat::ParseFromString(formatted_clusterer_config,
-                                                      &config_google)) {
-      return absl::InvalidArgumentError(
-          absl::StrFormat("Cannot parse --clusterer_config as a text-format "
-                          "research_graph.in_memory.ClustererConfig proto: %s",
-                          formatted_clusterer_config));
-    }
-  }else{
-    if (!google::protobuf::TextFormat::ParseFromString(formatted_clusterer_config,
-                                                      &config)) {
-      return absl::InvalidArgumentError(
-          absl::StrFormat("Cannot parse --clusterer_config as a text-format "
-                          "research_graph.in_memory.ClustererConfig proto: %s",
-                          formatted_clusterer_config));
-    }
-  }
-
+absl::Status ReadGraph(LoadedClusterer* loaded) {
   auto begin_read = std::chrono::steady_clock::now();
   std::string input_file = absl::GetFlag(FLAGS_input_graph);
   bool is_symmetric_graph = absl::GetFlag(FLAGS_is_symmetric_graph);
@@ -248,23 +252,24 @@ absl::Status Main() {
   bool is_gbbs_format = absl::GetFlag(FLAGS_is_gbbs_format);
 
   std::size_t n = 0;
-  if(using_google_clusterer){
+  if(loaded->using_google_clusterer){
     if (!is_gbbs_format) {
       ASSIGN_OR_RETURN(n, ReadEdgeListGraphFormat(
-        input_file, clusterer_google->MutableGraph(), float_weighted, is_symmetric_graph));
+        input_file, loaded->clusterer_google->MutableGraph(), float_weighted, is_symmetric_graph));
     } else {
       ASSIGN_OR_RETURN(n, ReadGbbsGraphFormat(
-        input_file, clusterer_google->MutableGraph(), float_weighted));
+        input_file, loaded->clusterer_google->MutableGraph(), float_weighted));
     }
   } else {
     if (!is_gbbs_format) {
       ASSIGN_OR_RETURN(n, ReadEdgeListGraphFormat(
-        input_file, clusterer->MutableGraph(), float_weighted, is_symmetric_graph));
+        input_file, loaded->clusterer->MutableGraph(), float_weighted, is_symmetric_graph));
     } else {
       ASSIGN_OR_RETURN(n, ReadGbbsGraphFormat(
-        input_file, clusterer->MutableGraph(), float_weighted));
+        input_file, loaded->clusterer->MutableGraph(), float_weighted));
     }
   }
+  loaded->n = n;
 
   auto end_read = std::chrono::steady_clock::now();
   PrintTime(begin_read, end_read, "Read");
@@ -273,42 +278,181 @@ absl::Status Main() {
   std::cout << "Graph: " << input_file << std::endl;
   std::cout << "Num vertices: " << n << std::endl;
   std::cout << "Convert to symmetric Graph: " << (is_symmetric_graph ? "True": "False") << std::endl;
+  return absl::OkStatus();
+}
+
+// Runs a single clustering on a clusterer whose graph is already loaded, and
+// writes the result to output_file (if it is non-empty).
+absl::Status RunClusterer(const LoadedClusterer& loaded,
+                          const std::string& clusterer_config,
+                          const std::string& output_file) {
+  ClustererConfig config;
+  graph_mining::in_memory::ClustererConfig config_google;
+  bool is_hierarchical = absl::GetFlag(FLAGS_is_hierarchical);
+
+  std::string formatted_clusterer_config = FormatClustererConfig(loaded.clusterer_name, clusterer_config);
+  if (loaded.using_google_clusterer){
+    if (!google::protobuf::TextFormat::ParseFromString(formatted_clusterer_config,
+                                                      &config_google)) {
+      return absl::InvalidArgumentError(
+          absl::StrFormat("Cannot parse --clusterer_config as a text-format "
+                          "research_graph.in_memory.ClustererConfig proto: %s",
+                          formatted_clusterer_config));
+    }
+  }else{
+    if (!google::protobuf::TextFormat::ParseFromString(formatted_clusterer_config,
+                                                      &config)) {
+      return absl::InvalidArgumentError(
+          absl::StrFormat("Cannot parse --clusterer_config as a text-format "
+                          "research_graph.in_memory.ClustererConfig proto: %s",
+                          formatted_clusterer_config));
+    }
+  }
 
   std::vector<InMemoryClusterer::Clustering> clusterings;
   std::vector<graph_mining::in_memory::InMemoryClusterer::Clustering> clusterings_google;
 
-  std::string output_file = absl::GetFlag(FLAGS_output_clustering);
-
   auto begin_cluster = std::chrono::steady_clock::now();
   std::cout << "Calling clustering." << std::endl;
   if (is_hierarchical) {
     // TODO(jeshi): Not fully implemented
     InMemoryClusterer::Dendrogram dendrogram;
-    ASSIGN_OR_RETURN(dendrogram, clusterer->HierarchicalCluster(config));
+    ASSIGN_OR_RETURN(dendrogram, loaded.clusterer->HierarchicalCluster(config));
     // TODO(jeshi): Writing pre-emptively for testing.
     auto end_cluster = std::chrono::steady_clock::now();
     PrintTime(begin_cluster, end_cluster, "Cluster");
     return WriteClustering(output_file.c_str(), dendrogram);
   } else {
-    if (using_google_clusterer){
-      ASSIGN_OR_RETURN(auto clustering, clusterer_google->Cluster(config_google));
+    if (loaded.using_google_clusterer){
+      ASSIGN_OR_RETURN(auto clustering, loaded.clusterer_google->Cluster(config_google));
       clusterings_google.push_back(std::move(clustering));
     }else{
-      ASSIGN_OR_RETURN(auto clustering, clusterer->Cluster(config));
+      ASSIGN_OR_RETURN(auto clustering, loaded.clusterer->Cluster(config));
       clusterings.push_back(std::move(clustering));
     }
   }
   auto end_cluster = std::chrono::steady_clock::now();
   PrintTime(begin_cluster, end_cluster, "Cluster");
+  std::cout << "Num clusters: "
+            << (loaded.using_google_clusterer ? clusterings_google[0].size()
+                                              : clusterings[0].size())
+            << std::endl;
 
   if(output_file == "") return absl::OkStatus();
   // TODO(laxmand): Fix status warnings here (and potentially elsewhere).
   // TODO(jeshi): Support writing entire dendrogram to output file
-  if (using_google_clusterer){
-    return WriteClustering(output_file.c_str(), clusterings_google[0]);
+  auto begin_write = std::chrono::steady_clock::now();
+  absl::Status status;
+  if (loaded.using_google_clusterer){
+    status = WriteClustering(output_file.c_str(), clusterings_google[0]);
   }else{
-    return WriteClustering(output_file.c_str(), clusterings[0]);
+    status = WriteClustering(output_file.c_str(), clusterings[0]);
+  }
+  auto end_write = std::chrono::steady_clock::now();
+  PrintTime(begin_write, end_write, "Write");
+  return status;
+}
+
+absl::Status Main() {
+  LoadedClusterer loaded;
+  RETURN_IF_ERROR(CreateClusterer(absl::GetFlag(FLAGS_clusterer_name), &loaded));
+  RETURN_IF_ERROR(ReadGraph(&loaded));
+  return RunClusterer(loaded, absl::GetFlag(FLAGS_clusterer_config),
+                      absl::GetFlag(FLAGS_output_clustering));
+}
+
+// Resets the peak resident set size of this process, so that the peak of a
+// worker job can be measured (Linux only; a no-op elsewhere).
+void ResetPeakRss() {
+  std::ofstream clear_refs("/proc/self/clear_refs");
+  if (clear_refs) clear_refs << "5";
+}
+
+// Returns the peak resident set size of this process in KB since the last
+// ResetPeakRss(), or the lifetime peak if it cannot be read.
+int64_t PeakRssKb() {
+  std::ifstream status("/proc/self/status");
+  std::string line;
+  while (std::getline(status, line)) {
+    if (absl::StartsWith(line, "VmHWM:")) {
+      std::vector<absl::string_view> split =
+          absl::StrSplit(line, ' ', absl::SkipEmpty());
+      int64_t peak_rss;
+      if (split.size() >= 2 && absl::SimpleAtoi(split[1], &peak_rss)) {
+        return peak_rss;
+      }
+    }
   }
+  struct rusage usage;
+  getrusage(RUSAGE_SELF, &usage);
+  return usage.ru_maxrss;
+}
+
+double Seconds(const struct timeval& time) {
+  return time.tv_sec + time.tv_usec / 1e6;
+}
+
+// Prints the resources used by this process between before and now, in the
+// same format as the runner records them for processes it runs.
+void PrintResourceUsage(const struct rusage& before) {
+  struct rusage after;
+  getrusage(RUSAGE_SELF, &after);
+  std::cout << "Max RSS: " << PeakRssKb() << std::endl;
+  std::cout << "User CPU Time: "
+            << Seconds(after.ru_utime) - Seconds(before.ru_utime) << std::endl;
+  std::cout << "System CPU Time: "
+            << Seconds(after.ru_stime) - Seconds(before.ru_stime) << std::endl;
+  std::cout << "Voluntary Context Switches: "
+            << after.ru_nvcsw - before.ru_nvcsw << std::endl;
+  std::cout << "Involuntary Context Switches: "
+            << after.ru_nivcsw - before.ru_nivcsw << std::endl;
+  std::cout << "Minor Page Faults: " << after.ru_minflt - before.ru_minflt
+            << std::endl;
+  std::cout << "Major Page Faults: " << after.ru_majflt - before.ru_majflt
+            << std::endl;
+}
+
+// Worker mode: the graph given by --input_graph is read once and kept in
+// memory, and clustering jobs are read from stdin, one per line, as
+//   <clusterer_name>\t<clusterer_config>\t<output_clustering>
+// The graph is read into the clusterer of the first job, and is reused by
+// every following job with the same clusterer name; a job with a different
+// clusterer name replaces the loaded clusterer (and reads the graph again).
+// After each job, a line "Job finished: OK" or "Job finished: <error>" is
+// printed, so that the caller knows where the output of a job ends. Before
+// it, the resources used by the job are printed (see PrintResourceUsage), as
+// they cannot be measured from outside of the worker. The worker exits at the
+// end of stdin.
+absl::Status WorkerMain() {
+  std::unique_ptr<LoadedClusterer> loaded;
+  std::string line;
+  while (std::getline(std::cin, line)) {
+    if (line.empty()) continue;
+    std::vector<std::string> job = absl::StrSplit(line, '\t');
+    job.resize(3);
+    const std::string& clusterer_name = job[0];
+    ResetPeakRss();
+    struct rusage before;
+    getrusage(RUSAGE_SELF, &before);
+    auto status = [&]() -> absl::Status {
+      if (loaded == nullptr || loaded->clusterer_name != clusterer_name) {
+        loaded.reset();
+        auto new_loaded = std::make_unique<LoadedClusterer>();
+        RETURN_IF_ERROR(CreateClusterer(clusterer_name, new_loaded.get()));
+        RETURN_IF_ERROR(ReadGraph(new_loaded.get()));
+        loaded = std::move(new_loaded);
+      } else {
+        std::cout << "Read Time: 0" << std::endl;
+        std::cout << "Num vertices: " << loaded->n << std::endl;
+        std::cout << "Graph cached: True" << std::endl;
+      }
+      return RunClusterer(*loaded, job[1], job[2]);
+    }();
+    PrintResourceUsage(before);
+    std::cout << "Job finished: " << (status.ok() ? "OK" : status.ToString())
+              << std::endl;
+  }
+  return absl::OkStatus();
 }
 
 }  // namespace
@@ -317,7 +461,9 @@ absl::Status Main() {
 
 int main(int argc, char* argv[]) {
   absl::ParseCommandLine(argc, argv);
-  auto status = research_graph::in_memory::Main();
+  auto status = absl::GetFlag(FLAGS_worker_mode)
+                    ? research_graph::in_memory::WorkerMain()
+                    : research_graph::in_memory::Main();
   if (!status.ok()) {
     std::cerr << status << std::endl;
     return EXIT_FAILURE;
@@ -0,0 +1,177 @@
+#ifndef PARCLUSTERERS_CLUSTERERS_CLUSTERING_IO_H_
+#define PARCLUSTERERS_CLUSTERERS_CLUSTERING_IO_H_
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <fstream>
+#include <limits>
+#include <string>
+#include <vector>
+
+#include "absl/status/status.h"
+#include "absl/status/statusor.h"
+#include "absl/strings/match.h"
+#include "absl/strings/str_format.h"
+
+#include "parcluster/api/in-memory-clusterer-base.h"
+
+namespace research_graph {
+namespace in_memory {
+
+// Binary clustering format (.cluster.bin), also read and written by
+// clustering_io.py. All integers are little endian:
+//   char[8]  magic "PCBSCLST"
+//   uint32   version (1)
+//   uint32   bytes per node id (4 or 8)
+//   uint64   number of clusters (k)
+//   uint64   number of node ids (n)
+//   uint64   offsets[k + 1]; cluster i is ids[offsets[i], offsets[i + 1])
+//   uint32 or uint64 ids[n]
+// The offsets and ids are 8-byte aligned, so that the file can be memory
+// mapped.
+inline constexpr char kBinaryClusteringMagic[8] = {'P', 'C', 'B', 'S',
+                                                   'C', 'L', 'S', 'T'};
+inline constexpr uint32_t kBinaryClusteringVersion = 1;
+
+struct BinaryClusteringHeader {
+  char magic[8];
+  uint32_t version;
+  uint32_t id_bytes;
+  uint64_t num_clusters;
+  uint64_t num_ids;
+};
+
+inline bool IsBinaryClusteringFilename(const std::string& filename) {
+  return absl::EndsWith(filename, ".bin");
+}
+
+// Writes the ids as uint32 if they all fit, and as uint64 otherwise, as
+// clustering_io.py does.
+template <class Clustering>
+absl::Status WriteBinaryClustering(const char* filename,
+                                   const Clustering& clustering) {
+  std::ofstream file{filename, std::ios::binary};
+  if (!file.is_open()) {
+    return absl::NotFoundError("Unable to open file.");
+  }
+  std::vector<uint64_t> offsets(clustering.size() + 1, 0);
+  uint64_t max_id = 0;
+  for (std::size_t i = 0; i < clustering.size(); i++) {
+    offsets[i + 1] = offsets[i] + clustering[i].size();
+    for (auto id : clustering[i]) {
+      max_id = std::max<uint64_t>(max_id, id);
+    }
+  }
+  BinaryClusteringHeader header;
+  std::memcpy(header.magic, kBinaryClusteringMagic, sizeof(header.magic));
+  header.version = kBinaryClusteringVersion;
+  header.id_bytes = max_id <= std::numeric_limits<uint32_t>::max()
+                        ? sizeof(uint32_t)
+                        : sizeof(uint64_t);
+  header.num_clusters = clustering.size();
+  header.num_ids = offsets.back();
+  file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+  file.write(reinterpret_cast<const char*>(offsets.data()),
+             offsets.size() * sizeof(uint64_t));
+  std::vector<uint32_t> ids;
+  std::vector<uint64_t> wide_ids;
+  for (std::size_t i = 0; i < clustering.size(); i++) {
+    if (header.id_bytes == sizeof(uint32_t)) {
+      ids.assign(clustering[i].begin(), clustering[i].end());
+      file.write(reinterpret_cast<const char*>(ids.data()),
+                 ids.size() * sizeof(uint32_t));
+    } else {
+      wide_ids.assign(clustering[i].begin(), clustering[i].end());
+      file.write(reinterpret_cast<const char*>(wide_ids.data()),
+                 wide_ids.size() * sizeof(uint64_t));
+    }
+  }
+  if (!file.good()) {
+    return absl::InternalError("Unable to write file.");
+  }
+  return absl::OkStatus();
+}
+
+// Returns whether the file starts with the magic of the binary format.
+inline bool IsBinaryClustering(const char* filename) {
+  std::ifstream file{filename, std::ios::binary};
+  char magic[8];
+  return file.read(magic, sizeof(magic)) &&
+         std::memcmp(magic, kBinaryClusteringMagic, sizeof(magic)) == 0;
+}
+
+// Reads a clustering in the binary format, memory mapping the file. Returns
+// an error if a node id does not fit in InMemoryClusterer::NodeId.
+inline absl::StatusOr<InMemoryClusterer::Clustering> ReadBinaryClustering(
+    const char* filename) {
+  int fd = open(filename, O_RDONLY);
+  if (fd < 0) {
+    return absl::NotFoundError("Unable to open file.");
+  }
+  struct stat file_stat;
+  if (fstat(fd, &file_stat) != 0 ||
+      file_stat.st_size < static_cast<off_t>(sizeof(BinaryClusteringHeader))) {
+    close(fd);
+    return absl::InvalidArgumentError("Truncated binary clustering.");
+  }
+  void* data = mmap(nullptr, file_stat.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+  close(fd);
+  if (data == MAP_FAILED) {
+    return absl::InternalError("Unable to map file.");
+  }
+  const char* bytes = static_cast<const char*>(data);
+  BinaryClusteringHeader header;
+  std::memcpy(&header, bytes, sizeof(header));
+  std::size_t expected_size =
+      sizeof(header) + (header.num_clusters + 1) * sizeof(uint64_t) +
+      header.num_ids * header.id_bytes;
+  if (std::memcmp(header.magic, kBinaryClusteringMagic,
+                  sizeof(header.magic)) != 0 ||
+      header.version != kBinaryClusteringVersion ||
+      (header.id_bytes != 4 && header.id_bytes != 8) ||
+      static_cast<std::size_t>(file_stat.st_size) < expected_size) {
+    munmap(data, file_stat.st_size);
+    return absl::InvalidArgumentError(
+        absl::StrFormat("%s is not a valid binary clustering.", filename));
+  }
+  const uint64_t* offsets =
+      reinterpret_cast<const uint64_t*>(bytes + sizeof(header));
+  const char* ids = bytes + sizeof(header) +
+                    (header.num_clusters + 1) * sizeof(uint64_t);
+  using NodeId = InMemoryClusterer::NodeId;
+  InMemoryClusterer::Clustering clustering(header.num_clusters);
+  for (uint64_t i = 0; i < header.num_clusters; i++) {
+    if (offsets[i] > offsets[i + 1] || offsets[i + 1] > header.num_ids) {
+      munmap(data, file_stat.st_size);
+      return absl::InvalidArgumentError(
+          absl::StrFormat("%s has invalid cluster offsets.", filename));
+    }
+    auto& cluster = clustering[i];
+    cluster.reserve(offsets[i + 1] - offsets[i]);
+    for (uint64_t j = offsets[i]; j < offsets[i + 1]; j++) {
+      uint64_t id = header.id_bytes == 4
+                        ? reinterpret_cast<const uint32_t*>(ids)[j]
+                        : reinterpret_cast<const uint64_t*>(ids)[j];
+      if (id > static_cast<uint64_t>(std::numeric_limits<NodeId>::max())) {
+        munmap(data, file_stat.st_size);
+        return absl::OutOfRangeError(absl::StrFormat(
+            "%s has node id %d, which does not fit in a node id.", filename,
+            id));
+      }
+      cluster.push_back(static_cast<NodeId>(id));
+    }
+  }
+  munmap(data, file_stat.st_size);
+  return clustering;
+}
+
+}  // namespace in_memory
+}  // namespace research_graph
+
+#endif  // PARCLUSTERERS_CLUSTERERS_CLUSTERING_IO_H_
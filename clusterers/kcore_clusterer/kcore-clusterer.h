@@ -17,6 +17,7 @@
 
 #include <algorithm>
 #include <iterator>
+#include <optional>
 #include <utility>
 #include <vector>
 
@@ -32,7 +33,10 @@ namespace in_memory {
 
 class KCoreClusterer : public InMemoryClusterer {
  public:
-  Graph* MutableGraph() override { return &graph_; }
+  Graph* MutableGraph() override {
+    cores_.reset();
+    return &graph_;
+  }
 
   absl::StatusOr<Clustering> Cluster(
       const ClustererConfig& config) const override;
@@ -42,6 +46,9 @@ class KCoreClusterer : public InMemoryClusterer {
 
  private:
   GbbsGraph graph_;
+  // The core number of each vertex of graph_, if computed by a clustering
+  // with reuse_core_decomposition.
+  mutable std::optional<parlay::sequence<gbbs::uintE>> cores_;
 };
 
 }  // namespace in_memory
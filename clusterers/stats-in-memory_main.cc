@@ -27,6 +27,7 @@
 
 #include "clusterers/clustering_stats.h"
 #include "clusterers/clustering_stats.pb.h"
+#include "clusterers/clustering_io.h"
 #include "clusterers/gbbs_graph_io.h"
 #include "clusterers/stats/stats_utils.h"
 #include "google/protobuf/text_format.h"
@@ -45,7 +46,8 @@ ABSL_FLAG(bool, is_gbbs_format, false,
           "an edge list format (or SNAP format).");
 
 ABSL_FLAG(std::string, input_clustering, "",
-          "Input filename of a clustering.");
+          "Input filename of a clustering, as text (one cluster per line, "
+          "tab separated) or in the binary clustering format.");
 
 ABSL_FLAG(std::string, output_statistics, "",
           "Output filename for clustering statistics.");
@@ -83,6 +85,7 @@ void PrintTime(std::chrono::steady_clock::time_point begin,
 }
 
 absl::StatusOr<InMemoryClusterer::Clustering> ReadClustering(const char* filename){
+  if (IsBinaryClustering(filename)) return ReadBinaryClustering(filename);
   InMemoryClusterer::Clustering clustering;
   std::ifstream file{filename};
   if (!file.is_open()) {
@@ -149,19 +152,29 @@ absl::Status Main() {
   std::cout << "Graph: " << input_file << std::endl;
   std::cout << "Num vertices: " << n << std::endl;
 
+  auto begin_read_clustering = std::chrono::steady_clock::now();
   InMemoryClusterer::Clustering clustering;
   std::string input_clustering = absl::GetFlag(FLAGS_input_clustering);
   ASSIGN_OR_RETURN(clustering, ReadClustering(input_clustering.c_str()));
+  auto end_read_clustering = std::chrono::steady_clock::now();
+  PrintTime(begin_read_clustering, end_read_clustering, "Read Clustering");
 
   std::string output_stats_file = absl::GetFlag(FLAGS_output_statistics);
 
+  auto begin_stats = std::chrono::steady_clock::now();
   auto clustering_stats = GetStats(graph, clustering,
     absl::GetFlag(FLAGS_input_graph), absl::GetFlag(FLAGS_input_communities), stats_config);
+  auto end_stats = std::chrono::steady_clock::now();
+  PrintTime(begin_stats, end_stats, "Stats");
 
   if(!clustering_stats.ok()) return clustering_stats.status();
 
+  auto begin_write = std::chrono::steady_clock::now();
   std::string output_file = absl::GetFlag(FLAGS_output_statistics);
-  return WriteStatistics(output_file.c_str(), clustering_stats.value());
+  auto status = WriteStatistics(output_file.c_str(), clustering_stats.value());
+  auto end_write = std::chrono::steady_clock::now();
+  PrintTime(begin_write, end_write, "Write");
+  return status;
 }
 
 }  // namespace
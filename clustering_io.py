@@ -0,0 +1,185 @@
+import os
+import struct
+import sys
+import runner_utils
+
+'''
+Reading and writing clusterings, in the text format (one cluster per line,
+node ids separated by tabs) or in the binary format (.cluster.bin) of
+clusterers/clustering_io.h. A binary clustering holds a small header, the
+offsets of the clusters (CSR style) and the node ids of all clusters, and is
+memory mapped when read.
+
+With "Clustering format: binary", the runner writes .cluster.bin files for the
+native, NetworKit, Tectonic, Neo4j and TigerGraph clusterers (SNAP and the
+original Tectonic scripts write text). A binary clustering is exported to
+text with:
+
+python3 clustering_io.py input.cluster.bin output.cluster
+'''
+
+MAGIC = b"PCBSCLST"
+VERSION = 1
+# magic, version, bytes per node id, number of clusters, number of node ids
+HEADER = struct.Struct("<8sIIQQ")
+
+'''
+Returns the file name of the clustering written by a run, in the format set by
+"Clustering format".
+'''
+def outputClusteringPath(out_prefix):
+  return out_prefix + (".cluster.bin" if runner_utils.clustering_format == "binary" else ".cluster")
+
+'''
+Returns the file name of the clustering of a run: its binary clustering if it
+has one, and its text clustering otherwise.
+'''
+def clusteringPath(out_prefix):
+  if os.path.exists(out_prefix + ".cluster.bin"):
+    return out_prefix + ".cluster.bin"
+  return out_prefix + ".cluster"
+
+def isBinary(filename):
+  with open(filename, "rb") as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+'''
+Writes a clustering given as CSR arrays: cluster i has the node ids
+ids[offsets[i]:offsets[i + 1]]. Writes the binary format if filename ends
+with .bin, and text otherwise.
+'''
+def writeClustering(filename, offsets, ids):
+  import numpy as np
+  offsets = np.asarray(offsets, dtype=np.uint64)
+  ids = np.asarray(ids)
+  if not filename.endswith(".bin"):
+    with open(filename, "w") as f:
+      if len(offsets) == 1:
+        return
+      sizes = np.diff(offsets.astype(np.int64))
+      if (sizes == 0).any():
+        for members in np.split(ids.astype(str), offsets[1:-1].astype(np.int64)):
+          f.write("\t".join(members) + "\n")
+        return
+      # Writes all clusters at once: each id is followed by a tab, or by a
+      # newline if it is the last id of its cluster.
+      separators = np.full(len(ids), "\t")
+      separators[offsets[1:].astype(np.int64) - 1] = "\n"
+      f.write("".join(np.char.add(ids.astype(str), separators).tolist()))
+    return
+  id_dtype = np.uint32 if len(ids) == 0 or (ids.min() >= 0 and ids.max() < (1 << 32)) else np.uint64
+  with open(filename, "wb") as f:
+    f.write(HEADER.pack(MAGIC, VERSION, np.dtype(id_dtype).itemsize, len(offsets) - 1, len(ids)))
+    f.write(offsets.astype("<u8").tobytes())
+    f.write(ids.astype(np.dtype(id_dtype).newbyteorder("<")).tobytes())
+
+'''
+Groups nodes by the cluster of each node: nodes[i] is in cluster clusters[i].
+
+Output:
+the offsets and node ids of the clusters (see writeClustering), in order of
+cluster id
+'''
+def groupByCluster(nodes, clusters):
+  import numpy as np
+  nodes, clusters = np.asarray(nodes), np.asarray(clusters)
+  order = np.argsort(clusters, kind="stable")
+  sorted_clusters = clusters[order]
+  starts = np.flatnonzero(np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]]) if len(order) > 0 else np.zeros(0, dtype=np.int64)
+  return np.r_[starts, len(order)], nodes[order]
+
+'''
+Groups the rows of a data frame of results (e.g., of Neo4j or TigerGraph) by
+cluster: each row holds a node id in node_column and its cluster in
+cluster_column, or, if overlapping, a list of its clusters, in which case the
+node is in each of them.
+
+Output:
+the offsets and node ids of the clusters (see groupByCluster)
+'''
+def groupFrame(frame, node_column, cluster_column, overlapping=False):
+  import numpy as np
+  nodes = frame[node_column].to_numpy()
+  clusters = frame[cluster_column].to_numpy()
+  if overlapping:
+    sizes = np.fromiter((len(node_clusters) for node_clusters in clusters), dtype=np.int64, count=len(clusters))
+    nodes = np.repeat(nodes, sizes)
+    clusters = np.fromiter((cluster for node_clusters in clusters for cluster in node_clusters), dtype=np.int64, count=int(sizes.sum()))
+  return groupByCluster(nodes, clusters)
+
+'''
+Writes a clustering given by the cluster of each node: nodes[i] is in
+cluster clusters[i]. Returns the number of clusters.
+'''
+def writeClusteringFromLabels(filename, nodes, clusters):
+  offsets, ids = groupByCluster(nodes, clusters)
+  writeClustering(filename, offsets, ids)
+  return len(offsets) - 1
+
+'''
+Writes a clustering given as a list of clusters, each a list of node ids.
+'''
+def writeClusteringFromLists(filename, cluster_lists):
+  import numpy as np
+  sizes = np.fromiter((len(cluster) for cluster in cluster_lists), dtype=np.int64, count=len(cluster_lists))
+  offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+  np.cumsum(sizes, out=offsets[1:])
+  ids = np.fromiter((node for cluster in cluster_lists for node in cluster), dtype=np.int64, count=int(offsets[-1]))
+  writeClustering(filename, offsets, ids)
+  return len(sizes)
+
+'''
+Reads a clustering, in either format.
+
+Output:
+the offsets (uint64) and node ids (uint32 or uint64) of the clusters, memory
+mapped for binary clusterings
+'''
+def readClustering(filename):
+  import numpy as np
+  if not isBinary(filename):
+    offsets, ids = [0], []
+    with open(filename, "r") as f:
+      for line in f:
+        nodes = [int(node) for node in line.split()]
+        ids.extend(nodes)
+        offsets.append(len(ids))
+    return np.array(offsets, dtype=np.uint64), np.array(ids, dtype=np.uint64)
+  with open(filename, "rb") as f:
+    magic, version, id_bytes, num_clusters, num_ids = HEADER.unpack(f.read(HEADER.size))
+  if version != VERSION or id_bytes not in [4, 8]:
+    raise ValueError(filename + " is not a valid binary clustering")
+  offsets = np.memmap(filename, dtype="<u8", mode="r", offset=HEADER.size, shape=(num_clusters + 1,))
+  if num_ids == 0:
+    return offsets, np.zeros(0, dtype=np.uint32 if id_bytes == 4 else np.uint64)
+  ids = np.memmap(filename, dtype="<u4" if id_bytes == 4 else "<u8", mode="r",
+                  offset=HEADER.size + 8 * (num_clusters + 1), shape=(num_ids,))
+  return offsets, ids
+
+'''
+Returns the clusters of a clustering, in either format, as lists of node ids.
+'''
+def readClusterLists(filename):
+  offsets, ids = readClustering(filename)
+  return [ids[offsets[i]:offsets[i + 1]].tolist() for i in range(len(offsets) - 1)]
+
+'''
+Returns the number of clusters of a clustering, in either format.
+'''
+def numClusters(filename):
+  if isBinary(filename):
+    with open(filename, "rb") as f:
+      return HEADER.unpack(f.read(HEADER.size))[3]
+  with open(filename, "rb") as f:
+    return sum(block.count(b"\n") for block in iter(lambda: f.read(1 << 20), b""))
+
+def exportText(filename, text_filename):
+  offsets, ids = readClustering(filename)
+  writeClustering(text_filename, offsets, ids)
+
+def main():
+  args = sys.argv[1:]
+  exportText(args[0], args[1])
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import threading
+import runner_utils
+
+'''
+The external tools run by cluster.py: the SNAP community, concomp and kcores
+examples, and the mace and tree-clusters binaries of the original Tectonic.
+They are built once, by prepare(), instead of by every run.
+
+A built tool has a stamp file in its directory recording the compiler it was
+built with (g++ in system.config) and its version, and is only built again
+when the compiler changes or its binary is missing. Runs use binary(), which
+fails if the tool has not been built, instead of building it.
+
+Usage: python3 external_tools.py [system.config]
+'''
+
+STAMP_FILENAME = ".parclusterers_build_stamp"
+
+# The directory, binary and make command of each tool, with {cxx} replaced by
+# the compiler. SNAP compiles with $(CC), and tree-clusters with $(CXX); mace
+# is C code and keeps its compiler.
+TOOLS = {
+  "community": ("external/snap/examples/community", "community", "make all CC={cxx}"),
+  "concomp": ("external/snap/examples/concomp", "concomp", "make all CC={cxx}"),
+  "kcores": ("external/snap/examples/kcores", "kcores", "make all CC={cxx}"),
+  "mace": ("external/Tectonic/mace", "mace", "make"),
+  "tectonic": ("external/Tectonic", "tree-clusters-parameter-no-mixed", "make all CXX={cxx}"),
+}
+
+# Tools that share build outputs, and so are built one after another. The
+# SNAP examples all build snap-core.
+BUILD_GROUPS = [["community", "concomp", "kcores"], ["mace"], ["tectonic"]]
+
+# The tools each clusterer runs.
+CLUSTERER_TOOLS = {
+  "SnapGirvanNewman": ["community"],
+  "SnapInfomap": ["community"],
+  "SnapCNM": ["community"],
+  "SnapConnectivity": ["concomp"],
+  "SnapKCore": ["kcores"],
+  "Tectonic": ["mace", "tectonic"],
+}
+
+def binaryPath(tool):
+  directory, binary_name, _ = TOOLS[tool]
+  return os.path.join(directory, binary_name)
+
+def compilerStamp():
+  version = runner_utils.runCommand(runner_utils.gplusplus_ver + " --version")["output"]
+  return {"compiler": runner_utils.gplusplus_ver,
+          "version": version.splitlines()[0] if version else ""}
+
+def readStamp(tool):
+  try:
+    with open(os.path.join(TOOLS[tool][0], STAMP_FILENAME), "r") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def isBuilt(tool, stamp):
+  return os.path.exists(binaryPath(tool)) and readStamp(tool) == stamp
+
+def build(tool, stamp):
+  directory, _, make = TOOLS[tool]
+  if not os.path.isdir(directory):
+    raise FileNotFoundError(directory + " does not exist; run git submodule update --init")
+  print("Building " + tool + " in " + directory)
+  result = runner_utils.runCommand("cd " + directory + " && " + make.format(cxx=runner_utils.gplusplus_ver))
+  if result["returncode"] != 0 or not os.path.exists(binaryPath(tool)):
+    print(result["output"])
+    raise RuntimeError("Failed to build " + tool + " in " + directory)
+  with open(os.path.join(directory, STAMP_FILENAME), "w") as f:
+    json.dump(stamp, f)
+
+'''
+Builds the tools that are not built yet, or were built with another
+compiler. The build groups are built in parallel. Raises an error if any
+tool fails to build.
+Input:
+tools: type: list, names of the tools (keys of TOOLS)
+'''
+def prepare(tools):
+  if not tools:
+    return
+  stamp = compilerStamp()
+  errors = []
+  def buildGroup(group):
+    try:
+      for tool in group:
+        if tool in tools and not isBuilt(tool, stamp):
+          build(tool, stamp)
+    except Exception as e:
+      errors.append(e)
+  threads = [threading.Thread(target=buildGroup, args=(group,)) for group in BUILD_GROUPS]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  if errors:
+    raise errors[0]
+
+def clustererTools(clusterers):
+  # The native Tectonic pipeline (cluster_tectonic.py) needs no tools.
+  if runner_utils.tectonic_pipeline == "native":
+    clusterers = [clusterer for clusterer in clusterers if clusterer != "Tectonic"]
+  return sorted(set(tool for clusterer in clusterers for tool in CLUSTERER_TOOLS.get(clusterer, [])))
+
+'''
+Returns the path of the binary of a tool, or raises an error if it has not
+been built by prepare().
+'''
+def binary(tool):
+  path = binaryPath(tool)
+  if not os.path.exists(path):
+    raise FileNotFoundError(path + " is not built; run python3 external_tools.py first")
+  return path
+
+def main():
+  args = sys.argv[1:]
+  if args:
+    runner_utils.readSystemConfig(args[0])
+  prepare(list(TOOLS))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,242 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import runner_utils
+import external_tools
+
+'''
+A cache of the formats that input graphs are converted to by the backends:
+NetworKit binary, TigerGraph node and edge CSVs, the relabelled mace graph and
+triangle weights of Tectonic, and GBBS adjacency graphs. Each format is converted once per input
+graph and reused by all later runs and sweeps.
+
+Artifacts are stored in "Graph cache directory", in a directory per input
+graph and key. The key is computed from the path, size and modification time
+of the input graph ("Graph cache key: mtime", the default), or from its
+contents ("Graph cache key: content"), so that a changed input graph is
+converted again.
+
+Enabled with "Graph cache: true".
+'''
+
+# Locks per artifact directory, so that concurrent jobs convert a graph once.
+artifact_locks = {}
+artifact_locks_lock = threading.Lock()
+# Content hashes of the input graphs, by (path, size, mtime).
+content_hashes = {}
+# The file of an artifact directory recording the time its build took.
+BUILD_TIME_FILENAME = "build_time"
+
+def enabled():
+  return runner_utils.graph_cache == "true"
+
+def graphKey(graph_path):
+  stat = os.stat(graph_path)
+  if runner_utils.graph_cache_key == "content":
+    identity = (os.path.abspath(graph_path), stat.st_size, stat.st_mtime_ns)
+    if identity not in content_hashes:
+      sha = hashlib.sha256()
+      with open(graph_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 24), b""):
+          sha.update(block)
+      content_hashes[identity] = sha.hexdigest()
+    return content_hashes[identity][:16]
+  identity = os.path.abspath(graph_path) + ":" + str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+  return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+def artifactDirectory(graph_path, name):
+  return os.path.join(runner_utils.graph_cache_directory, os.path.basename(graph_path) + "." + graphKey(graph_path), name)
+
+'''
+Returns the directory holding the artifact of a graph in a format, after
+converting it with build(directory) if it is not cached yet. build writes into
+a temporary directory that is only moved into place once it has finished, so
+an interrupted conversion is never used. The time the build took is recorded
+with the artifact (see buildTime).
+Input:
+graph_path: type: string, path of the input graph
+name: type: string, name of the format
+build: function taking the directory to write the artifact to
+'''
+def getArtifact(graph_path, name, build):
+  directory = artifactDirectory(graph_path, name)
+  with artifact_locks_lock:
+    lock = artifact_locks.setdefault(directory, threading.Lock())
+  with lock:
+    if os.path.isdir(directory):
+      return directory
+    print("Converting " + graph_path + " to " + name + " in " + directory)
+    tmp_directory = directory + ".tmp" + str(os.getpid())
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+      start_time = time.time()
+      build(tmp_directory)
+      with open(os.path.join(tmp_directory, BUILD_TIME_FILENAME), "w") as f:
+        f.write(str(time.time() - start_time))
+      os.rename(tmp_directory, directory)
+    except OSError:
+      if not os.path.isdir(directory):
+        raise
+      # Another process converted the graph at the same time.
+    finally:
+      shutil.rmtree(tmp_directory, ignore_errors=True)
+  return directory
+
+'''
+Returns the time it took to build the artifact in a directory returned by
+getArtifact, or None for artifacts cached before build times were recorded.
+'''
+def buildTime(directory):
+  try:
+    with open(os.path.join(directory, BUILD_TIME_FILENAME), "r") as f:
+      return float(f.read())
+  except (OSError, ValueError):
+    return None
+
+'''
+Reads an edge list (one edge per line, separated by whitespace, with an
+optional weight; lines starting with # are comments).
+
+Output:
+the source and target node ids (int64 arrays), and the weights (float64
+array, as parsed from the text) or None if the edge list is unweighted
+'''
+def readEdgeList(graph_path):
+  import pandas as pd
+  return edgeArrays(pd.read_csv(graph_path, sep=r"\s+", comment="#", header=None))
+
+'''
+Reads an edge list in chunks of chunk_size edges, so that only one chunk is in
+memory at a time. Yields the arrays of each chunk, as returned by
+readEdgeList.
+'''
+def readEdgeListChunks(graph_path, chunk_size):
+  import pandas as pd
+  for edges in pd.read_csv(graph_path, sep=r"\s+", comment="#", header=None, chunksize=chunk_size):
+    yield edgeArrays(edges)
+
+def edgeArrays(edges):
+  import numpy as np
+  weights = edges[2].to_numpy(dtype=np.float64) if edges.shape[1] > 2 else None
+  return edges[0].to_numpy(dtype=np.int64), edges[1].to_numpy(dtype=np.int64), weights
+
+'''
+Returns the path of the graph in GBBS adjacency format, as read by
+cluster-in-memory_main and stats-in-memory_main with --is_gbbs_format=true.
+The graph is symmetrized and duplicate edges are removed, and node ids are
+kept, as when the edge list itself is read.
+'''
+def getGbbsGraph(graph_path, weighted):
+  def build(directory):
+    import numpy as np
+    src, dst, weights = readEdgeList(graph_path)
+    n = int(max(src.max(), dst.max())) + 1 if len(src) > 0 else 0
+    src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    keep = np.ones(len(src), dtype=bool)
+    keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst = src[keep], dst[keep]
+    offsets = np.searchsorted(src, np.arange(n))
+    with open(os.path.join(directory, "graph.adj"), "w") as f:
+      f.write(("WeightedAdjacencyGraph" if weighted else "AdjacencyGraph") + "\n")
+      f.write(str(n) + "\n" + str(len(dst)) + "\n")
+      np.savetxt(f, offsets, fmt="%d")
+      np.savetxt(f, dst, fmt="%d")
+      if weighted:
+        weights = np.concatenate([weights, weights])[order][keep] if weights is not None else np.ones(len(dst))
+        # cluster-in-memory_main reads float weights, which "%.9g" of a float32
+        # writes exactly.
+        np.savetxt(f, weights.astype(np.float32), fmt="%.9g")
+  name = "gbbs_weighted" if weighted else "gbbs"
+  return os.path.join(getArtifact(graph_path, name, build), "graph.adj")
+
+'''
+Returns the input graph of native runs (cluster-in-memory_main and
+stats-in-memory_main), and whether it is in GBBS format: the cached GBBS
+conversion of an edge list if the cache is enabled, and the input graph
+itself otherwise.
+'''
+def getNativeInputGraph(graph_path):
+  if runner_utils.gbbs_format == "true" or not enabled():
+    return graph_path, runner_utils.gbbs_format
+  return getGbbsGraph(graph_path, runner_utils.weighted == "true"), "true"
+
+'''
+Returns the path of the graph in NetworKit binary format, read the same way
+as NetworKit reads the edge list itself.
+'''
+def getNetworKitBinary(graph_path):
+  def build(directory):
+    import networkit as nk
+    reader = nk.graphio.EdgeListReader('\t', 0, commentPrefix='#', directed=False)
+    G = reader.read(graph_path)
+    nk.graphio.writeGraph(G, os.path.join(directory, "graph.bin"), nk.Format.NetworkitBinary)
+  return os.path.join(getArtifact(graph_path, "networkit_binary", build), "graph.bin")
+
+'''
+Returns the paths of the TigerGraph node and edge CSVs of the graph.
+'''
+def getTigerGraphCsvs(graph_path):
+  def build(directory):
+    import load_tg
+    load_tg.convert_to_tigergraph_format(os.path.basename(graph_path),
+                                         os.path.dirname(graph_path) + "/", directory + "/")
+  directory = getArtifact(graph_path, "tigergraph_csv", build)
+  filename = os.path.basename(graph_path)
+  return (os.path.join(directory, filename + "_nodes.csv"),
+          os.path.join(directory, filename + "_edges.csv"))
+
+'''
+Returns the paths of the relabelled mace graph and of the pickled relabelling
+that Tectonic uses, and the number of vertices of the graph.
+'''
+def getMace(graph_path):
+  def build(directory):
+    result = runner_utils.runCommand(runner_utils.python_ver + " external/Tectonic/relabel-graph-no-comm.py " + graph_path + " " +
+                                     os.path.join(directory, "graph.mace") + " " + os.path.join(directory, "graph.pickle"))
+    if result["returncode"] != 0:
+      raise RuntimeError("Failed to relabel " + graph_path + " for Tectonic")
+    with open(os.path.join(directory, "num_vertices"), "w") as f:
+      f.write(result["output"].strip())
+  directory = getArtifact(graph_path, "mace", build)
+  with open(os.path.join(directory, "num_vertices"), "r") as f:
+    num_vert = f.read().strip()
+  return os.path.join(directory, "graph.mace"), os.path.join(directory, "graph.pickle"), num_vert
+
+'''
+Returns the path of the triangle-weighted edges of the relabelled mace graph,
+as read by the tree-clusters binaries of Tectonic. They only depend on the
+graph, so a sweep over thresholds computes them once.
+'''
+def getTectonicWeighted(graph_path):
+  mace_path, _, num_vert = getMace(graph_path)
+  def build(directory):
+    triangles_path = os.path.join(directory, "graph.triangles")
+    edges_path = os.path.join(directory, "graph.edges")
+    for step in [external_tools.binary("mace") + " C -l 3 -u 3 " + mace_path + " " + triangles_path,
+                 runner_utils.python_ver + " external/Tectonic/mace-to-list.py " + mace_path + " " + edges_path,
+                 runner_utils.python_ver + " external/Tectonic/weighted-edges-no-mixed.py " + triangles_path + " " + edges_path + " " +
+                 os.path.join(directory, "graph.weighted") + " " + os.path.join(directory, "graph.mixed") + " " + num_vert]:
+      if runner_utils.runCommand(step)["returncode"] != 0:
+        raise RuntimeError("Failed to compute the Tectonic weights of " + graph_path)
+    os.remove(triangles_path)
+    os.remove(edges_path)
+  return os.path.join(getArtifact(graph_path, "tectonic_weighted", build), "graph.weighted")
+
+'''
+Returns the time it took to relabel a graph and compute its Tectonic weights
+(getMace and getTectonicWeighted), or None if they are not cached or their
+build times were not recorded.
+'''
+def getTectonicPreprocessTime(graph_path):
+  total = 0.0
+  for name in ["mace", "tectonic_weighted"]:
+    build_time = buildTime(artifactDirectory(graph_path, name))
+    if build_time is None:
+      return None
+    total += build_time
+  return total
@@ -3,6 +3,8 @@ import os
 import csv
 import json
 import pandas as pd
+import run_manifest
+import repetition
 
 '''
 Reads .out file for run information and runtime.
@@ -18,10 +20,14 @@ def read_out(filename, directory):
   run_info = runtime_file.readlines()
   runtime_dict = {}
   runtime_dict['Iteration'] = filename.split('.')[0].split('_')[-1].strip()
+  # Runs of a persistent worker are logged as the job sent to the worker.
+  if run_info and run_info[0].startswith("Worker job: "):
+    run_info[0] = run_info[0][len("Worker job: "):]
   # Internal Clusterer
-  if run_info[0].startswith('PARLAY_NUM_THREADS'):
-    threads = run_info[0].split(' ')[0].split('=')[-1]
-    runtime_dict['Threads'] = threads.strip()
+  if run_info[0].startswith('PARLAY_NUM_THREADS') or 'cluster-in-memory_main' in run_info[0]:
+    if run_info[0].startswith('PARLAY_NUM_THREADS'):
+      threads = run_info[0].split(' ')[0].split('=')[-1]
+      runtime_dict['Threads'] = threads.strip()
     run_info_arr = run_info[0].split(' --')
     for elem in run_info_arr:
       if elem.startswith('input_graph'):
@@ -34,11 +40,21 @@ def read_out(filename, directory):
       if elem.startswith('Num vertices'):
         runtime_dict['Num Vertices'] = elem.split(' ')[-1].strip()
       elif elem.startswith('Num clusters'):
-        runtime_dict['Num clusters'] = elem.split(' ')[-1].strip()
+        runtime_dict['Num Clusters'] = elem.split(' ')[-1].strip()
       elif elem.startswith('Cluster Time'):
         runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
       elif elem.startswith('Read Time'):
         runtime_dict['Read Time'] = elem.split(' ')[-1].strip()
+      elif elem.startswith('Write Time'):
+        runtime_dict['Write Time'] = elem.split(' ')[-1].strip()
+      elif elem.startswith('Preprocess Time'):
+        runtime_dict['Preprocess Time'] = elem.split(' ')[-1].strip()
+      elif elem.startswith('Core Decomposition Time'):
+        runtime_dict['Core Decomposition Time'] = elem.split(' ')[-1].strip()
+    # As in cluster.runPCBS, the Preprocess Time is not part of the Cluster
+    # Time (the Core Decomposition Time is).
+    if 'Preprocess Time' in runtime_dict and 'Cluster Time' in runtime_dict:
+      runtime_dict['Cluster Time'] = str(max(float(runtime_dict['Cluster Time']) - float(runtime_dict['Preprocess Time']), 0.0))
   # Neo4j Clusterer
   elif run_info[0].startswith('GDS version:'):
     for elem in run_info[1:]:
@@ -82,6 +98,8 @@ def read_out(filename, directory):
     for elem in run_info[1:]:
       if elem.startswith('Cluster Time:'):
         runtime_dict['Cluster Time'] = elem.split(' ')[-1].strip()
+      elif elem.startswith('Graph Preprocess Time:'):
+        runtime_dict['Graph Preprocess Time'] = elem.split(' ')[-1].strip()
       elif elem.startswith('Input graph:'):
         runtime_dict['Input Graph'] = elem.split(' ')[-1].strip()
   # Tigergraph Clusterer
@@ -100,6 +118,21 @@ def read_out(filename, directory):
   runtime_file.close()
   return runtime_dict
 
+'''
+Reads the run information of one run from its .out file. Runs are recorded
+in the manifest of the output directory; this is only used for output
+directories written before that.
+Input:
+out_prefix: type: string, output prefix of the run
+
+Output:
+dictionary with the run information in run_manifest.RECORD_COLUMNS that the
+.out file has
+'''
+def read_run_info(out_prefix):
+  runtime_dict = read_out(os.path.basename(out_prefix) + '.out', os.path.dirname(out_prefix))
+  return {k: runtime_dict[k] for k in run_manifest.RECORD_COLUMNS if k in runtime_dict}
+
 '''
 Reads .stats file for calculated stats.
 Input: 
@@ -124,6 +157,8 @@ def read_stats(filename, directory):
 
 '''
 Reads through given dictionary for run information and stats.
+Run information is taken from the run records in the manifest of the
+directory if it has one, and from the .out files otherwise.
 Input: 
 directory: type: string, directory of files
 
@@ -134,18 +169,33 @@ def read_files(directory):
   encode_directory = os.fsencode(directory)
   runtime_dataframe = pd.DataFrame()
   stats_dataframe = pd.DataFrame()
+  # Run records by the file name prefix of their outputs.
+  records = None
+  if os.path.exists(os.path.join(directory, run_manifest.MANIFEST_FILENAME)):
+    records = {}
+    for record in run_manifest.readRecords(directory):
+      # Warmup rounds are discarded.
+      if repetition.isWarmupRound(record["Round"]):
+        continue
+      record = dict(record)
+      record.pop("Checksum", None)
+      records[os.path.basename(record.pop("Output Prefix"))] = record
+    runtime_dataframe = pd.DataFrame(list(records.values()))
 
   for file in os.listdir(encode_directory):
     filename = os.fsdecode(file)
     # Read .out file for runtime
-    if filename.endswith(".out"): 
+    if filename.endswith(".out") and records is None:
       runtime_dataframe = pd.concat([runtime_dataframe, pd.DataFrame([read_out(filename, directory)])], ignore_index=True)    
     # Read .stats file   
     elif filename.endswith(".stats"): 
       stats_dict = read_stats(filename, directory)
-      # Take run info from .out file
+      # Take run info from the run record or the .out file
       try:
-        runtime_dict = read_out(filename.split('.')[0] + '.out', directory)
+        if records is not None:
+          runtime_dict = records[filename.split('.')[0]]
+        else:
+          runtime_dict = read_out(filename.split('.')[0] + '.out', directory)
         for col in ['Clusterer Name', 'Threads', 'Input Graph', 'Config', 'Cluster Time']:
           stats_dict[col] = runtime_dict[col]
       except:
@@ -153,6 +203,7 @@ def read_files(directory):
       stats_dataframe = pd.concat([stats_dataframe, pd.DataFrame([stats_dict])], ignore_index=True)
       
   stats_dataframe.to_csv(directory + '/stats.csv')
+  run_manifest.addLegacyColumns(runtime_dataframe)
   runtime_dataframe.to_csv(directory + '/runtimes.csv')
 
 
@@ -180,6 +180,26 @@ style_map = {'LDDClusterer': 'o',
  'ParHACClusterer_1': '*'}
 
 
+# Returns which runs did not finish successfully (e.g. TIMEOUT, OOM or CRASH),
+# from the "Status" column that cluster.py records and stats.py copies.
+# Results without a "Status" column are from before statuses were recorded,
+# and all of their runs count as successful.
+def failed_runs(df):
+    if "Status" not in df.columns:
+        return pd.Series(False, index=df.index)
+    return df["Status"].fillna("OK") != "OK"
+
+def exclude_failed_runs(df):
+    return df[~failed_runs(df)]
+
+# Appends the status of runs that did not finish to their clusterer name,
+# e.g. "PLM (TIMEOUT)", so that they are plotted separately.
+def mark_failed_runs(df):
+    df = df.copy()
+    failed = failed_runs(df)
+    df.loc[failed, "Clusterer Name"] = df.loc[failed, "Clusterer Name"] + " (" + df.loc[failed, "Status"] + ")"
+    return df
+
 def get_our_methods():
     return [
         "KCoreClusterer",
@@ -207,6 +227,7 @@ def get_baseline_methods():
 
 
 def GetParetoDfs(df):
+    df = exclude_failed_runs(df)
     dfs = {}
     clusterers = df["Clusterer Name"].unique()
 
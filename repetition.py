@@ -0,0 +1,164 @@
+import math
+import statistics
+import runner_utils
+
+'''
+The repetition policy of the rounds of a config. "Warmup rounds" rounds are
+run first and discarded. Then "Number of rounds" rounds are run, and, if
+"Target CI width" is set, more rounds are run until the confidence interval
+of the mean Cluster Time ("Confidence level", default 0.95) is narrower than
+Target CI width times the mean, or "Max rounds" rounds have run, or the rounds
+of the config have taken "Round time budget".
+Warmup rounds and extra rounds are only run by cluster.py, not when
+postprocessing.
+'''
+
+# Columns summarizing the Cluster Time of the rounds of a config, added to
+# every round of the config in runtimes.csv.
+SUMMARY_COLUMNS = ["Rounds", "Cluster Time Mean", "Cluster Time Median",
+                   "Cluster Time Stddev", "Cluster Time CI Low",
+                   "Cluster Time CI High"]
+
+# Columns comparing the Cluster Time of a config across numbers of threads,
+# added by addScaling.
+SCALING_COLUMNS = ["Speedup", "Parallel Efficiency"]
+
+'''
+Returns the cumulative distribution function of Student's t distribution with
+an integer number df of degrees of freedom at t, from its closed form
+(Abramowitz and Stegun 26.7.3 and 26.7.4).
+'''
+def tCdf(t, df):
+  theta = math.atan(t / math.sqrt(df))
+  cos2 = math.cos(theta) ** 2
+  if df % 2 == 1:
+    term = math.cos(theta) if df > 1 else 0.0
+    total = term
+    for k in range(3, df - 1, 2):
+      term *= cos2 * (k - 1) / k
+      total += term
+    probability = 2 / math.pi * (theta + math.sin(theta) * total)
+  else:
+    term = 1.0
+    total = term
+    for k in range(2, df - 1, 2):
+      term *= cos2 * (k - 1) / k
+      total += term
+    probability = math.sin(theta) * total
+  return (1 + probability) / 2
+
+'''
+Returns the quantile p of Student's t distribution with an integer number df
+of degrees of freedom, by bisection on tCdf.
+'''
+def tQuantile(p, df):
+  if p < 0.5:
+    return -tQuantile(1 - p, df)
+  low, high = 0.0, 1.0
+  while tCdf(high, df) < p:
+    high *= 2
+  for _ in range(100):
+    mid = (low + high) / 2
+    if tCdf(mid, df) < p:
+      low = mid
+    else:
+      high = mid
+  return (low + high) / 2
+
+'''
+Returns the summary columns (SUMMARY_COLUMNS) of a list of cluster times.
+The confidence interval is only defined for at least two times.
+'''
+def summarize(times):
+  summary = {"Rounds": len(times)}
+  if not times:
+    return summary
+  mean = statistics.mean(times)
+  summary["Cluster Time Mean"] = mean
+  summary["Cluster Time Median"] = statistics.median(times)
+  if len(times) > 1:
+    stddev = statistics.stdev(times)
+    half_width = tQuantile((1 + runner_utils.confidence_level) / 2, len(times) - 1) * stddev / math.sqrt(len(times))
+    summary["Cluster Time Stddev"] = stddev
+    summary["Cluster Time CI Low"] = mean - half_width
+    summary["Cluster Time CI High"] = mean + half_width
+  return summary
+
+def isWarmupRound(round):
+  return str(round).startswith("warmup")
+
+def clusterTimes(series):
+  return [float(runtime_dict["Cluster Time"]) for runtime_dict in series
+          if runtime_dict.get("Status", "OK") == "OK" and runtime_dict.get("Cluster Time") is not None]
+
+'''
+Returns whether another round of a config should be run, after the rounds
+in series (a list of runtime dicts). The time taken by the rounds is the sum
+of their Total Time, so that rounds restored with "Resume: true" count too.
+'''
+def needMoreRounds(series):
+  if len(series) < runner_utils.num_rounds:
+    return True
+  if runner_utils.target_ci_width is None:
+    return False
+  if series[-1].get("Status", "OK") != "OK":
+    # Repeating a failing config does not make its time more reliable.
+    return False
+  if len(series) >= runner_utils.max_rounds:
+    return False
+  elapsed = sum(float(runtime_dict.get("Total Time") or 0) for runtime_dict in series)
+  if runner_utils.round_time_budget is not None and elapsed >= runner_utils.round_time_budget:
+    return False
+  summary = summarize(clusterTimes(series))
+  if "Cluster Time CI Low" not in summary:
+    return True
+  width = summary["Cluster Time CI High"] - summary["Cluster Time CI Low"]
+  return width > runner_utils.target_ci_width * summary["Cluster Time Mean"]
+
+def addSummary(series):
+  summary = summarize(clusterTimes(series))
+  for runtime_dict in series:
+    runtime_dict.update(summary)
+
+'''
+Adds the self-relative speedup and parallel efficiency of each config to the
+rounds of a clusterer on a graph with several numbers of threads. The speedup
+at a number of threads is the mean Cluster Time with the fewest threads
+divided by the mean Cluster Time with that number of threads, and the
+efficiency is the speedup divided by the ratio of the numbers of threads.
+Input:
+runs: type: list, runtime dicts of the rounds
+thread_count: function returning the number of threads of a Threads value
+'''
+def addScaling(runs, thread_count):
+  series = {}
+  for runtime_dict in runs:
+    series.setdefault(runtime_dict["Config"], {}).setdefault(runtime_dict["Threads"], []).append(runtime_dict)
+  for config_series in series.values():
+    means = {}
+    for thread, thread_series in config_series.items():
+      times = clusterTimes(thread_series)
+      if times and statistics.mean(times) > 0:
+        means[thread] = statistics.mean(times)
+    if not means:
+      continue
+    base = min(means, key=thread_count)
+    for thread, mean in means.items():
+      speedup = means[base] / mean
+      for runtime_dict in config_series[thread]:
+        runtime_dict["Speedup"] = speedup
+        runtime_dict["Parallel Efficiency"] = speedup * thread_count(base) / thread_count(thread)
+
+'''
+Returns the rounds that were run for a config: the first Number of rounds
+rounds, and the extra rounds recorded in the manifest.
+Input:
+runtime_dict: type: dict, run information of the config (without Round)
+'''
+def recordedRounds(manifest, runtime_dict):
+  rounds = list(range(runner_utils.num_rounds))
+  round = runner_utils.num_rounds
+  while manifest.get(dict(runtime_dict, Round=round)) is not None:
+    rounds.append(round)
+    round += 1
+  return rounds
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import runner_utils
+import clustering_io
+
+'''
+A manifest of the jobs run by cluster.py, stored as one JSON record per line
+in the output directory. Each record is keyed by (graph, clusterer, threads,
+config, round), and holds the status and exit code of the job, the checksum
+of its clustering, and its runtime information (RECORD_COLUMNS), as reported
+by the backend that ran it. Later records for the same key replace earlier
+ones, so a rerun job simply appends a new record.
+
+The records are the source of run information for postprocessing, stats.py
+and output_reader.py, so that the .out files do not have to be parsed.
+
+With "Resume: true", jobs whose latest record is OK (and whose clustering is
+unchanged) are not run again.
+'''
+
+MANIFEST_FILENAME = "manifest.jsonl"
+KEY_COLUMNS = ["Input Graph", "Clusterer Name", "Threads", "Config", "Round"]
+# Run information held by a record, in addition to its key. A backend only
+# reports the columns that apply to it.
+RECORD_COLUMNS = (["Read Time", "Text Read Time", "Binary Read Time", "Connect Time",
+                   "Preprocess Time", "Graph Preprocess Time", "Core Decomposition Time", "Thread Setup Time", "Cluster Time", "GDS Preprocessing Millis",
+                   "GDS Compute Millis", "GDS Postprocessing Millis", "Fetch Time", "Result Gather Time",
+                   "Extract Time", "Compact Time", "Write Time", "Total Time", "Harness Overhead", "Num Vertices", "Num Clusters"] +
+                  runner_utils.RESOURCE_COLUMNS + ["Status", "Exit Code"])
+
+# Columns of runtimes.csv that were renamed, by their earlier name.
+# runtimes.csv has them under both names, so that existing notebooks and
+# scripts that read the earlier name keep working.
+LEGACY_COLUMNS = {"Num clusters": "Num Clusters"}
+
+'''
+Adds the columns of LEGACY_COLUMNS under their earlier names to a data frame
+of runs, and returns the earlier names that were added.
+'''
+def addLegacyColumns(dataframe):
+  added = []
+  for legacy_column, column in LEGACY_COLUMNS.items():
+    if column in dataframe.columns:
+      dataframe[legacy_column] = dataframe[column]
+      added.append(legacy_column)
+  return added
+
+def jobKey(runtime_dict):
+  return tuple(str(runtime_dict[column]) for column in KEY_COLUMNS)
+
+def fileChecksum(filename):
+  return fileChecksumAndLines(filename)[0]
+
+# Returns the checksum and the number of lines of a file, read in one pass,
+# or (None, None) if the file does not exist.
+def fileChecksumAndLines(filename):
+  if not os.path.exists(filename):
+    return None, None
+  sha = hashlib.sha256()
+  num_lines = 0
+  with open(filename, "rb") as f:
+    for block in iter(lambda: f.read(1 << 20), b""):
+      sha.update(block)
+      num_lines += block.count(b"\n")
+  return sha.hexdigest(), num_lines
+
+def readRecords(output_directory):
+  return list(RunManifest(output_directory).records.values())
+
+class RunManifest:
+  def __init__(self, output_directory):
+    self.filename = os.path.join(output_directory, MANIFEST_FILENAME)
+    self.lock = threading.Lock()
+    self.records = {}
+    if os.path.exists(self.filename):
+      with open(self.filename, "r") as f:
+        for line in f:
+          line = line.strip()
+          if not line:
+            continue
+          try:
+            record = json.loads(line)
+          except ValueError:
+            # A line cut short by a crash while writing it.
+            continue
+          self.records[jobKey(record)] = record
+
+  '''
+  Returns the latest record of the job described by runtime_dict, or None.
+  '''
+  def get(self, runtime_dict):
+    return self.records.get(jobKey(runtime_dict))
+
+  '''
+  Fills runtime_dict with the run information of the latest record of its
+  job. Returns False if the job has no record.
+  '''
+  def load(self, runtime_dict):
+    record = self.get(runtime_dict)
+    if record is None:
+      return False
+    for k, v in record.items():
+      if k not in ["Checksum", "Output Prefix"]:
+        runtime_dict[k] = v
+    return True
+
+  '''
+  If the job described by runtime_dict completed successfully in an earlier
+  run, and its clustering has not changed since, fills runtime_dict from the
+  manifest and returns True. Otherwise, returns False.
+  '''
+  def restore(self, runtime_dict, out_prefix):
+    record = self.get(runtime_dict)
+    if record is None or record["Status"] != "OK":
+      return False
+    if record["Checksum"] != fileChecksum(clustering_io.clusteringPath(out_prefix)):
+      return False
+    self.load(runtime_dict)
+    print("skipping completed job " + out_prefix)
+    return True
+
+  '''
+  Appends a record for a job that has just run, and sets its Status, Exit
+  Code and (if the backend did not report it) Num Clusters in runtime_dict.
+  If the runner did not set a Status (TIMEOUT, OOM or CRASH), the job is OK
+  if it exited with code 0 and reported a Cluster Time, and FAILED otherwise.
+  '''
+  def record(self, runtime_dict, out_prefix):
+    exit_code = runtime_dict.get("Exit Code", 0)
+    status = runtime_dict.get("Status")
+    if status is None:
+      status = "OK" if (exit_code == 0 and runtime_dict.get("Cluster Time") is not None) else "FAILED"
+    clustering = clustering_io.clusteringPath(out_prefix)
+    checksum, num_lines = fileChecksumAndLines(clustering)
+    runtime_dict["Status"] = status
+    runtime_dict["Exit Code"] = exit_code
+    if runtime_dict.get("Num Clusters") is None and num_lines is not None:
+      runtime_dict["Num Clusters"] = clustering_io.numClusters(clustering) if clustering.endswith(".bin") else num_lines
+    record = dict(runtime_dict)
+    record["Checksum"] = checksum
+    record["Output Prefix"] = out_prefix
+    with self.lock:
+      self.records[jobKey(record)] = record
+      with open(self.filename, "a+") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
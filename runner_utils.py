@@ -5,25 +5,299 @@ import time
 import subprocess
 import re
 import itertools
+import resource
+import threading
+import contextlib
+
+# Process groups of the commands that are running, which are killed on
+# Ctrl-C (they run in their own sessions, so they do not receive it).
+running_process_groups = set()
+running_process_groups_lock = threading.Lock()
 
 def signal_handler(signal,frame):
   print("bye\n")
+  for pgid in list(running_process_groups):
+    killProcessGroup(pgid)
   sys.exit(0)
 signal.signal(signal.SIGINT,signal_handler)
 
-def shellGetOutput(str1) :
-  process = subprocess.Popen(str1,shell=True,stdout=subprocess.PIPE,
-                             stderr=subprocess.PIPE, universal_newlines=True)
-  output, err = process.communicate()
-  
+# Starts a shell command in its own process group, so that it can be killed
+# together with all of its children.
+def startProcess(str1, **kwargs):
+  process = subprocess.Popen(str1, shell=True, start_new_session=True, **kwargs)
+  with running_process_groups_lock:
+    running_process_groups.add(process.pid)
+  return process
+
+def killProcessGroup(pgid):
+  try:
+    os.killpg(pgid, signal.SIGKILL)
+  except ProcessLookupError:
+    pass
+
+def finishProcess(process):
+  with running_process_groups_lock:
+    running_process_groups.discard(process.pid)
+
+# Starts a timer that kills the process group of process after timeout
+# seconds, and returns it, or None if there is no timeout. timed_out is a
+# list, to which True is appended if the timer fires.
+def startKillTimer(process, timeout, timed_out):
+  if not timeout:
+    return None
+  def kill():
+    timed_out.append(True)
+    killProcessGroup(process.pid)
+  timer = threading.Timer(timeout, kill)
+  timer.daemon = True
+  timer.start()
+  return timer
+
+# Status of a finished run: OK, TIMEOUT, OOM (killed by SIGKILL other than
+# by a timeout, which is what the kernel OOM killer does, or failed to
+# allocate memory), CRASH (killed by another signal) or FAILED (a nonzero
+# exit code).
+def runStatus(returncode, output, timed_out=False):
+  if timed_out:
+    return "TIMEOUT"
+  if returncode == 0:
+    return "OK"
+  # The shell reports a child killed by a signal as 128 + the signal number.
+  signum = -returncode if returncode < 0 else (returncode - 128 if returncode > 128 else None)
+  if signum == signal.SIGKILL or "std::bad_alloc" in output or "MemoryError" in output:
+    return "OOM"
+  if signum is not None:
+    return "CRASH"
+  return "FAILED"
+
+# Runs a shell command, and returns a dict with its stdout ("output"), exit
+# code ("returncode"), status ("status", see runStatus) and resource usage
+# ("usage", see RESOURCE_COLUMNS).
+# If timeout (in seconds) is given, the command and all of its children are
+# killed once it expires. If out_filename is given, stdout is appended to it
+# while the command runs, so that the output of a killed run is kept.
+def runCommand(str1, timeout=None, out_filename=None):
+  process = startProcess(str1, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True)
+  timed_out = []
+  timer = startKillTimer(process, timeout, timed_out)
+  # stderr is read in another thread, so that neither pipe can fill up.
+  err_chunks = []
+  err_thread = threading.Thread(target=lambda: err_chunks.append(process.stderr.read()))
+  err_thread.start()
+  out_chunks = []
+  out_file = open(out_filename, "a+") if out_filename else None
+  for line in process.stdout:
+    out_chunks.append(line)
+    if out_file:
+      out_file.write(line)
+      out_file.flush()
+  if out_file:
+    out_file.close()
+  err_thread.join()
+  output = "".join(out_chunks)
+  err = "".join(err_chunks)
+  process.stdout.close()
+  process.stderr.close()
+  # wait4 instead of process.wait(), to get the resource usage of the process
+  # and of the children it waited for.
+  _, status, usage = os.wait4(process.pid, 0)
+  process.returncode = os.waitstatus_to_exitcode(status)
+  if timer:
+    timer.cancel()
+  finishProcess(process)
+
   if (len(err) > 0):
     print(str1+"\n"+output+err)
-  return output
+  return {"output": output, "returncode": process.returncode,
+          "status": runStatus(process.returncode, output + err, bool(timed_out)),
+          "usage": rusageDict(usage)}
+
+class JobTimeout(Exception):
+  pass
+
+# Raises JobTimeout in the main thread once timeout seconds have passed, for
+# runs within the runner process (NetworKit, Neo4j, TigerGraph). Native code,
+# such as a NetworKit algorithm, is not interrupted; the timeout is raised as
+# soon as it returns.
+@contextlib.contextmanager
+def inProcessTimeout(timeout):
+  if not timeout or threading.current_thread() is not threading.main_thread():
+    yield
+    return
+  def handler(signum, frame):
+    raise JobTimeout("Timed out after " + str(timeout) + " seconds")
+  previous_handler = signal.signal(signal.SIGALRM, handler)
+  signal.setitimer(signal.ITIMER_REAL, timeout)
+  try:
+    yield
+  finally:
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    signal.signal(signal.SIGALRM, previous_handler)
+
+# Parses a timeout in the format of the timeout command (a number with an
+# optional suffix s, m, h or d) into seconds; returns None for no timeout.
+def parseTimeout(timeout):
+  if timeout is None or timeout == "" or timeout == "NONE":
+    return None
+  units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+  if timeout[-1] in units:
+    return float(timeout[:-1]) * units[timeout[-1]]
+  return float(timeout)
+
+# Parses a size in bytes, with an optional suffix K, M, G or T.
+def parseSize(size):
+  units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+  if size[-1].upper() in units:
+    return int(float(size[:-1]) * units[size[-1].upper()])
+  return int(size)
+
+def shellGetOutput(str1) :
+  return runCommand(str1)["output"]
+
+# Resource usage columns of a run. Max RSS is the peak resident set size in
+# KB; the CPU times are in seconds.
+RESOURCE_COLUMNS = ["Max RSS", "User CPU Time", "System CPU Time",
+                    "Voluntary Context Switches", "Involuntary Context Switches",
+                    "Minor Page Faults", "Major Page Faults"]
+
+def rusageDict(usage):
+  return {"Max RSS": usage.ru_maxrss,
+          "User CPU Time": usage.ru_utime,
+          "System CPU Time": usage.ru_stime,
+          "Voluntary Context Switches": usage.ru_nvcsw,
+          "Involuntary Context Switches": usage.ru_nivcsw,
+          "Minor Page Faults": usage.ru_minflt,
+          "Major Page Faults": usage.ru_majflt}
+
+# Returns the resource usage printed by a persistent worker for a job, or
+# None if the output has none.
+def getOutputResourceUsage(out):
+  usage = {}
+  for column in RESOURCE_COLUMNS:
+    value = getOutputValue(out, column + ":")
+    if value is not None:
+      usage[column] = value
+  return usage if usage else None
+
+# Adds resource usage to the usage of a run in runtime_dict, for runs made of
+# several processes: Max RSS is the largest peak, the rest are summed.
+def addResourceUsage(runtime_dict, usage):
+  for column in RESOURCE_COLUMNS:
+    if column not in usage:
+      continue
+    if column not in runtime_dict:
+      runtime_dict[column] = usage[column]
+    elif column == "Max RSS":
+      runtime_dict[column] = max(runtime_dict[column], usage[column])
+    else:
+      runtime_dict[column] += usage[column]
+
+# Starts measuring the resource usage of a run in this process (such as a
+# NetworKit run). The peak RSS of the process is reset where the kernel
+# supports it, so that the peak of the run can be measured; otherwise it is
+# the peak of the whole runner process so far.
+def startInProcessUsage():
+  try:
+    with open("/proc/self/clear_refs", "w") as f:
+      f.write("5")
+  except OSError:
+    pass
+  return resource.getrusage(resource.RUSAGE_SELF)
+
+# Returns the resource usage of this process since startInProcessUsage()
+# returned before.
+def getInProcessUsage(before):
+  usage = rusageDict(resource.getrusage(resource.RUSAGE_SELF))
+  before = rusageDict(before)
+  for column in RESOURCE_COLUMNS:
+    if column != "Max RSS":
+      usage[column] -= before[column]
+  try:
+    with open("/proc/self/status", "r") as f:
+      for line in f:
+        if line.startswith("VmHWM:"):
+          usage["Max RSS"] = int(line.split()[1])
+  except OSError:
+    pass
+  return usage
+
+# Paths of bazel binaries that have already been built, keyed by target.
+binary_paths = {}
+
+# Returns the command prefix that runs a bazel target; arguments to the binary
+# can be appended to it. The target is built once, on the first call, and
+# later calls exec the built binary directly, without going through bazel.
+# With "Bazel run: true", every invocation goes through "bazel run" instead.
+def getBinaryCommand(target):
+  if bazel_run == "true":
+    return "bazel run " + target + " --"
+  if target not in binary_paths:
+    print("Building " + target)
+    result = runCommand("bazel build " + target)
+    if result["returncode"] != 0:
+      raise RuntimeError("Failed to build " + target)
+    files = runCommand("bazel cquery --output=files " + target)["output"].split()
+    if not files:
+      raise RuntimeError("Cannot find the binary of " + target)
+    binary_paths[target] = os.path.abspath(files[0])
+  return binary_paths[target]
+
+# Returns the number at the end of the last line of the output of a run that
+# starts with prefix, or None if there is no such line.
+def getOutputValue(out, prefix):
+  value = None
+  for line in out.split("\n"):
+    if line.startswith(prefix):
+      value = float(line.split(' ')[-1].strip())
+  return value
+
+# Returns the value of a "<name> Time: <seconds>" line in the output of a run,
+# or None if the run did not report it.
+def getOutputTime(out, name):
+  return getOutputValue(out, name + " Time:")
+
+# The phases of a run, as reported by the backend. Text Read Time and Binary
+# Read Time are part of Read Time.
+PHASE_COLUMNS = ["Read Time", "Connect Time", "Preprocess Time", "Thread Setup Time", "Cluster Time",
+                 "Fetch Time", "Result Gather Time", "Extract Time", "Compact Time", "Write Time"]
+
+# Records the time taken by a phase of a run within the runner process as
+# runtime_dict[name + " Time"], if the phase completes.
+@contextlib.contextmanager
+def timePhase(runtime_dict, name):
+  start_time = time.time()
+  yield
+  runtime_dict[name + " Time"] = time.time() - start_time
+
+# Harness overhead of a run: its Total Time, minus the time of the phases
+# reported by the backend (read, cluster, write, ...). For native runs, this is the time spent in
+# bazel, process startup and teardown. Returns None if the run did not report
+# a Cluster Time. The Graph Preprocess Time of Tectonic is charged to the
+# Cluster Time of every run of a graph, but only the time the run spent on it
+# (its Preprocess Time) is part of its Total Time.
+def harnessOverhead(runtime_dict):
+  if runtime_dict.get("Cluster Time") is None or runtime_dict.get("Total Time") is None:
+    return None
+  backend_time = 0
+  for name in PHASE_COLUMNS:
+    if runtime_dict.get(name) is not None:
+      backend_time += float(runtime_dict[name])
+  if runtime_dict.get("Graph Preprocess Time") is not None:
+    backend_time -= float(runtime_dict["Graph Preprocess Time"])
+  return float(runtime_dict["Total Time"]) - backend_time
 
 def appendToFile(out, filename):
   with open(filename, "a+") as out_file:
     out_file.writelines(out)
 
+# Removes the output files of an earlier run with the same output prefix, so
+# that a rerun job does not append to them.
+def removeOutputs(out_prefix):
+  for postfix in [".out", ".cluster", ".cluster.bin", ".tmpcluster"]:
+    if os.path.exists(out_prefix + postfix):
+      os.remove(out_prefix + postfix)
+
 def makeConfigCombos(current_configs):
   config_combos = itertools.product(*current_configs)
   config_combos_formatted = []
@@ -51,6 +325,11 @@ def makeConfigCombosModularity(current_configs):
   # exit(1)
   return config_combos_formatted
 
+# The compiler and Python used for the external tools (SNAP and Tectonic),
+# unless system.config sets them.
+gplusplus_ver = "g++"
+python_ver = "python3"
+
 def readSystemConfig(filename):
   global gplusplus_ver, python_ver
   with open(filename, "r") as in_file:
@@ -66,13 +345,51 @@ def readSystemConfig(filename):
 def readConfig(filename):
   global input_directory, output_directory, csv_output_directory, clusterers, graphs, num_threads
   global clusterer_configs, num_rounds, timeout, clusterer_config_names
+  global warmup_rounds, target_ci_width, confidence_level, max_rounds, round_time_budget
+  global tectonic_pipeline, tectonic_threshold_sweep, kcore_threshold_sweep
+  global clustering_format
+  global clusterer_config_axes, search_objective, search_budget
   global gbbs_format
   global weighted
   global tigergraph_edges, tigergraph_nodes
   global postprocess_only, write_clustering
+  global persistent_worker
+  global parallel_jobs, num_cores, exclusive_clusterers
+  global resume, bazel_run
+  global graph_cache, graph_cache_directory, graph_cache_key
+  global networkit_graph_cache_size, networkit_binary
+  global networkit_thread_scaling, networkit_scaling_warmup
+  global neo4j_projection, neo4j_chunk_size, neo4j_execution_mode
   num_threads = num_rounds = timeout = gbbs_format = weighted = tigergraph_edges = tigergraph_nodes = None
   postprocess_only = "false"
   write_clustering = "true"
+  persistent_worker = "false"
+  parallel_jobs = "false"
+  num_cores = None
+  exclusive_clusterers = []
+  resume = "false"
+  bazel_run = "false"
+  graph_cache = "false"
+  graph_cache_directory = None
+  graph_cache_key = "mtime"
+  networkit_graph_cache_size = None
+  networkit_binary = "false"
+  networkit_thread_scaling = "false"
+  networkit_scaling_warmup = "false"
+  neo4j_projection = "construct"
+  neo4j_chunk_size = 100000
+  neo4j_execution_mode = "stream"
+  search_objective = "fScore_mean"
+  search_budget = None
+  warmup_rounds = 0
+  target_ci_width = None
+  confidence_level = 0.95
+  max_rounds = None
+  round_time_budget = None
+  tectonic_pipeline = "scripts"
+  tectonic_threshold_sweep = "false"
+  kcore_threshold_sweep = "false"
+  clustering_format = "text"
   clusterers = []
   with open(filename, "r") as in_file:
     for line in in_file:
@@ -89,12 +406,31 @@ def readConfig(filename):
           clusterers = [x.strip() for x in split[1].split(';')]
           clusterer_configs = len(clusterers)*[None]
           clusterer_config_names = len(clusterers)*[None]
+          clusterer_config_axes = len(clusterers)*[None]
         elif split[0].startswith("Graphs"):
           graphs = [x.strip() for x in split[1].split(';')]
         elif split[0].startswith("Number of threads") and len(split) > 1:
           num_threads = [x.strip() for x in split[1].split(';')]
         elif split[0].startswith("Number of rounds") and len(split) > 1:
           num_rounds = 1 if split[1] == "" else int(split[1])
+        elif split[0].startswith("Warmup rounds") and len(split) > 1 and split[1] != "":
+          warmup_rounds = int(split[1])
+        elif split[0].startswith("Target CI width") and len(split) > 1 and split[1] != "":
+          target_ci_width = float(split[1])
+        elif split[0].startswith("Confidence level") and len(split) > 1 and split[1] != "":
+          confidence_level = float(split[1])
+        elif split[0].startswith("Max rounds") and len(split) > 1 and split[1] != "":
+          max_rounds = int(split[1])
+        elif split[0].startswith("Round time budget") and len(split) > 1:
+          round_time_budget = split[1]
+        elif split[0].startswith("Tectonic pipeline") and len(split) > 1 and split[1] != "":
+          tectonic_pipeline = split[1]
+        elif split[0].startswith("Clustering format") and len(split) > 1 and split[1] != "":
+          clustering_format = split[1]
+        elif split[0].startswith("Tectonic threshold sweep"):
+          tectonic_threshold_sweep = split[1]
+        elif split[0].startswith("KCore threshold sweep"):
+          kcore_threshold_sweep = split[1]
         elif split[0].startswith("Timeout") and len(split) > 1:
           timeout = split[1]
         elif split[0].startswith("GBBS format") and len(split) > 1:
@@ -113,6 +449,42 @@ def readConfig(filename):
           postprocess_only = split[1]
         elif split[0].startswith("Write clustering"):
           write_clustering = split[1]
+        elif split[0].startswith("Persistent worker"):
+          persistent_worker = split[1]
+        elif split[0].startswith("Parallel jobs"):
+          parallel_jobs = split[1]
+        elif split[0].startswith("Number of cores") and len(split) > 1 and split[1] != "":
+          num_cores = int(split[1])
+        elif split[0].startswith("Exclusive clusterers") and len(split) > 1:
+          exclusive_clusterers = [x.strip() for x in split[1].split(';')]
+        elif split[0].startswith("Resume"):
+          resume = split[1]
+        elif split[0].startswith("Bazel run"):
+          bazel_run = split[1]
+        elif split[0].startswith("Search objective") and len(split) > 1 and split[1] != "":
+          search_objective = split[1]
+        elif split[0].startswith("Search budget") and len(split) > 1 and split[1] != "":
+          search_budget = int(split[1])
+        elif split[0].startswith("NetworKit graph cache size") and len(split) > 1 and split[1] != "":
+          networkit_graph_cache_size = parseSize(split[1])
+        elif split[0].startswith("NetworKit thread scaling"):
+          networkit_thread_scaling = split[1]
+        elif split[0].startswith("NetworKit scaling warmup"):
+          networkit_scaling_warmup = split[1]
+        elif split[0].startswith("Neo4j projection") and len(split) > 1 and split[1] != "":
+          neo4j_projection = split[1]
+        elif split[0].startswith("Neo4j chunk size") and len(split) > 1 and split[1] != "":
+          neo4j_chunk_size = int(split[1])
+        elif split[0].startswith("Neo4j execution mode") and len(split) > 1 and split[1] != "":
+          neo4j_execution_mode = split[1]
+        elif split[0].startswith("NetworKit binary"):
+          networkit_binary = split[1]
+        elif split[0].startswith("Graph cache directory") and len(split) > 1 and split[1] != "":
+          graph_cache_directory = split[1]
+        elif split[0].startswith("Graph cache key"):
+          graph_cache_key = split[1]
+        elif split[0].startswith("Graph cache"):
+          graph_cache = split[1]
         else:
           for index, clusterer_name in enumerate(clusterers):
             if split[0] == clusterer_name:
@@ -128,16 +500,23 @@ def readConfig(filename):
                   next_line = in_file.readline().strip()
                 except StopIteration as err:
                   break
+              # The values of each config argument; clusterer_configs is their
+              # product, with the last argument varying fastest.
+              clusterer_config_axes[index] = current_configs
               if (clusterer_name == "ParallelModularityClusterer"):
                 clusterer_configs[index] = makeConfigCombosModularity(current_configs)
               else:
                 clusterer_configs[index] = makeConfigCombos(current_configs)
               break
   num_threads = ["ALL"] if num_threads is None or not num_threads else num_threads
-  timeout = "" if (timeout is None or timeout == "" or timeout == "NONE") else "timeout " + timeout
+  timeout = parseTimeout(timeout)
   num_rounds = 1 if (num_rounds is None) else num_rounds
+  max_rounds = max(num_rounds, 10 * num_rounds if max_rounds is None else max_rounds)
+  round_time_budget = parseTimeout(round_time_budget)
   gbbs_format = "false" if (gbbs_format is None or gbbs_format == "") else gbbs_format
   weighted = "false" if (weighted is None or weighted == "") else weighted
+  if graph_cache_directory is None and output_directory is not None:
+    graph_cache_directory = os.path.join(output_directory, "graph_cache")
 
 
 def readStatsConfig(filename):
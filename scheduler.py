@@ -0,0 +1,87 @@
+import os
+import threading
+import traceback
+
+'''
+Runs independent jobs concurrently without oversubscribing the machine.
+Each job reserves a number of cores (its number of threads) for as long as it
+runs, and a job is only started when enough cores are free. Exclusive jobs
+run alone, so that timing-critical runs are not disturbed by other jobs.
+
+Jobs are started in submission order, except that a job that does not fit
+into the free cores is skipped over until it does, so that smaller jobs later
+in the list can fill the remaining cores. Jobs are never started ahead of a
+waiting exclusive job.
+'''
+class CoreScheduler:
+  def __init__(self, num_cores=None):
+    self.num_cores = num_cores if num_cores else os.cpu_count()
+    self.jobs = []
+    self.condition = threading.Condition()
+    self.free_cores = self.num_cores
+    self.num_running = 0
+    self.exclusive_running = False
+
+  '''
+  Adds a job to the queue. Jobs only start running when run() is called.
+  Input:
+  func: the function to call
+  args: type: tuple, arguments of func
+  cores: type: int, number of cores the job reserves; values larger than the
+    machine are capped to the machine size
+  exclusive: type: bool, whether the job must run alone
+  '''
+  def submit(self, func, args, cores, exclusive=False):
+    cores = max(1, min(int(cores), self.num_cores))
+    self.jobs.append((func, args, cores, exclusive))
+
+  def _canStart(self, cores, exclusive):
+    if self.exclusive_running:
+      return False
+    if exclusive:
+      return self.num_running == 0
+    return cores <= self.free_cores
+
+  def _runJob(self, func, args, cores, exclusive):
+    try:
+      func(*args)
+    except Exception:
+      traceback.print_exc()
+    finally:
+      with self.condition:
+        self.free_cores += cores
+        self.num_running -= 1
+        if exclusive:
+          self.exclusive_running = False
+        self.condition.notify_all()
+
+  '''
+  Runs all submitted jobs, and returns once all of them have finished.
+  '''
+  def run(self):
+    pending = self.jobs
+    self.jobs = []
+    threads = []
+    with self.condition:
+      while pending:
+        started = False
+        for job in list(pending):
+          func, args, cores, exclusive = job
+          if not self._canStart(cores, exclusive):
+            if exclusive:
+              # Let the running jobs drain instead of starving the exclusive job.
+              break
+            continue
+          pending.remove(job)
+          self.free_cores -= cores
+          self.num_running += 1
+          if exclusive:
+            self.exclusive_running = True
+          thread = threading.Thread(target=self._runJob, args=job)
+          thread.start()
+          threads.append(thread)
+          started = True
+        if not started:
+          self.condition.wait()
+    for thread in threads:
+      thread.join()
@@ -6,66 +6,75 @@ import subprocess
 import re
 import itertools
 import runner_utils
+import run_manifest
+import graph_cache
+import repetition
+import clustering_io
+import output_reader
 import json
 import pandas as pd
 
 from stats_precision_recall_pair import compute_precision_recall_pair
 
-def getRunTime(clusterer, out_prefix):
-  cluster_time = -1
-  out_filename = out_prefix + ".out"
+# Adds the run information of the run with the given output prefix to
+# stats_dict, from its record in the manifest (or from its .out file, for runs
+# from before the manifest).
+def addRunInfo(manifest, stats_dict, out_prefix):
+  runtime_dict = {}
+  for column in run_manifest.KEY_COLUMNS:
+    runtime_dict[column] = stats_dict[column]
+  if runtime_dict["Config"] is None:
+    runtime_dict["Config"] = ""
+  if not manifest.load(runtime_dict):
+    runtime_dict = output_reader.read_run_info(out_prefix)
+  for column in run_manifest.RECORD_COLUMNS:
+    if column in runtime_dict:
+      stats_dict[column] = runtime_dict[column]
+  if "Cluster Time" not in stats_dict:
+    stats_dict["Cluster Time"] = -1
 
-  if clusterer.startswith("TigerGraph"):
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith('Total Time:'):
-          cluster_time = elem.split(' ')[-1].strip()
-  elif clusterer.startswith("Snap"):
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith('Wealy Connected Component Time:') or elem.startswith('KCore Time:') or elem.startswith('Cluster Time:'):
-          cluster_time = elem.split(' ')[-1].strip()
-  elif clusterer.startswith("Neo4j"):
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith("Time:"):
-          cluster_time = elem.split(' ')[-1].strip()
-  else: # our cluseterer and Networkit and Tectonic
-    with open(out_filename,'r') as f:
-      run_info = f.readlines()
-      for elem in run_info[1:]:
-        if elem.startswith('Cluster Time:'):
-          cluster_time = elem.split(' ')[-1].strip()
-
-  return cluster_time
+# Whether the statistics are computed by stats-in-memory_main (and not by
+# stats_precision_recall_pair.py), so that it has to be built.
+def usesStatsBinary():
+  return "precision_recall_pair_thresholds" not in runner_utils.stats_config
 
 def runStats(out_prefix, graph, graph_idx, stats_dict):
   out_statistics = out_prefix + ".stats"
   out_statistics_pair = out_prefix + ".pair.stats"
-  in_clustering = out_prefix + ".cluster"
+  in_clustering = clustering_io.clusteringPath(out_prefix)
   if not os.path.exists(in_clustering) or not os.path.getsize(in_clustering) > 0:
     # Either an error or a timeout happened
     runner_utils.appendToFile("ERROR", out_statistics)
     return
-  use_input_graph = runner_utils.input_directory + graph
+  use_input_graph, is_gbbs_format = graph_cache.getNativeInputGraph(runner_utils.input_directory + graph)
   input_communities = runner_utils.input_directory + runner_utils.communities[graph_idx]
-  if "precision_recall_pair_thresholds" in runner_utils.stats_config:
+  if not usesStatsBinary():
     compute_precision_recall_pair(in_clustering, input_communities, out_statistics_pair, runner_utils.stats_config, stats_dict)
     return
   use_input_communities = "" if not runner_utils.communities else "--input_communities=" + input_communities
-  ss = ("bazel run //clusterers:stats-in-memory_main -- "
+  ss = (runner_utils.getBinaryCommand("//clusterers:stats-in-memory_main") + " "
   "--input_graph=" + use_input_graph + " "
-  "--is_gbbs_format=" + runner_utils.gbbs_format + " "
+  "--is_gbbs_format=" + is_gbbs_format + " "
   "--float_weighted=" + runner_utils.weighted + " "
   "--input_clustering=" + in_clustering + " "
   "--output_statistics=" + out_statistics + " " + use_input_communities + " "
   "--statistics_config='" + runner_utils.stats_config + "'")
   if(runner_utils.postprocess_only == "false"):
     print(ss)
+    start_time = time.time()
     out = runner_utils.shellGetOutput(ss)
+    stats_dict["Stats Wall Time"] = time.time() - start_time
+    # The phases reported by the stats binary; the rest of the wall time is
+    # spent in process startup and teardown.
+    phase_time = 0.0
+    for name, column in [("Read", "Stats Read Time"), ("Read Clustering", "Stats Read Clustering Time"),
+                         ("Stats", "Stats Compute Time"), ("Write", "Stats Write Time")]:
+      value = runner_utils.getOutputTime(out, name)
+      if value is not None:
+        stats_dict[column] = value
+        phase_time += value
+    if stats_dict.get("Stats Compute Time") is not None:
+      stats_dict["Stats Harness Overhead"] = stats_dict["Stats Wall Time"] - phase_time
 
   out_statistics_file = open(out_statistics, "r")
   out_statistics_string = out_statistics_file.read()
@@ -84,6 +93,10 @@ def runStats(out_prefix, graph, graph_idx, stats_dict):
 def runAll(config_filename, stats_config_filename):
   runner_utils.readConfig(config_filename)
   runner_utils.readStatsConfig(stats_config_filename)
+  if runner_utils.postprocess_only == "false" and usesStatsBinary():
+    # Build once up front, instead of going through bazel for every run.
+    runner_utils.getBinaryCommand("//clusterers:stats-in-memory_main")
+  manifest = run_manifest.RunManifest(runner_utils.output_directory)
   stats = []
   for clusterer_idx, clusterer in enumerate(runner_utils.clusterers):
     if clusterer == "SKIP":
@@ -92,7 +105,7 @@ def runAll(config_filename, stats_config_filename):
       if graph == "SKIP":
         continue
       if clusterer.startswith("Snap"):
-        for i in range(runner_utils.num_rounds):
+        for i in repetition.recordedRounds(manifest, {"Clusterer Name": clusterer, "Input Graph": graph, "Threads": 1, "Config": ""}):
           if runner_utils.deterministic == "true" and i != 0:
             continue
           out_prefix = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + str(i)
@@ -102,8 +115,9 @@ def runAll(config_filename, stats_config_filename):
           stats_dict["Threads"] = 1
           stats_dict["Config"] = None
           stats_dict["Round"] = i
-          stats_dict["Cluster Time"] = getRunTime(clusterer, out_prefix)
-          runStats(out_prefix, graph, graph_idx, stats_dict)
+          addRunInfo(manifest, stats_dict, out_prefix)
+          if stats_dict.get("Status", "OK") == "OK":
+            runStats(out_prefix, graph, graph_idx, stats_dict)
           stats_dict["Ground Truth"] = runner_utils.communities[graph_idx]
           stats.append(stats_dict)
         continue
@@ -114,7 +128,7 @@ def runAll(config_filename, stats_config_filename):
         config_prefix = runner_utils.clusterer_config_names[clusterer_idx] + "{" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
         config_postfix = "}" if runner_utils.clusterer_configs[clusterer_idx] is not None else ""
         for config_idx, config in enumerate(configs):
-          for i in range(runner_utils.num_rounds):
+          for i in repetition.recordedRounds(manifest, {"Clusterer Name": clusterer, "Input Graph": graph, "Threads": thread, "Config": config}):
             if runner_utils.deterministic == "true" and i != 0:
               continue
             out_prefix = runner_utils.output_directory + clusterer + "_" + str(graph_idx) + "_" + thread + "_" + str(config_idx) + "_" + str(i)
@@ -125,8 +139,11 @@ def runAll(config_filename, stats_config_filename):
               stats_dict["Threads"] = thread
               stats_dict["Config"] = config
               stats_dict["Round"] = i
-              stats_dict["Cluster Time"] = getRunTime(clusterer, out_prefix)
-              runStats(out_prefix, graph, graph_idx, stats_dict)
+              addRunInfo(manifest, stats_dict, out_prefix)
+              # Runs that did not finish (e.g. TIMEOUT, OOM or CRASH) are kept
+              # in stats.csv with their Status, but have no statistics.
+              if stats_dict.get("Status", "OK") == "OK":
+                runStats(out_prefix, graph, graph_idx, stats_dict)
               stats_dict["Ground Truth"] = runner_utils.communities[graph_idx]
               stats.append(stats_dict)
             except FileNotFoundError:
@@ -2,6 +2,7 @@
 import logging
 import sys
 import json
+import clustering_io
 
 def _config_str_to_dict(input_str):
   # e.g. 
@@ -39,8 +40,15 @@ def _config_str_to_dict(input_str):
 def read_clusters(cluster_file):
     """
     Reads the clusters from a file and returns a dictionary mapping node IDs to a set of cluster IDs.
+    The file can be a text or a binary clustering (see clustering_io.py).
     """
     node_to_clusters = {}
+    if clustering_io.isBinary(cluster_file):
+        offsets, ids = clustering_io.readClustering(cluster_file)
+        for cluster_id in range(len(offsets) - 1):
+            for node in ids[offsets[cluster_id]:offsets[cluster_id + 1]].tolist():
+                node_to_clusters.setdefault(str(node), set()).add(cluster_id)
+        return node_to_clusters
     with open(cluster_file, 'r') as f:
         for cluster_id, line in enumerate(f):
             nodes = line.strip().split("\t")
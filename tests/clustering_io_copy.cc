@@ -0,0 +1,30 @@
+#include <iostream>
+
+#include "clusterers/clustering_io.h"
+
+using research_graph::in_memory::ReadBinaryClustering;
+using research_graph::in_memory::WriteBinaryClustering;
+
+// Reads a binary clustering and writes it again, with the C++ reader and
+// writer of clustering_io.h. Used by tests/test_clustering_io.py to check that
+// clusterings written by clustering_io.py are read by C++ and vice versa.
+//
+// Usage: clustering_io_copy input.cluster.bin output.cluster.bin
+int main(int argc, char* argv[]) {
+  if (argc != 3) {
+    std::cerr << "Usage: " << argv[0] << " input.cluster.bin output.cluster.bin"
+              << std::endl;
+    return 1;
+  }
+  auto clustering = ReadBinaryClustering(argv[1]);
+  if (!clustering.ok()) {
+    std::cerr << clustering.status() << std::endl;
+    return 1;
+  }
+  auto status = WriteBinaryClustering(argv[2], *clustering);
+  if (!status.ok()) {
+    std::cerr << status << std::endl;
+    return 1;
+  }
+  return 0;
+}
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The tests import the runner modules from the root of the repository.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Scripts that check the Neo4j and TigerGraph installations (see README.md),
+# run by hand against a running server.
+collect_ignore = ["test_neo4j_installation.py", "test_tigergraph_installation.py"]
@@ -0,0 +1,61 @@
+import pytest
+import runner_utils
+
+'''
+Tests of the grid and Pareto search of adaptive_search.py.
+'''
+
+adaptive_search = pytest.importorskip("adaptive_search", reason="adaptive_search.py needs pandas")
+
+def test_config_index_matches_config_combos():
+  axes = [["resolution: 0.1", "resolution: 0.5", "resolution: 0.9"],
+          ["use_refinement: true", "use_refinement: false"],
+          ["num_iterations: 5", "num_iterations: 10", "num_iterations: 20", "num_iterations: 40"]]
+  dims = [len(axis) for axis in axes]
+  combos = runner_utils.makeConfigCombos(axes)
+  indices = adaptive_search.gridIndices(dims, [1, 1, 1])
+  assert len(indices) == len(combos)
+  # At stride 1, the grid is enumerated in the order of the combos.
+  assert [adaptive_search.configIndex(index, dims) for index in indices] == list(range(len(combos)))
+  for index in indices:
+    assert combos[adaptive_search.configIndex(index, dims)] == ",".join(axes[axis][value] for axis, value in enumerate(index))
+
+def test_grid_indices_sample_first_and_last_values():
+  assert adaptive_search.gridIndices([5, 2], [2, 1]) == [(0, 0), (0, 1), (2, 0), (2, 1), (4, 0), (4, 1)]
+  # The last value is always included, even if the stride skips it.
+  assert adaptive_search.gridIndices([4], [2]) == [(0,), (2,), (3,)]
+  assert adaptive_search.gridIndices([1], [1]) == [(0,)]
+
+def test_grid_neighbors():
+  assert sorted(adaptive_search.gridNeighbors((2, 0), [5, 2], [2, 1])) == [(0, 0), (2, 1), (4, 0)]
+
+def test_pareto_frontier():
+  points = {"a": (1.0, 0.5), "b": (2.0, 0.4), "c": (3.0, 0.9), "d": (0.5, 0.1)}
+  assert adaptive_search.paretoFrontier(points) == ["d", "a", "c"]
+
+# The (time, score) of each config of a grid with one argument of 5 values.
+POINTS = {(0,): (0.0, 0.1), (1,): (1.0, 0.5), (2,): (2.0, 0.2), (3,): (3.0, 0.9), (4,): (4.0, 0.3)}
+
+def test_search_refines_the_frontier():
+  evaluated = []
+  def evaluate(index):
+    evaluated.append(index)
+    return POINTS[index]
+  frontier = adaptive_search.paretoSearch([5], evaluate)
+  # The coarse sample at stride 2 has no unexplored neighbors on its frontier,
+  # so the stride is halved and the neighbors of the frontier are run.
+  assert evaluated == [(0,), (2,), (4,), (1,), (3,)]
+  assert frontier == [(0,), (1,), (3,)]
+
+def test_search_stops_at_the_budget():
+  evaluated = []
+  def evaluate(index):
+    evaluated.append(index)
+    return POINTS[index]
+  assert adaptive_search.paretoSearch([5], evaluate, budget=4) == [(0,), (1,)]
+  assert evaluated == [(0,), (2,), (4,), (1,)]
+
+def test_failed_configs_are_not_on_the_frontier():
+  def evaluate(index):
+    return None if index == (3,) else POINTS[index]
+  assert adaptive_search.paretoSearch([5], evaluate) == [(0,), (1,)]
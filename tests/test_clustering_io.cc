@@ -0,0 +1,101 @@
+#include "gtest/gtest.h"
+#include "gmock/gmock.h"
+
+#include <cstdint>
+#include <fstream>
+#include <iterator>
+#include <string>
+#include <vector>
+
+#include "clusterers/clustering_io.h"
+
+using research_graph::in_memory::BinaryClusteringHeader;
+using research_graph::in_memory::InMemoryClusterer;
+using research_graph::in_memory::IsBinaryClustering;
+using research_graph::in_memory::ReadBinaryClustering;
+using research_graph::in_memory::WriteBinaryClustering;
+
+using testing::ElementsAre;
+using testing::IsEmpty;
+
+// bazel run //tests:clustering_io_test -- --gtest_color=yes
+
+namespace {
+
+std::string TempFilename(const std::string& name) {
+  return testing::TempDir() + "/" + name + ".cluster.bin";
+}
+
+BinaryClusteringHeader ReadHeader(const std::string& filename) {
+  BinaryClusteringHeader header;
+  std::ifstream file{filename, std::ios::binary};
+  file.read(reinterpret_cast<char*>(&header), sizeof(header));
+  return header;
+}
+
+}  // namespace
+
+TEST(TestClusteringIO, RoundTrip) {
+  std::string filename = TempFilename("round_trip");
+  InMemoryClusterer::Clustering clustering = {{0, 4, 2}, {1}, {3, 5}};
+  ASSERT_TRUE(WriteBinaryClustering(filename.c_str(), clustering).ok());
+  ASSERT_TRUE(IsBinaryClustering(filename.c_str()));
+  EXPECT_EQ(ReadHeader(filename).id_bytes, 4);
+  auto read = ReadBinaryClustering(filename.c_str());
+  ASSERT_TRUE(read.ok());
+  EXPECT_EQ(*read, clustering);
+}
+
+TEST(TestClusteringIO, EmptyClustering) {
+  std::string filename = TempFilename("empty_clustering");
+  InMemoryClusterer::Clustering clustering;
+  ASSERT_TRUE(WriteBinaryClustering(filename.c_str(), clustering).ok());
+  EXPECT_EQ(ReadHeader(filename).num_clusters, 0);
+  auto read = ReadBinaryClustering(filename.c_str());
+  ASSERT_TRUE(read.ok());
+  EXPECT_THAT(*read, IsEmpty());
+}
+
+TEST(TestClusteringIO, EmptyCluster) {
+  std::string filename = TempFilename("empty_cluster");
+  InMemoryClusterer::Clustering clustering = {{0, 1}, {}, {2}, {}};
+  ASSERT_TRUE(WriteBinaryClustering(filename.c_str(), clustering).ok());
+  auto read = ReadBinaryClustering(filename.c_str());
+  ASSERT_TRUE(read.ok());
+  EXPECT_EQ(*read, clustering);
+}
+
+TEST(TestClusteringIO, Uint64Ids) {
+  std::string filename = TempFilename("uint64_ids");
+  uint64_t large_id = (uint64_t{1} << 32) + 7;
+  std::vector<std::vector<uint64_t>> clustering = {{large_id, 3}, {5}};
+  ASSERT_TRUE(WriteBinaryClustering(filename.c_str(), clustering).ok());
+  EXPECT_EQ(ReadHeader(filename).id_bytes, 8);
+  // The ids do not fit in a NodeId, so they are not read (and truncated).
+  EXPECT_FALSE(ReadBinaryClustering(filename.c_str()).ok());
+
+  // 64-bit ids that fit in a NodeId are read.
+  std::string small_filename = TempFilename("uint64_small_ids");
+  std::vector<std::vector<uint64_t>> small_clustering = {{3, 1}, {5}};
+  ASSERT_TRUE(WriteBinaryClustering(small_filename.c_str(), small_clustering).ok());
+  EXPECT_EQ(ReadHeader(small_filename).id_bytes, 4);
+  auto read = ReadBinaryClustering(small_filename.c_str());
+  ASSERT_TRUE(read.ok());
+  EXPECT_THAT(*read, ElementsAre(ElementsAre(3, 1), ElementsAre(5)));
+}
+
+TEST(TestClusteringIO, TruncatedFile) {
+  std::string filename = TempFilename("truncated");
+  InMemoryClusterer::Clustering clustering = {{0, 1, 2}};
+  ASSERT_TRUE(WriteBinaryClustering(filename.c_str(), clustering).ok());
+  std::string contents;
+  {
+    std::ifstream file{filename, std::ios::binary};
+    contents.assign(std::istreambuf_iterator<char>(file), {});
+  }
+  {
+    std::ofstream file{filename, std::ios::binary | std::ios::trunc};
+    file.write(contents.data(), contents.size() - 4);
+  }
+  EXPECT_FALSE(ReadBinaryClustering(filename.c_str()).ok());
+}
@@ -0,0 +1,66 @@
+import pytest
+import clustering_io
+import runner_utils
+import testing_utils
+
+'''
+Tests of the clustering formats of clustering_io.py: round trips in Python,
+and clusterings written by clustering_io.py read by the C++ reader of
+clusterers/clustering_io.h and written back by its writer
+(tests/clustering_io_copy.cc).
+'''
+
+np = pytest.importorskip("numpy")
+
+CLUSTERINGS = {
+  "clustering": [[0, 4, 2], [1], [3, 5]],
+  "empty clustering": [],
+  "empty cluster": [[0, 1], [], [2], []],
+  "uint64 ids": [[(1 << 32) + 7, 3], [5], [(1 << 40)]],
+}
+
+def idBytes(filename):
+  with open(filename, "rb") as f:
+    return clustering_io.HEADER.unpack(f.read(clustering_io.HEADER.size))[2]
+
+@pytest.mark.parametrize("extension", [".cluster", ".cluster.bin"])
+@pytest.mark.parametrize("name", CLUSTERINGS)
+def test_python_round_trip(name, extension, tmp_path):
+  filename = str(tmp_path / ("clustering" + extension))
+  assert clustering_io.writeClusteringFromLists(filename, CLUSTERINGS[name]) == len(CLUSTERINGS[name])
+  assert clustering_io.readClusterLists(filename) == CLUSTERINGS[name]
+  assert clustering_io.numClusters(filename) == len(CLUSTERINGS[name])
+
+def test_binary_id_width(tmp_path):
+  filename = str(tmp_path / "clustering.cluster.bin")
+  clustering_io.writeClusteringFromLists(filename, CLUSTERINGS["clustering"])
+  assert idBytes(filename) == 4
+  clustering_io.writeClusteringFromLists(filename, CLUSTERINGS["uint64 ids"])
+  assert idBytes(filename) == 8
+
+'''
+Copies a binary clustering with the C++ reader and writer, and returns the
+result of the copy.
+'''
+def copyWithCpp(filename, copy_filename):
+  return runner_utils.runCommand(testing_utils.binary("//tests:clustering_io_copy") + " " +
+                                 filename + " " + copy_filename)
+
+@pytest.mark.parametrize("name", ["clustering", "empty clustering", "empty cluster"])
+def test_cpp_reads_and_writes_python_clusterings(name, tmp_path):
+  filename = str(tmp_path / "python.cluster.bin")
+  copy_filename = str(tmp_path / "cpp.cluster.bin")
+  clustering_io.writeClusteringFromLists(filename, CLUSTERINGS[name])
+  result = copyWithCpp(filename, copy_filename)
+  assert result["returncode"] == 0, result["output"]
+  assert clustering_io.readClusterLists(copy_filename) == CLUSTERINGS[name]
+  with open(filename, "rb") as python_file, open(copy_filename, "rb") as cpp_file:
+    assert python_file.read() == cpp_file.read()
+
+def test_cpp_rejects_ids_that_do_not_fit(tmp_path):
+  # The C++ node ids are 32 bits wide, so uint64 ids are not truncated but
+  # rejected.
+  filename = str(tmp_path / "python.cluster.bin")
+  copy_filename = str(tmp_path / "cpp.cluster.bin")
+  clustering_io.writeClusteringFromLists(filename, CLUSTERINGS["uint64 ids"])
+  assert copyWithCpp(filename, copy_filename)["returncode"] != 0
@@ -0,0 +1,78 @@
+import os
+import pytest
+import graph_cache
+import runner_utils
+import testing_utils
+
+'''
+With "Graph cache: true", native runs read the cached GBBS conversion of an
+edge list (graph_cache.getGbbsGraph) instead of the edge list itself. These
+tests check that cluster-in-memory_main gives the same clusterings on both.
+'''
+
+# An edge list with a comment, self loops, duplicate edges (in both
+# directions, with the same weight; GBBS keeps an arbitrary one of duplicate
+# edges with different weights) and gaps in the node ids (3, 5, 6, 8 and 11
+# have no edges).
+EDGE_LIST = """# test graph
+0\t1\t0.9
+1\t0\t0.9
+0\t2\t0.3
+1\t2\t0.7
+2\t2\t0.5
+4\t7\t0.25
+4\t9\t0.6
+7\t9\t0.8
+7\t9\t0.8
+9\t9\t1
+10\t12\t0.1
+1\t4\t0.05
+"""
+
+CLUSTERER_CONFIGS = [
+  ("ConnectivityClusterer", "connectivity_config{threshold: 0.5, upper_bound: false}"),
+  ("ConnectivityClusterer", "connectivity_config{threshold: 0.2, upper_bound: false}"),
+  ("KCoreClusterer", "kcore_config{threshold: 2}"),
+  ("ParallelCorrelationClusterer", "correlation_clusterer_config{resolution: 0.3, louvain_config: {num_iterations: 10, num_inner_iterations: 10}, use_refinement: true, clustering_moves_method: LOUVAIN}"),
+  ("ParallelModularityClusterer", "modularity_clusterer_config{resolution: 0.5, louvain_config: {num_iterations: 10, num_inner_iterations: 10}, use_refinement: true, clustering_moves_method: LOUVAIN}"),
+]
+
+@pytest.mark.parametrize("weighted", [True, False])
+@pytest.mark.parametrize("clusterer,config", CLUSTERER_CONFIGS)
+def test_cached_gbbs_graph_gives_same_clustering(clusterer, config, weighted, tmp_path, monkeypatch):
+  pytest.importorskip("pandas")
+  monkeypatch.setattr(runner_utils, "graph_cache", "true", raising=False)
+  monkeypatch.setattr(runner_utils, "graph_cache_directory", str(tmp_path / "cache"), raising=False)
+  monkeypatch.setattr(runner_utils, "graph_cache_key", "mtime", raising=False)
+  edge_list = str(tmp_path / "graph.txt")
+  with open(edge_list, "w") as f:
+    f.write(EDGE_LIST)
+  gbbs_graph = graph_cache.getGbbsGraph(edge_list, weighted)
+
+  edge_list_clustering = str(tmp_path / "edge_list.cluster")
+  edge_list_output = testing_utils.runPCBS(edge_list, clusterer, config, edge_list_clustering,
+                                           is_gbbs_format=False, float_weighted=weighted)
+  gbbs_clustering = str(tmp_path / "gbbs.cluster")
+  gbbs_output = testing_utils.runPCBS(gbbs_graph, clusterer, config, gbbs_clustering,
+                                      is_gbbs_format=True, float_weighted=weighted)
+  assert (runner_utils.getOutputValue(edge_list_output, "Num vertices:") ==
+          runner_utils.getOutputValue(gbbs_output, "Num vertices:") == 13)
+  assert testing_utils.clusterSet(edge_list_clustering) == testing_utils.clusterSet(gbbs_clustering)
+
+def test_cached_gbbs_graph_is_reused(tmp_path, monkeypatch):
+  pytest.importorskip("pandas")
+  monkeypatch.setattr(runner_utils, "graph_cache_directory", str(tmp_path / "cache"), raising=False)
+  monkeypatch.setattr(runner_utils, "graph_cache_key", "mtime", raising=False)
+  edge_list = str(tmp_path / "graph.txt")
+  with open(edge_list, "w") as f:
+    f.write(EDGE_LIST)
+  gbbs_graph = graph_cache.getGbbsGraph(edge_list, True)
+  mtime = os.stat(gbbs_graph).st_mtime_ns
+  assert graph_cache.getGbbsGraph(edge_list, True) == gbbs_graph
+  assert os.stat(gbbs_graph).st_mtime_ns == mtime
+  with open(gbbs_graph, "r") as f:
+    lines = f.read().split()
+  # The header, the number of vertices (max id + 1) and the number of
+  # directed edges: both directions of the 8 distinct edges that are not
+  # self loops, and the 2 self loops once each.
+  assert lines[:3] == ["WeightedAdjacencyGraph", "13", "18"]
@@ -0,0 +1,120 @@
+#include "gtest/gtest.h"
+#include "gmock/gmock.h"
+
+#include <memory>
+#include <vector>
+
+#include "clusterers/kcore_clusterer/kcore-clusterer.h"
+#include "clusterers/kcore_clusterer/kcore_config.pb.h"
+#include "google/protobuf/any.pb.h"
+
+#include "clusterers/gbbs_graph_io.h"
+#include "absl/status/statusor.h"
+
+using research_graph::in_memory::ClustererConfig;
+using research_graph::in_memory::InMemoryClusterer;
+using research_graph::in_memory::KCoreClusterer;
+using research_graph::in_memory::KCoreClustererConfig;
+using research_graph::in_memory::internal::WriteEdgeListAsGraph;
+
+using testing::UnorderedElementsAreArray;
+
+// bazel run //tests:kcore_test -- --gtest_color=yes
+
+namespace {
+
+// A 5-clique (0-4, core number 4), a 4-clique (5-8, core number 3) attached to
+// it by an edge, a 3-clique (9-11, core number 2) and a path (12-14, core
+// number 1).
+std::vector<gbbs::gbbs_io::Edge<gbbs::empty>> TestEdges() {
+  std::vector<gbbs::gbbs_io::Edge<gbbs::empty>> edge_list;
+  for (gbbs::uintE u = 0; u < 5; u++) {
+    for (gbbs::uintE v = u + 1; v < 5; v++) edge_list.push_back({u, v});
+  }
+  for (gbbs::uintE u = 5; u < 9; u++) {
+    for (gbbs::uintE v = u + 1; v < 9; v++) edge_list.push_back({u, v});
+  }
+  edge_list.push_back({4, 5});
+  edge_list.push_back({9, 10});
+  edge_list.push_back({10, 11});
+  edge_list.push_back({9, 11});
+  edge_list.push_back({11, 12});
+  edge_list.push_back({12, 13});
+  edge_list.push_back({13, 14});
+  return edge_list;
+}
+
+std::unique_ptr<InMemoryClusterer> MakeClusterer() {
+  std::unique_ptr<InMemoryClusterer> clusterer(new KCoreClusterer);
+  auto n_status = WriteEdgeListAsGraph(clusterer->MutableGraph(), TestEdges(),
+                                       /*is_symmetric_graph*/true);
+  EXPECT_TRUE(n_status.ok());
+  return clusterer;
+}
+
+InMemoryClusterer::Clustering Cluster(InMemoryClusterer* clusterer,
+                                      int threshold, bool reuse) {
+  KCoreClustererConfig kcore_config;
+  kcore_config.set_threshold(threshold);
+  kcore_config.set_reuse_core_decomposition(reuse);
+  ClustererConfig config;
+  config.mutable_any_config()->PackFrom(kcore_config);
+  auto result = clusterer->Cluster(config);
+  EXPECT_TRUE(result.ok());
+  return *result;
+}
+
+std::vector<testing::Matcher<std::vector<InMemoryClusterer::NodeId>>>
+ClusterMatchers(const InMemoryClusterer::Clustering& clustering) {
+  std::vector<testing::Matcher<std::vector<InMemoryClusterer::NodeId>>>
+      matchers;
+  for (const auto& cluster : clustering) {
+    matchers.push_back(UnorderedElementsAreArray(cluster));
+  }
+  return matchers;
+}
+
+}  // namespace
+
+// The thresholds of a sweep, served by one clusterer that reuses its core
+// decomposition, give the same clusterings as fresh decompositions.
+TEST(TestKCore, ReusedDecompositionMatchesFreshDecomposition) {
+  auto reusing_clusterer = MakeClusterer();
+  for (int threshold : {3, 1, 4, 2, 0, 5, 3}) {
+    auto fresh_clusterer = MakeClusterer();
+    auto fresh = Cluster(fresh_clusterer.get(), threshold, /*reuse*/false);
+    auto reused = Cluster(reusing_clusterer.get(), threshold, /*reuse*/true);
+    EXPECT_THAT(reused, UnorderedElementsAreArray(ClusterMatchers(fresh)))
+        << "threshold = " << threshold;
+  }
+}
+
+TEST(TestKCore, ThresholdClusters) {
+  auto clusterer = MakeClusterer();
+  auto clustering = Cluster(clusterer.get(), 4, /*reuse*/true);
+  std::vector<testing::Matcher<std::vector<InMemoryClusterer::NodeId>>>
+      expected = {UnorderedElementsAreArray({0, 1, 2, 3, 4})};
+  for (InMemoryClusterer::NodeId i = 5; i < 15; i++) {
+    expected.push_back(UnorderedElementsAreArray({i}));
+  }
+  EXPECT_THAT(clustering, UnorderedElementsAreArray(expected));
+  clustering = Cluster(clusterer.get(), 3, /*reuse*/true);
+  expected = {UnorderedElementsAreArray({0, 1, 2, 3, 4, 5, 6, 7, 8})};
+  for (InMemoryClusterer::NodeId i = 9; i < 15; i++) {
+    expected.push_back(UnorderedElementsAreArray({i}));
+  }
+  EXPECT_THAT(clustering, UnorderedElementsAreArray(expected));
+}
+
+// Replacing the graph discards the reused core decomposition.
+TEST(TestKCore, NewGraphDiscardsDecomposition) {
+  auto clusterer = MakeClusterer();
+  Cluster(clusterer.get(), 2, /*reuse*/true);
+  const std::vector<gbbs::gbbs_io::Edge<gbbs::empty>> edge_list = {
+      {0, 1}, {1, 2}, {0, 2}};
+  ASSERT_TRUE(WriteEdgeListAsGraph(clusterer->MutableGraph(), edge_list,
+                                   /*is_symmetric_graph*/true).ok());
+  auto clustering = Cluster(clusterer.get(), 2, /*reuse*/true);
+  EXPECT_THAT(clustering, UnorderedElementsAreArray(
+                              {UnorderedElementsAreArray({0, 1, 2})}));
+}
@@ -0,0 +1,77 @@
+import pytest
+import repetition
+import runner_utils
+
+'''
+Tests of the repetition policy of repetition.py: the t quantiles of the
+confidence intervals, and when rounds stop being added.
+'''
+
+# Two-sided critical values of Student's t distribution, from the usual
+# tables: (p, degrees of freedom, quantile).
+T_TABLE = [(0.975, 1, 12.706), (0.975, 2, 4.303), (0.975, 3, 3.182), (0.975, 4, 2.776),
+           (0.975, 5, 2.571), (0.975, 10, 2.228), (0.975, 30, 2.042), (0.975, 120, 1.980),
+           (0.995, 3, 5.841), (0.995, 5, 4.032), (0.995, 10, 3.169),
+           (0.95, 4, 2.132), (0.95, 10, 1.812), (0.9, 7, 1.415)]
+
+@pytest.mark.parametrize("p,df,quantile", T_TABLE)
+def test_t_quantile_matches_table(p, df, quantile):
+  assert repetition.tQuantile(p, df) == pytest.approx(quantile, abs=5e-4)
+  assert repetition.tQuantile(1 - p, df) == pytest.approx(-quantile, abs=5e-4)
+
+def test_t_cdf_is_symmetric():
+  for df in [1, 2, 3, 8]:
+    assert repetition.tCdf(0.0, df) == pytest.approx(0.5)
+    assert repetition.tCdf(1.5, df) + repetition.tCdf(-1.5, df) == pytest.approx(1.0)
+
+def test_summary_confidence_interval(monkeypatch):
+  monkeypatch.setattr(runner_utils, "confidence_level", 0.95, raising=False)
+  summary = repetition.summarize([1.0, 2.0, 3.0])
+  assert summary["Rounds"] == 3
+  assert summary["Cluster Time Mean"] == pytest.approx(2.0)
+  # stddev 1, t(0.975, 2) = 4.303
+  assert summary["Cluster Time CI High"] - 2.0 == pytest.approx(4.303 / 3 ** 0.5, abs=1e-3)
+  assert "Cluster Time CI Low" not in repetition.summarize([1.0])
+
+@pytest.fixture
+def policy(monkeypatch):
+  settings = {"num_rounds": 2, "target_ci_width": 0.1, "confidence_level": 0.95,
+              "max_rounds": 6, "round_time_budget": None}
+  for name, value in settings.items():
+    monkeypatch.setattr(runner_utils, name, value, raising=False)
+  return monkeypatch
+
+def rounds(*times, status="OK", total_time=1.0):
+  return [{"Cluster Time": time, "Status": status, "Total Time": total_time} for time in times]
+
+def test_fixed_number_of_rounds(policy):
+  policy.setattr(runner_utils, "target_ci_width", None)
+  assert repetition.needMoreRounds(rounds(1.0))
+  assert not repetition.needMoreRounds(rounds(1.0, 5.0))
+
+def test_rounds_are_added_until_the_interval_is_narrow(policy):
+  assert repetition.needMoreRounds(rounds(1.0))
+  assert repetition.needMoreRounds(rounds(1.0, 2.0))
+  assert not repetition.needMoreRounds(rounds(1.0, 1.0, 1.0))
+  assert not repetition.needMoreRounds(rounds(1.0, 1.001))
+
+def test_max_rounds_limit(policy):
+  series = rounds(1.0, 2.0, 1.0, 2.0, 1.0)
+  assert repetition.needMoreRounds(series)
+  assert not repetition.needMoreRounds(series + rounds(2.0))
+
+def test_round_time_budget_limit(policy):
+  policy.setattr(runner_utils, "round_time_budget", 10.0)
+  assert repetition.needMoreRounds(rounds(1.0, 2.0, total_time=4.0))
+  assert not repetition.needMoreRounds(rounds(1.0, 2.0, 1.0, total_time=4.0))
+
+def test_failed_round_stops_repetition(policy):
+  assert not repetition.needMoreRounds(rounds(1.0, 2.0) + rounds(None, status="TIMEOUT"))
+
+def test_addScaling():
+  runs = ([{"Config": "c", "Threads": "1", "Cluster Time": time} for time in [4.0, 4.0]] +
+          [{"Config": "c", "Threads": "4", "Cluster Time": time} for time in [1.0, 2.0]])
+  repetition.addScaling(runs, int)
+  assert runs[0]["Speedup"] == pytest.approx(1.0)
+  assert runs[2]["Speedup"] == pytest.approx(4.0 / 1.5)
+  assert runs[3]["Parallel Efficiency"] == pytest.approx(4.0 / 1.5 / 4)
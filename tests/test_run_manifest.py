@@ -0,0 +1,71 @@
+import json
+import os
+import run_manifest
+
+'''
+Tests of run_manifest.RunManifest: recording jobs, resuming them, and
+refusing to resume jobs whose clustering has changed.
+'''
+
+def runtimeDict(round=0, **run_info):
+  runtime_dict = {"Input Graph": "graph.txt", "Clusterer Name": "LDDClusterer", "Threads": "4",
+                  "Config": "beta: 0.5", "Round": round}
+  runtime_dict.update(run_info)
+  return runtime_dict
+
+def writeClustering(out_prefix, text):
+  with open(out_prefix + ".cluster", "w") as f:
+    f.write(text)
+
+def test_record_sets_status_and_num_clusters(tmp_path):
+  manifest = run_manifest.RunManifest(str(tmp_path))
+  out_prefix = str(tmp_path / "LDD_0")
+  writeClustering(out_prefix, "0\t1\n2\n")
+  runtime_dict = runtimeDict(**{"Cluster Time": 1.5})
+  manifest.record(runtime_dict, out_prefix)
+  assert runtime_dict["Status"] == "OK"
+  assert runtime_dict["Exit Code"] == 0
+  assert runtime_dict["Num Clusters"] == 2
+  failed = runtimeDict(round=1, **{"Exit Code": 2})
+  manifest.record(failed, str(tmp_path / "LDD_1"))
+  assert failed["Status"] == "FAILED"
+
+def test_resume_restores_completed_jobs(tmp_path):
+  out_prefix = str(tmp_path / "LDD_0")
+  writeClustering(out_prefix, "0\t1\n2\n")
+  run_manifest.RunManifest(str(tmp_path)).record(runtimeDict(**{"Cluster Time": 1.5}), out_prefix)
+  # A new runner process reads the manifest written by the earlier one.
+  manifest = run_manifest.RunManifest(str(tmp_path))
+  runtime_dict = runtimeDict()
+  assert manifest.restore(runtime_dict, out_prefix)
+  assert runtime_dict["Cluster Time"] == 1.5
+  assert "Checksum" not in runtime_dict and "Output Prefix" not in runtime_dict
+  assert not manifest.restore(runtimeDict(round=1), str(tmp_path / "LDD_1"))
+
+def test_resume_reruns_changed_clusterings(tmp_path):
+  out_prefix = str(tmp_path / "LDD_0")
+  writeClustering(out_prefix, "0\t1\n2\n")
+  run_manifest.RunManifest(str(tmp_path)).record(runtimeDict(**{"Cluster Time": 1.5}), out_prefix)
+  writeClustering(out_prefix, "0\n1\t2\n")
+  assert not run_manifest.RunManifest(str(tmp_path)).restore(runtimeDict(), out_prefix)
+  os.remove(out_prefix + ".cluster")
+  assert not run_manifest.RunManifest(str(tmp_path)).restore(runtimeDict(), out_prefix)
+
+def test_resume_reruns_failed_jobs(tmp_path):
+  out_prefix = str(tmp_path / "LDD_0")
+  writeClustering(out_prefix, "0\t1\n")
+  run_manifest.RunManifest(str(tmp_path)).record(runtimeDict(**{"Status": "TIMEOUT", "Exit Code": 1}), out_prefix)
+  assert not run_manifest.RunManifest(str(tmp_path)).restore(runtimeDict(), out_prefix)
+
+def test_latest_record_wins_and_torn_lines_are_skipped(tmp_path):
+  out_prefix = str(tmp_path / "LDD_0")
+  manifest = run_manifest.RunManifest(str(tmp_path))
+  manifest.record(runtimeDict(**{"Exit Code": 1}), out_prefix)
+  writeClustering(out_prefix, "0\t1\n")
+  manifest.record(runtimeDict(**{"Cluster Time": 2.0}), out_prefix)
+  with open(manifest.filename, "a") as f:
+    f.write(json.dumps(runtimeDict(round=1))[:20])
+  records = run_manifest.readRecords(str(tmp_path))
+  assert len(records) == 1
+  assert records[0]["Status"] == "OK"
+  assert records[0]["Cluster Time"] == 2.0
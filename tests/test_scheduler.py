@@ -0,0 +1,116 @@
+import threading
+import time
+import pytest
+import scheduler
+
+'''
+Tests of the core accounting of scheduler.CoreScheduler: running jobs never
+reserve more cores than the machine has, exclusive jobs run alone, and every
+job runs exactly once.
+'''
+
+class JobLog:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.cores_in_use = 0
+    self.max_cores_in_use = 0
+    self.running = set()
+    self.overlaps = {}
+    self.finished = []
+
+  '''
+  Returns a job that reserves cores, and records which jobs run at the same
+  time as it.
+  '''
+  def job(self, name, cores, duration=0.05):
+    def run():
+      with self.lock:
+        self.cores_in_use += cores
+        self.max_cores_in_use = max(self.max_cores_in_use, self.cores_in_use)
+        self.overlaps[name] = set(self.running)
+        for other in self.running:
+          self.overlaps[other].add(name)
+        self.running.add(name)
+      time.sleep(duration)
+      with self.lock:
+        self.running.remove(name)
+        self.cores_in_use -= cores
+        self.finished.append(name)
+    return run
+
+def test_cores_are_never_oversubscribed():
+  log = JobLog()
+  core_scheduler = scheduler.CoreScheduler(num_cores=4)
+  for idx, cores in enumerate([2, 3, 1, 4, 2, 1, 1]):
+    core_scheduler.submit(log.job("job" + str(idx), cores), (), cores)
+  core_scheduler.run()
+  assert sorted(log.finished) == sorted("job" + str(idx) for idx in range(7))
+  assert log.max_cores_in_use <= 4
+  assert core_scheduler.free_cores == 4
+  assert core_scheduler.num_running == 0
+
+def test_small_jobs_fill_free_cores():
+  log = JobLog()
+  core_scheduler = scheduler.CoreScheduler(num_cores=4)
+  core_scheduler.submit(log.job("large0", 3), (), 3)
+  core_scheduler.submit(log.job("large1", 3), (), 3)
+  core_scheduler.submit(log.job("small", 1), (), 1)
+  core_scheduler.run()
+  # The small job does not wait for the second large job.
+  assert "small" in log.overlaps["large0"]
+
+def test_cores_are_capped_to_the_machine():
+  log = JobLog()
+  core_scheduler = scheduler.CoreScheduler(num_cores=2)
+  core_scheduler.submit(log.job("huge", 64), (), 64)
+  core_scheduler.run()
+  assert log.finished == ["huge"]
+  assert core_scheduler.free_cores == 2
+
+def test_exclusive_jobs_run_alone():
+  log = JobLog()
+  core_scheduler = scheduler.CoreScheduler(num_cores=8)
+  core_scheduler.submit(log.job("before0", 1), (), 1)
+  core_scheduler.submit(log.job("before1", 1), (), 1)
+  core_scheduler.submit(log.job("exclusive", 1), (), 1, True)
+  core_scheduler.submit(log.job("after0", 1), (), 1)
+  core_scheduler.submit(log.job("after1", 1), (), 1)
+  core_scheduler.run()
+  assert log.overlaps["exclusive"] == set()
+  # Jobs after the exclusive job are not started ahead of it.
+  assert log.finished.index("exclusive") < log.finished.index("after0")
+  assert log.finished.index("exclusive") < log.finished.index("after1")
+  assert "before1" in log.overlaps["before0"]
+
+def test_failing_job_releases_its_cores():
+  log = JobLog()
+  core_scheduler = scheduler.CoreScheduler(num_cores=2)
+  def fail():
+    raise RuntimeError("job failed")
+  core_scheduler.submit(fail, (), 2)
+  core_scheduler.submit(log.job("next", 2), (), 2)
+  core_scheduler.run()
+  assert log.finished == ["next"]
+  assert core_scheduler.free_cores == 2
+
+class RecordingScheduler:
+  def __init__(self, num_cores):
+    self.num_cores = num_cores
+    self.submitted = []
+
+  def submit(self, func, args, cores, exclusive=False):
+    self.submitted.append((args[4], cores, exclusive))
+
+def test_exclusive_clusterers_are_submitted_as_exclusive(monkeypatch):
+  pytest.importorskip("pandas")
+  import cluster
+  import runner_utils
+  monkeypatch.setattr(runner_utils, "exclusive_clusterers", ["ParHacClusterer"], raising=False)
+  monkeypatch.setattr(runner_utils, "persistent_worker", "false", raising=False)
+  monkeypatch.setattr(runner_utils, "kcore_threshold_sweep", "false", raising=False)
+  jobs = [("config0", "config0", "out0_"), ("config1", "config1", "out1_")]
+  recording = RecordingScheduler(16)
+  cluster.schedulePCBSJobs(recording, None, "ParHacClusterer", "graph", "4", jobs, [])
+  cluster.schedulePCBSJobs(recording, None, "LDDClusterer", "graph", "ALL", jobs, [])
+  assert recording.submitted == [([jobs[0]], 4, True), ([jobs[1]], 4, True),
+                                 ([jobs[0]], 16, False), ([jobs[1]], 16, False)]
@@ -0,0 +1,81 @@
+import os
+import pytest
+import external_tools
+import runner_utils
+import testing_utils
+
+'''
+Tests that the native Tectonic pipeline (cluster_tectonic.py, "Tectonic
+pipeline: native") gives the same clusterings as the scripts and binaries of
+external/Tectonic, which are the default: against the expected clusterings of
+the scripts on a small graph, and, if the mace and tree-clusters binaries are
+built (python3 external_tools.py), against the scripts themselves.
+'''
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+# Two 5-cliques joined by a path through a triangle, and a pendant vertex.
+EDGE_LIST = "".join(str(u) + "\t" + str(v) + "\n" for u, v in
+                    [(u, v) for u in range(5) for v in range(u + 1, 5)] +
+                    [(u, v) for u in range(5, 10) for v in range(u + 1, 10)] +
+                    [(4, 10), (10, 11), (4, 11), (11, 5), (9, 12)])
+
+# The clusterings of the scripts on EDGE_LIST, by threshold. The weights of
+# the edges are 3/8 within the first clique (3/10 at vertex 4), 3/8 within
+# the second one (1/3 at vertex 5), and 1/8, 1/5 and 1/9 on the triangle
+# (4, 10, 11); (11, 5) and (9, 12) are in no triangle. Vertex 12 is in no
+# triangle, so it is in no cluster. The thresholds are away from the weights,
+# so that the clusterings do not depend on how ties are broken.
+EXPECTED_CLUSTERS = {
+  "0.01": [{0, 1, 2, 3, 4, 10, 11}, {5, 6, 7, 8, 9}],
+  "0.06": [{0, 1, 2, 3, 4, 10, 11}, {5, 6, 7, 8, 9}],
+  "0.1": [{0, 1, 2, 3, 4, 10, 11}, {5, 6, 7, 8, 9}],
+  "0.15": [{0, 1, 2, 3, 4}, {10, 11}, {5, 6, 7, 8, 9}],
+}
+
+@pytest.fixture
+def tectonic(tmp_path, monkeypatch):
+  monkeypatch.chdir(testing_utils.REPO_DIRECTORY)
+  settings = {"input_directory": str(tmp_path) + "/", "gbbs_format": "false", "postprocess_only": "false",
+              "graph_cache": "false", "timeout": None, "tectonic_threshold_sweep": "false",
+              "clustering_format": "text", "tectonic_pipeline": "native"}
+  for name, value in settings.items():
+    monkeypatch.setattr(runner_utils, name, value, raising=False)
+  with open(str(tmp_path / "graph.txt"), "w") as f:
+    f.write(EDGE_LIST)
+  import cluster_tectonic
+  cluster_tectonic.triangle_weights.clear()
+  yield monkeypatch
+  cluster_tectonic.clearSweeps()
+
+'''
+Runs Tectonic with a pipeline at a threshold, and returns its clusters.
+'''
+def runTectonic(tmp_path, pipeline, threshold, configs=None):
+  import cluster
+  runner_utils.tectonic_pipeline = pipeline
+  out_prefix = str(tmp_path / (pipeline + "_" + threshold))
+  runtime_dict = {"Round": 0}
+  cluster.runTectonic("Tectonic", "graph.txt", "1", "threshold: " + threshold, out_prefix, runtime_dict, configs)
+  assert runtime_dict.get("Status", "OK") == "OK"
+  return testing_utils.clusterSet(out_prefix + ".cluster")
+
+@pytest.mark.parametrize("threshold", EXPECTED_CLUSTERS)
+def test_native_pipeline_matches_expected_clusters(threshold, tmp_path, tectonic):
+  expected = set(frozenset(cluster) for cluster in EXPECTED_CLUSTERS[threshold])
+  assert runTectonic(tmp_path, "native", threshold) == expected
+
+def test_native_sweep_matches_expected_clusters(tmp_path, tectonic):
+  tectonic.setattr(runner_utils, "tectonic_threshold_sweep", "true")
+  configs = ["threshold: " + threshold for threshold in EXPECTED_CLUSTERS]
+  for threshold in EXPECTED_CLUSTERS:
+    expected = set(frozenset(cluster) for cluster in EXPECTED_CLUSTERS[threshold])
+    assert runTectonic(tmp_path, "native", threshold, configs) == expected
+
+@pytest.mark.parametrize("threshold", EXPECTED_CLUSTERS)
+def test_native_pipeline_matches_scripts(threshold, tmp_path, tectonic):
+  for tool in external_tools.CLUSTERER_TOOLS["Tectonic"]:
+    if not os.path.exists(os.path.join(testing_utils.REPO_DIRECTORY, external_tools.binaryPath(tool))):
+      pytest.skip("the Tectonic tools are not built")
+  assert runTectonic(tmp_path, "native", threshold) == runTectonic(tmp_path, "scripts", threshold)
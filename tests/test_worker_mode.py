@@ -0,0 +1,60 @@
+import os
+import pytest
+import cluster_worker
+import testing_utils
+
+'''
+A persistent worker (cluster-in-memory_main --worker_mode=true) reuses one
+clusterer object, and the graph read into it, for all jobs of a clusterer.
+These tests run two configs back to back in one worker, and check that both
+clusterings are the same as those of fresh processes.
+'''
+
+# Two configs of each clusterer, in the format of the runner.
+CLUSTERER_CONFIGS = {
+  "ConnectivityClusterer": ["connectivity_config{threshold: 0.98, upper_bound: false}",
+                            "connectivity_config{threshold: 0.5, upper_bound: false}"],
+  "KCoreClusterer": ["kcore_config{threshold: 5}", "kcore_config{threshold: 2}"],
+  "LDDClusterer": ["ldd_config{beta: 0.5}", "ldd_config{beta: 0.1}"],
+  "ScanClusterer": ["scan_config{mu: 5, epsilon: 0.5}", "scan_config{mu: 2, epsilon: 0.1}"],
+  "LabelPropagationClusterer": ["label_propagation_config{max_iteration: 5}",
+                                "label_propagation_config{max_iteration: 50}"],
+  "SLPAClusterer": ["label_propagation_config{max_iteration: 5, remove_nested: false, prune_threshold: 0.2}",
+                    "label_propagation_config{max_iteration: 50, remove_nested: false, prune_threshold: 0.4}"],
+  "TectonicClusterer": ["tectonic_config{threshold: 0.06, match_real_tectonic: false}",
+                        "tectonic_config{threshold: 0.2, match_real_tectonic: false}"],
+  "ParallelAffinityClusterer": ["affinity_clusterer_config{num_iterations: 4}",
+                                "affinity_clusterer_config{num_iterations: 25}"],
+  "ParHacClusterer": ["parhac_clusterer_config{weight_threshold: 0.125, epsilon: 0.1}",
+                      "parhac_clusterer_config{weight_threshold: 0.015625, epsilon: 1}"],
+  "ParallelCorrelationClusterer": [
+      "correlation_clusterer_config{resolution: 0.5, louvain_config: {num_iterations: 10, num_inner_iterations: 10}, use_refinement: true, clustering_moves_method: LOUVAIN}",
+      "correlation_clusterer_config{resolution: 0.1, louvain_config: {num_iterations: 20, num_inner_iterations: 20}, use_refinement: false, clustering_moves_method: LOUVAIN}"],
+  "ParallelModularityClusterer": [
+      "modularity_clusterer_config{resolution: 0.9, louvain_config: {num_iterations: 10, num_inner_iterations: 10}, use_refinement: true, clustering_moves_method: LOUVAIN}",
+      "modularity_clusterer_config{resolution: 8.2, louvain_config: {num_iterations: 20, num_inner_iterations: 20}, use_refinement: false, clustering_moves_method: LOUVAIN}"],
+}
+
+INPUT_GRAPH = os.path.join(testing_utils.DATA_DIRECTORY, "iris.graph.txt")
+
+@pytest.mark.parametrize("clusterer", sorted(CLUSTERER_CONFIGS))
+def test_worker_matches_fresh_processes(clusterer, tmp_path):
+  pytest.importorskip("numpy")
+  configs = CLUSTERER_CONFIGS[clusterer]
+  worker = cluster_worker.ClusterWorker(
+      "PARLAY_NUM_THREADS=1 " + testing_utils.binary("//clusterers:cluster-in-memory_main") +
+      " --input_graph=" + INPUT_GRAPH + " --is_gbbs_format=false --float_weighted=true --worker_mode=true")
+  try:
+    for config_idx, config in enumerate(configs):
+      worker_clustering = str(tmp_path / ("worker_" + str(config_idx) + ".cluster"))
+      result = worker.run(clusterer, config, worker_clustering)
+      assert result["status"] == "OK", result["output"]
+      if config_idx > 0:
+        assert "Graph cached: True" in result["output"]
+  finally:
+    worker.close()
+  for config_idx, config in enumerate(configs):
+    fresh_clustering = str(tmp_path / ("fresh_" + str(config_idx) + ".cluster"))
+    testing_utils.runPCBS(INPUT_GRAPH, clusterer, config, fresh_clustering)
+    assert (testing_utils.clusterSet(str(tmp_path / ("worker_" + str(config_idx) + ".cluster"))) ==
+            testing_utils.clusterSet(fresh_clustering)), clusterer + ": " + config
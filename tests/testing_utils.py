@@ -0,0 +1,51 @@
+import os
+import shutil
+import pytest
+import runner_utils
+
+'''
+Helpers shared by the Python tests: building the native binaries, running
+cluster-in-memory_main, and comparing clusterings.
+
+Tests that need a native binary are skipped if bazel is not installed.
+'''
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIRECTORY = os.path.join(REPO_DIRECTORY, "data")
+
+'''
+Builds a bazel target (e.g., //clusterers:cluster-in-memory_main) and returns
+the path of its binary.
+'''
+def binary(target):
+  if shutil.which("bazel") is None:
+    pytest.skip("bazel is not installed")
+  runner_utils.bazel_run = "false"
+  cwd = os.getcwd()
+  os.chdir(REPO_DIRECTORY)
+  try:
+    return runner_utils.getBinaryCommand(target)
+  finally:
+    os.chdir(cwd)
+
+'''
+Runs cluster-in-memory_main on one thread, so that clusterings are
+deterministic, and returns its output.
+'''
+def runPCBS(input_graph, clusterer, config, out_clustering, is_gbbs_format=False, float_weighted=True, extra_flags=""):
+  command = ("PARLAY_NUM_THREADS=1 " + binary("//clusterers:cluster-in-memory_main") +
+             " --input_graph=" + input_graph + " --is_gbbs_format=" + str(is_gbbs_format).lower() +
+             " --float_weighted=" + str(float_weighted).lower() + " --clusterer_name=" + clusterer +
+             " --clusterer_config='" + config + "' --output_clustering=" + out_clustering + " " + extra_flags)
+  result = runner_utils.runCommand(command)
+  assert result["returncode"] == 0, result["output"]
+  return result["output"]
+
+'''
+Returns a clustering (in either format) as a set of clusters, each a
+frozenset of node ids, so that clusterings can be compared regardless of the
+order of their clusters and nodes.
+'''
+def clusterSet(filename):
+  import clustering_io
+  return set(frozenset(cluster) for cluster in clustering_io.readClusterLists(filename))